@@ -11,9 +11,20 @@ import random
 import unittest
 import timeit
 import sys
+import json
+import asyncio
+import time
+import os
+import tempfile
+import socket
 
 import isolation
 import game_agent
+import game_engine  # aimacode, on the path added by game_agent
+import mcts
+import server
+import sample_players
+import tune
 
 from collections import Counter
 from copy import deepcopy
@@ -193,6 +204,8 @@ class CounterBoard(isolation.Board):
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
         new_board.__board_state__ = deepcopy(self.__board_state__)
+        new_board.__blank_spaces__ = copy(self.__blank_spaces__)
+        new_board.__blocked_key__ = self.__blocked_key__
         new_board.counter = self.counter
         new_board.visited = self.visited
         new_board.root = self.root
@@ -536,5 +549,541 @@ class Project1Test(unittest.TestCase):
                 legal_moves, chosen_move))
 
 
+class TimeManagerTest(unittest.TestCase):
+
+    def test_predict_next(self):
+        """ Test TimeManager prediction of the next iteration cost """
+        clock = [100.]
+        manager = game_agent.TimeManager(lambda: clock[0], 10., 4)
+
+        manager.start_iteration()
+        clock[0] -= 2.
+        manager.end_iteration((0, 0))
+        # a single iteration uses the root branching factor
+        self.assertEqual(manager.predict_next(), 8.)
+
+        manager.start_iteration()
+        clock[0] -= 6.
+        manager.end_iteration((0, 0))
+        # later iterations use the measured growth of the iteration times
+        self.assertEqual(manager.predict_next(), 18.)
+        self.assertTrue(manager.should_continue())
+
+        manager.start_iteration()
+        clock[0] -= 60.
+        manager.end_iteration((0, 0))
+        # 22ms left before the threshold, 600ms predicted
+        self.assertFalse(manager.should_continue())
+
+    def test_unstable_best_move(self):
+        """ Test TimeManager extends the budget when the best move changes """
+        clock = [200.]
+        manager = game_agent.TimeManager(lambda: clock[0], 10., 1)
+
+        manager.start_iteration()
+        clock[0] -= 30.
+        manager.end_iteration((0, 0))
+        manager.start_iteration()
+        clock[0] -= 45.
+        manager.end_iteration((1, 2))
+        self.assertTrue(manager.is_unstable())
+        # 67.5ms predicted; 80ms left before the threshold is enough for an
+        # unstable best move, but not with the safety margin of a stable one
+        clock[0] = 90.
+        self.assertTrue(manager.should_continue())
+        manager.best_moves[-1] = (0, 0)
+        self.assertFalse(manager.should_continue())
+
+        # an iteration predicted not to finish is never started
+        manager.best_moves[-1] = (1, 2)
+        clock[0] = 70.
+        self.assertFalse(manager.should_continue())
+
+
+class MCTSTest(unittest.TestCase):
+
+    def test_rollout_board(self):
+        """ Test RolloutBoard legal moves match the isolation Board """
+        board = isolation.Board('player1', 'player2', 9, 7)
+        rollout_board = mcts.RolloutBoard.from_board(board)
+        self.assertEqual(len(rollout_board.get_legal_moves()), 63)
+        for move in [(3, 4), (0, 0), (4, 2), (2, 1), (6, 3)]:
+            board.apply_move(move)
+            rollout_board.apply_move(move[0] * 9 + move[1])
+            expected = sorted(board.get_legal_moves())
+            actual = sorted(map(rollout_board.to_move, rollout_board.get_legal_moves()))
+            self.assertEqual(expected, actual)
+        self.assertIn(rollout_board.copy().rollout(), (0, 1))
+
+    @timeout(5)
+    def test_mcts_get_move(self):
+        """ Test CustomPlayer.get_move with the 'mcts' search method """
+        agentUT = game_agent.CustomPlayer(method='mcts')
+        board = isolation.Board(agentUT, 'null_agent', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((0, 0))
+        legal_moves = board.get_legal_moves()
+        timer_start = curr_time_millis()
+        time_left = lambda: 100 - (curr_time_millis() - timer_start)
+        move = agentUT.get_move(board, legal_moves, time_left)
+        self.assertIn(move, legal_moves, INVALID_MOVE.format(legal_moves, move))
+
+        # the opponent's reply is found in the tree of the previous search
+        board.apply_move(move)
+        reply = board.get_legal_moves()[0]
+        board.apply_move(reply)
+        self.assertIsNotNone(agentUT.tree._reuse_root(mcts.RolloutBoard.from_board(board)))
+
+
+    @timeout(10)
+    def test_rollout_pool(self):
+        """ Test rollout worker processes are only used for batches """
+        board = isolation.Board('player1', 'player2', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((0, 0))
+
+        def iterations(count):
+            remaining = iter(range(count))
+            return lambda: 1e3 if next(remaining, None) is not None else -1.
+
+        tree = mcts.MCTS(batch_size=1, workers=2)
+        tree.search(board, iterations(3), 0)
+        self.assertIsNone(tree.pool)
+
+        with mcts.MCTS(batch_size=4, workers=2) as tree:
+            tree.search(board, iterations(3), 0)
+            self.assertIsNotNone(tree.pool)
+        self.assertIsNone(tree.pool)
+
+
+class HeuristicParamsTest(unittest.TestCase):
+
+    def tearDown(self):
+        game_agent.params.clear()
+        game_agent.params.update({heuristic: dict(weights) for heuristic, weights
+                                  in game_agent.DEFAULT_PARAMS.items()})
+        game_agent.load_params()
+
+    def test_load_params(self):
+        """ Test loading tuned heuristic weights from a parameter file """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "params.json")
+            with open(path, "w") as f:
+                json.dump({"move_diff_weighted": {"diff_weight": 2.5}}, f)
+            game_agent.load_params(path)
+            with open(path, "w") as f:
+                json.dump({"move_diff_weighted": {"early_phase": 0.}}, f)
+            self.assertRaises(ValueError, game_agent.load_params, path)
+        self.assertEqual(game_agent.params["move_diff_weighted"]["diff_weight"], 2.5)
+
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        # 2 moves for Player1, 8 moves for Player2
+        self.assertEqual(game_agent.move_diff_weighted(game, "Player1"), 2. - 2.5 * 8)
+        score = game_agent.weighted_score("move_diff_weighted", {"diff_weight": 0.})
+        self.assertEqual(score(game, "Player1"), 2.)
+
+    def test_heuristic_namespaces(self):
+        """ Test the weights of each heuristic are independent """
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        expected = game_agent.custom_score(game, "Player1")
+        game_agent.params["conditional_score"]["early_phase"] = 0.
+        self.assertEqual(game_agent.custom_score(game, "Player1"), expected)
+        game_agent.params[game_agent.DEPLOYED_HEURISTIC]["early_phase"] = 0.
+        self.assertNotEqual(game_agent.custom_score(game, "Player1"), expected)
+
+    def test_opp_moves_previous(self):
+        """ Test the late phase of conditional_score2 compares with the root """
+        agentUT = game_agent.CustomPlayer(2, iterative=False)
+        game = isolation.Board(agentUT, "Player2")
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        agentUT.get_move(game, game.get_legal_moves(), lambda: 1e3)
+        self.assertEqual(game_agent.opp_moves_previous, 8)
+        w = dict(game_agent.params["conditional_score2"], early_phase=0., late_phase=0.)
+        game.apply_move((2, 1))
+        own_moves = len(game.get_legal_moves(agentUT))
+        opp_moves = len(game.get_legal_moves("Player2"))
+        self.assertEqual(game_agent.conditional_score2(game, agentUT, w),
+                         own_moves + w["prev_diff_weight"] * (8 - opp_moves))
+
+
+class InlinePool:
+    """Stand-in for `multiprocessing.Pool` that maps in this process."""
+
+    def __init__(self, workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def map(self, fn, tasks):
+        return [fn(task) for task in tasks]
+
+
+class TuneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = tune.Pool, tune.play_pair, sys.argv
+        tune.Pool = InlinePool
+        # the agent with the larger prev_diff_weight wins both games
+        tune.play_pair = lambda args: 2 if args[1]["prev_diff_weight"] > args[2]["prev_diff_weight"] else 0
+
+    def tearDown(self):
+        tune.Pool, tune.play_pair, sys.argv = self.saved
+        game_agent.params.clear()
+        game_agent.params.update({heuristic: dict(weights) for heuristic, weights
+                                  in game_agent.DEFAULT_PARAMS.items()})
+        game_agent.load_params()
+
+    def test_clip(self):
+        """ Test the phase thresholds are kept ordered fractions """
+        self.assertEqual(tune.clip({"early_phase": -.5, "late_phase": 1.5, "diff_weight": -3.}),
+                         {"early_phase": 0., "late_phase": 1., "diff_weight": -3.})
+        self.assertEqual(tune.clip({"early_phase": .7, "late_phase": .4}),
+                         {"early_phase": .4, "late_phase": .4})
+
+    def test_spsa(self):
+        """ Test the sign and size of an SPSA step """
+        theta = dict(game_agent.params["conditional_score2"])
+        tuned = tune.spsa("conditional_score2", 1, 4, 1, None, a=.5, c=.5, seed=0)
+        # the winning side moves the weight by a * scale * .5 / c either way
+        self.assertAlmostEqual(tuned["prev_diff_weight"] - theta["prev_diff_weight"], .5)
+        for name in tune.PHASE_PARAMS:
+            self.assertAlmostEqual(abs(tuned[name] - theta[name]), .5 * tune.SCALES[name])
+
+    def test_output(self):
+        """ Test the tuned weights are merged into the parameter file """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "params.json")
+            with open(path, "w") as f:
+                json.dump({"move_diff_weighted": {"diff_weight": 2.5}}, f)
+            sys.argv = ["tune.py", "-i", "2", "-g", "2", "-s", "0", "-o", path]
+            tune.main()
+            with open(path) as f:
+                written = json.load(f)
+            game_agent.load_params(path)
+        self.assertEqual(written["move_diff_weighted"], {"diff_weight": 2.5})
+        self.assertEqual(sorted(written[game_agent.DEPLOYED_HEURISTIC]),
+                         game_agent.WEIGHTED_HEURISTICS[game_agent.DEPLOYED_HEURISTIC])
+        self.assertEqual(game_agent.params[game_agent.DEPLOYED_HEURISTIC],
+                         written[game_agent.DEPLOYED_HEURISTIC])
+        self.assertEqual(game_agent.params["move_diff_weighted"]["diff_weight"], 2.5)
+
+
+class NegamaxTest(unittest.TestCase):
+
+    def test_undo_move(self):
+        """ Test Board.undo_move restores the state and hash key """
+        board = isolation.Board("Player1", "Player2")
+        board.apply_move((2, 3))
+        board.apply_move((0, 0))
+        before = board.to_string(), board.hash_key(), board.get_legal_moves()
+        for move in board.get_legal_moves():
+            board.apply_move(move)
+            self.assertNotEqual(board.hash_key(), before[1])
+            self.assertEqual(board.undo_move(), move)
+            self.assertEqual((board.to_string(), board.hash_key(), board.get_legal_moves()), before)
+        self.assertEqual(board.forecast_move((4, 4)).hash_key(),
+                         board.forecast_move((4, 4)).copy().hash_key())
+
+    @timeout(5)
+    def test_negamax(self):
+        """ Test CustomPlayer.negamax finds the same score as alphabeta """
+        for depth in range(1, 5):
+            agentUT, board = self.initAUT(depth)
+            agentUT.time_left = lambda: 1e3
+            score, move = agentUT.alphabeta(board, depth)
+            negamax_score, negamax_move = agentUT.negamax(board, depth)
+            self.assertEqual(score, negamax_score)
+            self.assertIn(negamax_move, board.get_legal_moves())
+
+    @timeout(5)
+    def test_shared_engine(self):
+        """ Test the agent searches with the negamax engine of aimacode """
+        agentUT, board = self.initAUT(3)
+        agentUT.time_left = lambda: 1e3
+        self.assertIs(game_agent.NegamaxSearch, game_engine.NegamaxSearch)
+        score, move = agentUT.negamax(board, 3)
+        self.assertIsInstance(agentUT.engine, game_engine.NegamaxSearch)
+        self.assertIsInstance(agentUT.engine.table, game_engine.TranspositionTable)
+        # the searched states are stored, with the searched move at the root
+        entry = agentUT.engine.table.get(board.hash_key())
+        self.assertEqual((entry[0], entry[3]), (3, move))
+
+    def initAUT(self, depth):
+        reload(game_agent)
+        eval_fn = lambda game, player: float(
+            len(game.get_legal_moves(player)) -
+            len(game.get_legal_moves(game.get_opponent(player))))
+        agentUT = game_agent.CustomPlayer(depth, eval_fn, False, 'negamax')
+        board = isolation.Board(agentUT, 'null_agent', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((4, 4))
+        return agentUT, board
+
+
+class PonderTest(unittest.TestCase):
+
+    @timeout(5)
+    def test_ponder_hit(self):
+        """ Test CustomPlayer answers from the pondering search on a hit """
+        agentUT = game_agent.CustomPlayer(method='negamax', pondering=True,
+                                          score_fn=game_agent.move_diff_weighted)
+        board = isolation.Board(agentUT, 'null_agent', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((4, 4))
+        board.apply_move((0, 2))
+
+        agentUT.ponder(board.copy())
+        # poll without competing with the pondering thread for the GIL
+        while agentUT.ponder_result is None or agentUT.ponder_result[0] < 2:
+            time.sleep(.01)
+        agentUT.observe_move(agentUT.ponder_move)
+        self.assertTrue(agentUT.ponder_hit)
+        self.assertIsNone(agentUT.ponder_thread)
+
+        board.apply_move(agentUT.ponder_move)
+        legal_moves = board.get_legal_moves()
+        # no time is left to search; the pondered move must be returned
+        move = agentUT.get_move(board, legal_moves, lambda: 0)
+        self.assertEqual(move, agentUT.ponder_result[2])
+        self.assertIn(move, legal_moves)
+
+        # with time left, the search deepens past the pondered iterations
+        agentUT.ponder_hit = True
+        pondered_depth = agentUT.ponder_result[0]
+        searched = []
+        search = agentUT.search
+        agentUT.search = lambda game, depth=None, time_left=None: \
+            searched.append(depth) or search(game, depth, time_left)
+        timer_start = curr_time_millis()
+        time_left = lambda: 100 - (curr_time_millis() - timer_start)
+        move = agentUT.get_move(board, legal_moves, time_left)
+        self.assertIn(move, legal_moves)
+        self.assertEqual(searched[0], pondered_depth + 1)
+
+    @timeout(10)
+    def test_ponder_reuse(self):
+        """ Test a ponder hit reaches deeper than a cold search on the same budget """
+        def searched_depths(agentUT, board):
+            """ Return the first depth searched and the deepest completed """
+            # a timer counting the calls made by the search instead of
+            # milliseconds, so that both searches get the same budget
+            calls = [0]
+            def time_left():
+                calls[0] += 1
+                return 200 - calls[0]
+            started, completed = [], [0]
+            search = agentUT.search
+            def counted_search(game, depth=None, time_left=None):
+                started.append(depth)
+                result = search(game, depth, time_left)
+                completed.append(depth)
+                return result
+            agentUT.search = counted_search
+            agentUT.get_move(board, board.get_legal_moves(), time_left)
+            return started[0], max(completed)
+
+        def play(agentUT, moves):
+            board = isolation.Board(agentUT, 'null_agent', 7, 7)
+            for move in moves:
+                board.apply_move(move)
+            return board
+
+        agentUT = game_agent.CustomPlayer(method='alphabeta', pondering=True,
+                                          score_fn=game_agent.move_diff_weighted)
+        moves = [(2, 3), (4, 4), (0, 2)]
+        board = play(agentUT, moves)
+        agentUT.ponder(board.copy())
+        while agentUT.ponder_result is None or agentUT.ponder_result[0] < 5:
+            time.sleep(.01)
+        agentUT.observe_move(agentUT.ponder_move)
+        board.apply_move(agentUT.ponder_move)
+        pondered_depth = agentUT.ponder_result[0]
+
+        cold = game_agent.CustomPlayer(method='alphabeta', score_fn=game_agent.move_diff_weighted)
+        _, cold_depth = searched_depths(cold, play(cold, moves + [agentUT.ponder_move]))
+        first_depth, hit_depth = searched_depths(agentUT, board)
+        # the pondered iterations are not searched again, so the answer
+        # comes from deeper iterations than the cold search completes
+        self.assertEqual(first_depth, pondered_depth + 1)
+        self.assertGreater(max(hit_depth, pondered_depth), cold_depth)
+
+    @timeout(5)
+    def test_ponder_miss(self):
+        """ Test CustomPlayer searches normally when the prediction is wrong """
+        agentUT = game_agent.CustomPlayer(method='alphabeta', pondering=True,
+                                          score_fn=game_agent.move_diff_weighted)
+        board = isolation.Board(agentUT, 'null_agent', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((4, 4))
+        board.apply_move((0, 2))
+
+        agentUT.ponder(board.copy())
+        reply = [m for m in board.get_legal_moves() if m != agentUT.ponder_move][0]
+        agentUT.observe_move(reply)
+        self.assertFalse(agentUT.ponder_hit)
+
+        board.apply_move(reply)
+        legal_moves = board.get_legal_moves()
+        timer_start = curr_time_millis()
+        time_left = lambda: 100 - (curr_time_millis() - timer_start)
+        move = agentUT.get_move(board, legal_moves, time_left)
+        self.assertIn(move, legal_moves)
+
+
+    @timeout(5)
+    def test_ponder_mcts(self):
+        """ Test the MCTS tree pondered before a reply is reused on a miss """
+        agentUT = game_agent.CustomPlayer(method='mcts', pondering=True)
+        board = isolation.Board(agentUT, 'null_agent', 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((4, 4))
+        board.apply_move((0, 2))
+
+        agentUT.ponder(board.copy())
+        time.sleep(.05)
+        reply = board.get_legal_moves()[-1]
+        agentUT.observe_move(reply)
+        self.assertFalse(agentUT.ponder_hit)
+
+        board.apply_move(reply)
+        root = agentUT.tree._reuse_root(mcts.RolloutBoard.from_board(board))
+        self.assertIsNotNone(root)
+        self.assertGreater(root.visits, 0)
+
+
+class LargeBoardTest(unittest.TestCase):
+
+    def test_blank_spaces(self):
+        """ Test the blank spaces are maintained by apply_move and undo_move """
+        board = isolation.Board("Player1", "Player2", 9, 6)
+        board.apply_move((2, 3))
+        board.apply_move((0, 0))
+        copied = board.copy()
+        board.apply_move(board.get_legal_moves()[0])
+        board.undo_move()
+        for b in (board, copied):
+            expected = [(i, j) for j in range(b.width) for i in range(b.height)
+                        if b.__board_state__[i][j] == isolation.Board.BLANK]
+            self.assertEqual(b.get_blank_spaces(), sorted(expected))
+
+    def test_move_candidates(self):
+        """ Test first move candidates are distinct up to board symmetries """
+        self.assertEqual(len(isolation.Board("Player1", "Player2", 32, 32).get_move_candidates()),
+                         16 * 17 // 2)
+        self.assertEqual(len(isolation.Board("Player1", "Player2", 8, 5).get_move_candidates()),
+                         4 * 3)
+        board = isolation.Board("Player1", "Player2", 7, 7)
+        board.apply_move((3, 3))
+        self.assertEqual(len(board.get_move_candidates()), 9)
+        board.apply_move((0, 1))
+        self.assertEqual(board.get_move_candidates(), board.get_legal_moves())
+
+    @timeout(5)
+    def test_search_first_move(self):
+        """ Test the first move on a 7x7 board is searched over the candidates """
+        for method in ('minimax', 'alphabeta', 'negamax', 'mcts'):
+            agentUT = game_agent.CustomPlayer(method=method)
+            agentUT.first_move = lambda game, legal_moves: self.fail("first move not searched")
+            board = isolation.Board(agentUT, "Player2", 7, 7)
+            timer_start = curr_time_millis()
+            time_left = lambda: 100 - (curr_time_millis() - timer_start)
+            move = agentUT.get_move(board, board.get_legal_moves(), time_left)
+            self.assertIn(move, board.get_move_candidates())
+            agentUT.close()
+
+    @timeout(5)
+    def test_first_move(self):
+        """ Test the first move on a 32x32 board is returned in time """
+        agentUT = game_agent.CustomPlayer(method='alphabeta')
+        for first in (True, False):
+            players = (agentUT, "Player2") if first else ("Player1", agentUT)
+            board = isolation.Board(*players, width=32, height=32)
+            if not first:
+                board.apply_move((16, 16))
+            legal_moves = board.get_legal_moves()
+            timer_start = curr_time_millis()
+            time_left = lambda: 150 - (curr_time_millis() - timer_start)
+            move = agentUT.get_move(board, legal_moves, time_left)
+            self.assertIn(move, legal_moves)
+            self.assertGreater(time_left(), 0)
+
+
+class SlowPlayer(sample_players.RandomPlayer):
+    """Player that never returns its move in time."""
+
+    def get_move(self, game, legal_moves, time_left):
+        time.sleep(.5)
+        return super(SlowPlayer, self).get_move(game, legal_moves, time_left)
+
+
+class ServerTest(unittest.TestCase):
+
+    def play(self, players, time_limit=50, dropped=0):
+        """Play one match between remote players on a match server running
+        in a background thread and return the results of the players, after
+        `dropped` agents joined and disconnected before being paired.
+        """
+        loop = asyncio.new_event_loop()
+        match_server = server.MatchServer(time_limit)
+        port = loop.run_until_complete(match_server.start())
+        server_thread = Thread(target=loop.run_forever, daemon=True)
+        server_thread.start()
+
+        for _ in range(dropped):
+            with socket.create_connection(('127.0.0.1', port)) as sock:
+                sock.sendall(b"JOIN Dropped\n")
+            time.sleep(.05)
+
+        results = [None] * len(players)
+
+        def run(index):
+            results[index] = server.play_remote(players[index], "Player{}".format(index), port=port)
+
+        threads = [Thread(target=run, args=(i,)) for i in range(len(players))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        asyncio.run_coroutine_threadsafe(match_server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        server_thread.join()
+        loop.close()
+        return results, match_server.results
+
+    @timeout(10)
+    def test_match(self):
+        """ Test a match between remote agents is played to the end """
+        results, server_results = self.play([sample_players.RandomPlayer(),
+                                             sample_players.GreedyPlayer()])
+        self.assertEqual(sorted(result for result, _ in results), ["LOSS", "WIN"])
+        self.assertEqual(len(server_results), 1)
+        self.assertEqual(server_results[0][2], "no legal moves")
+
+    @timeout(10)
+    def test_dropped_agent(self):
+        """ Test an agent that disconnected while waiting is not paired """
+        results, server_results = self.play([sample_players.RandomPlayer(),
+                                             sample_players.GreedyPlayer()], dropped=1)
+        self.assertEqual(sorted(result for result, _ in results), ["LOSS", "WIN"])
+        self.assertEqual(server_results[0][2], "no legal moves")
+
+    @timeout(10)
+    def test_timeout(self):
+        """ Test the server enforces the time limit on its side """
+        results, server_results = self.play([SlowPlayer(), sample_players.RandomPlayer()])
+        self.assertEqual(results[0], ("LOSS", "timeout"))
+        self.assertEqual(results[1], ("WIN", "timeout"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,192 @@
+"""
+Micro-benchmarks of the Isolation board primitives, the heuristic evaluation
+functions, and the search throughput of the alpha-beta agent.
+
+The benchmarks run on a fixed set of positions, generated from seeded random
+move sequences, so that results are comparable between runs. The results are
+written to a JSON file; pass the file of a previous run with -b to print the
+relative change of every measurement and track regressions:
+
+    python benchmark.py -o before.json
+    (change the board or a heuristic)
+    python benchmark.py -o after.json -b before.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+
+import game_agent
+import sample_players
+from isolation import Board
+from game_agent import CustomPlayer
+
+# (seed, number of random moves) of the benchmark positions
+POSITIONS = [(0, 2), (1, 8), (2, 16), (3, 24)]
+
+# heuristic evaluation functions to benchmark, by module
+HEURISTICS = [
+    (game_agent, ["custom_score", "avoid_edges", "conditional_score",
+                  "conditional_score2", "move_diff_weighted",
+                  "move_prev_diff_weighted"]),
+    (sample_players, ["null_score", "open_move_score", "improved_score"]),
+]
+
+DEPTHS = [1, 2, 3, 4, 5]
+
+
+class CountingBoard(Board):
+    """Board that counts the number of nodes generated with forecast_move()
+    during a search in a counter shared by all of its copies.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingBoard, self).__init__(*args, **kwargs)
+        self.counter = [0]
+
+    def copy(self):
+        new_board = super(CountingBoard, self).copy()
+        new_board.__class__ = CountingBoard
+        new_board.counter = self.counter
+        return new_board
+
+    def forecast_move(self, move):
+        self.counter[0] += 1
+        return super(CountingBoard, self).forecast_move(move)
+
+
+def make_position(seed, num_moves, player_1="Player1", player_2="Player2",
+                  board_class=Board):
+    """Create a board by playing `num_moves` seeded random moves, stopping
+    early if the player to move has no legal moves left.
+    """
+    rng = random.Random(seed)
+    board = board_class(player_1, player_2)
+    for _ in range(num_moves):
+        moves = board.get_legal_moves()
+        if len(moves) < 2:
+            break
+        board.apply_move(rng.choice(moves))
+    return board
+
+
+def time_call(fn, number, repeat=5):
+    """Return the best time per call of fn() in microseconds."""
+    return 1e6 * min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def bench_board(number):
+    """Time the board primitives on every benchmark position."""
+    results = {}
+    for seed, num_moves in POSITIONS:
+        board = make_position(seed, num_moves)
+        move = board.get_legal_moves()[0]
+        player = board.active_player
+        results["position_{}_{}".format(seed, num_moves)] = {
+            "copy": time_call(board.copy, number),
+            "forecast_move": time_call(lambda: board.forecast_move(move), number),
+            "get_legal_moves": time_call(board.get_legal_moves, number),
+            "utility": time_call(lambda: board.utility(player), number),
+        }
+    return results
+
+
+def bench_heuristics(number):
+    """Time every heuristic on every benchmark position."""
+    results = {}
+    for module, names in HEURISTICS:
+        for name in names:
+            fn = getattr(module, name)
+            timings = {}
+            for seed, num_moves in POSITIONS:
+                board = make_position(seed, num_moves)
+                player = board.active_player
+                timings["position_{}_{}".format(seed, num_moves)] = \
+                    time_call(lambda: fn(board, player), number)
+            results["{}.{}".format(module.__name__, name)] = timings
+    return results
+
+
+def bench_search(depths, score_fn=sample_players.improved_score):
+    """Measure the nodes per second of a fixed-depth alpha-beta search from
+    every benchmark position.
+    """
+    results = {}
+    for depth in depths:
+        nodes = 0
+        elapsed = 0.
+        for seed, num_moves in POSITIONS:
+            agent = CustomPlayer(depth, score_fn, iterative=False, method='alphabeta')
+            agent.time_left = lambda: float("inf")
+            board = make_position(seed, num_moves, agent, "Player2", CountingBoard)
+            if board.active_player != agent:
+                board = make_position(seed, num_moves, "Player1", agent, CountingBoard)
+            start = time.perf_counter()
+            agent.alphabeta(board, depth)
+            elapsed += time.perf_counter() - start
+            nodes += board.counter[0]
+        results["depth_{}".format(depth)] = {
+            "nodes": nodes,
+            "seconds": elapsed,
+            "nodes_per_second": nodes / elapsed if elapsed else 0.,
+        }
+    return results
+
+
+def compare(results, baseline, path=()):
+    """Print the relative change of every measurement in results from the
+    same measurement in baseline.
+    """
+    for key, value in sorted(results.items()):
+        if key not in baseline or key == "meta":
+            continue
+        if isinstance(value, dict):
+            compare(value, baseline[key], path + (key,))
+        elif isinstance(value, (int, float)) and baseline[key]:
+            change = 100. * (value - baseline[key]) / baseline[key]
+            print("{:<70}{:>12.3f}{:>+10.1f}%".format(
+                "/".join(path + (key,)), value, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Isolation board, " +
+        "heuristics and alpha-beta search throughput.")
+    parser.add_argument('-o', '--output', default="benchmark.json",
+                        help="JSON file to write the results to.")
+    parser.add_argument('-b', '--baseline',
+                        help="JSON results of a previous run to compare with.")
+    parser.add_argument('-n', '--number', type=int, default=1000,
+                        help="Number of calls per timing of the primitives and heuristics.")
+    parser.add_argument('-d', '--depths', nargs="+", type=int, default=DEPTHS,
+                        help="Alpha-beta search depths.")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "units": "microseconds per call; search in nodes per second",
+        },
+        "board": bench_board(args.number),
+        "heuristics": bench_heuristics(args.number),
+        "search": bench_search(args.depths),
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+    print("Wrote benchmark results to {}".format(args.output))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\n{:<70}{:>12}{:>11}".format("Measurement", "Value", "Change"))
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
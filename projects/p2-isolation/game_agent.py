@@ -6,7 +6,20 @@ augment the test suite with your own test cases to further test your code.
 You must test your agent's strength against a set of agents with known
 relative strength using tournament.py and include the results in your report.
 """
+import json
+import os
 import random
+import sys
+import threading
+
+from mcts import MCTS
+
+# the negamax search engine is shared with the games of the aimacode library
+# of the planning project, which is added to the path as in its tests
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "p3-planning", "aimacode"))
+from game_engine import NegamaxSearch, TranspositionTable
+from game_engine import Timeout as EngineTimeout
 
 
 class Timeout(Exception):
@@ -14,6 +27,84 @@ class Timeout(Exception):
     pass
 
 
+# boards with more cells than this get a one-ply evaluation of the first move
+# of the agent (see `CustomPlayer.first_move()`) instead of a search
+FIRST_MOVE_SEARCH_CELLS = 144
+
+
+# hand-picked weights of the heuristic evaluation functions, with a namespace
+# per weighted heuristic so that tuning one of them does not change another;
+# `tune.py` writes weights tuned by self-play to PARAMS_FILE, which overrides
+# these defaults when the module is imported
+DEFAULT_PARAMS = {
+    "avoid_edges": {
+        "edges_high": 2.,
+        "edges_medium": 1.,
+        "edges_low": 3.,
+    },
+    "move_diff_weighted": {
+        "diff_weight": 1.,
+    },
+    "conditional_score": {
+        "early_phase": .2,
+        "late_phase": .8,
+        "late_edges_high": 3.,
+        "late_edges_medium": 1.,
+        "late_edges_low": 5.,
+    },
+    "conditional_score2": {
+        "early_phase": .2,
+        "late_phase": .8,
+        "prev_diff_weight": 1.,
+    },
+}
+
+# the weighted heuristic used by `custom_score`, which is the one played by
+# the agent and tuned by default by `tune.py`
+DEPLOYED_HEURISTIC = "conditional_score2"
+
+PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heuristic_params.json")
+
+params = {heuristic: dict(weights) for heuristic, weights in DEFAULT_PARAMS.items()}
+
+# names of the `params` entries used by each weighted heuristic
+WEIGHTED_HEURISTICS = {heuristic: sorted(weights) for heuristic, weights in DEFAULT_PARAMS.items()}
+
+
+def load_params(path=PARAMS_FILE):
+    """Update the heuristic weights in `params` from a JSON parameter file.
+
+    Parameters
+    ----------
+    path : str (optional)
+        The path of a JSON file mapping names of weighted heuristics to
+        objects that map names of their `DEFAULT_PARAMS` weights to values.
+
+    Returns
+    -------
+    dict
+        The updated `params`; unchanged if the file does not exist.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            loaded = json.load(f)
+        unknown = []
+        for heuristic, weights in loaded.items():
+            if heuristic not in DEFAULT_PARAMS:
+                unknown.append(heuristic)
+            else:
+                unknown.extend("{}.{}".format(heuristic, name) for name in weights
+                               if name not in DEFAULT_PARAMS[heuristic])
+        if unknown:
+            raise ValueError("Unknown heuristic parameters: {}".format(sorted(unknown)))
+        for heuristic, weights in loaded.items():
+            params[heuristic].update(weights)
+    return params
+
+
+load_params()
+
+
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -46,7 +137,51 @@ def custom_score(game, player):
     score = float(conditional_score2(game, player))
     return score
 
-def avoid_edges(game, player, high=2, medium=1, low=3):
+def weighted_score(heuristic, weights=None):
+    """Create a heuristic evaluation function from one of the weighted
+    heuristics of this module, using the given weights instead of `params`.
+    This is used by `tune.py` to compare different weights in self-play.
+
+    Parameters
+    ----------
+    heuristic : str
+        The name of the weighted heuristic, a key of `WEIGHTED_HEURISTICS`.
+
+    weights : dict (optional)
+        Weights overriding the entries of `params` for the heuristic.
+
+    Returns
+    -------
+    callable
+        A score function with the same interface as `custom_score`.
+    """
+    if heuristic not in WEIGHTED_HEURISTICS:
+        raise ValueError("Unknown weighted heuristic: {}".format(heuristic))
+    w = dict(params[heuristic], **(weights or {}))
+
+    def score(game, player):
+        if game.is_loser(player):
+            return float("-inf")
+
+        if game.is_winner(player):
+            return float("inf")
+
+        if heuristic == 'avoid_edges':
+            return float(avoid_edges(game, player, w["edges_high"], w["edges_medium"], w["edges_low"]))
+        elif heuristic == 'move_diff_weighted':
+            return move_diff_weighted(game, player, w["diff_weight"])
+        elif heuristic == 'conditional_score':
+            return float(conditional_score(game, player, w))
+        return float(conditional_score2(game, player, w))
+
+    return score
+
+def avoid_edges(game, player, high=None, medium=None, low=None):
+    w = params["avoid_edges"]
+    high = w["edges_high"] if high is None else high
+    medium = w["edges_medium"] if medium is None else medium
+    low = w["edges_low"] if low is None else low
+
     own_moves = game.get_legal_moves(player)
     opp_moves = game.get_legal_moves(game.get_opponent(player))
 
@@ -74,42 +209,172 @@ def _count_position_moves(player_moves, width, height):
 
     return moves
 
-def conditional_score(game, player):
+def conditional_score(game, player, weights=None):
+    w = params["conditional_score"] if weights is None else weights
     own_moves = len(game.get_legal_moves(player))
     opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     board_size = game.width * game.height
 
-    if game.move_count < board_size * .2:
+    if game.move_count < board_size * w["early_phase"]:
         return own_moves
-    elif game.move_count < board_size * .8:
+    elif game.move_count < board_size * w["late_phase"]:
         return own_moves / (board_size + opp_moves)
     else:
-        return avoid_edges(game, player, 3, 1, 5)
+        return avoid_edges(game, player, w["late_edges_high"], w["late_edges_medium"], w["late_edges_low"])
 
-def conditional_score2(game, player):
+def conditional_score2(game, player, weights=None):
+    w = params["conditional_score2"] if weights is None else weights
     own_moves = len(game.get_legal_moves(player))
     opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     board_size = game.width * game.height
 
-    if game.move_count < board_size * .2:
+    if game.move_count < board_size * w["early_phase"]:
         return own_moves
-    elif game.move_count < board_size * .8:
+    elif game.move_count < board_size * w["late_phase"]:
         return own_moves / (board_size + opp_moves)
     else:
-        return own_moves + (opp_moves_previous - opp_moves)
+        return own_moves + w["prev_diff_weight"] * (opp_moves_previous - opp_moves)
 
-def move_diff_weighted(game, player, weight=1):
+def move_diff_weighted(game, player, weight=None):
+    weight = params["move_diff_weighted"]["diff_weight"] if weight is None else weight
     own_moves = len(game.get_legal_moves(player))
     opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves - weight * opp_moves)
 
-# define the opponent's previously open moves
+# the number of legal moves of the opponent at the root of the last search,
+# set by `CustomPlayer.get_move()`
 opp_moves_previous = 0
 def move_prev_diff_weighted(game, player, weight=1):
     own_moves = len(game.get_legal_moves(player))
     opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves + weight * (opp_moves_previous - opp_moves))
 
+class TimeManager:
+    """Budget the iterations of an iterative deepening search within a turn.
+
+    The cost of the next iteration is predicted from the duration of the
+    previous iterations: the ratio of the last two iteration times estimates
+    the effective branching factor of the search, and before two iterations
+    have completed the branching factor of the root position is used
+    instead (its square root for alpha-beta, which ideally only explores
+    about that many children per node).
+
+    The search stops as soon as the next iteration is not predicted to
+    finish before the timer threshold, instead of raising `Timeout` halfway
+    through it. Since the prediction is rough, the next iteration must
+    normally fit in the remaining time with a safety margin. When the best
+    move changed in the last iteration the position is considered critical,
+    and the budget is extended to the whole remaining time: the iteration is
+    started if its plain prediction fits. An iteration that is predicted not
+    to finish is never started, since its time would be wasted.
+
+    Parameters
+    ----------
+    time_left : callable
+        A function that returns the number of milliseconds left in the
+        current turn.
+
+    threshold : float
+        Time remaining (in milliseconds) when search is aborted.
+
+    branching : int
+        The number of legal moves at the root of the search.
+
+    method : {'minimax', 'alphabeta'} (optional)
+        The name of the search method used for the iterations.
+
+    safety : float (optional)
+        Factor applied to the predicted cost of the next iteration when the
+        best move is stable.
+    """
+
+    def __init__(self, time_left, threshold, branching, method='minimax',
+                 safety=1.5):
+        self.time_left = time_left
+        self.threshold = threshold
+        self.branching = float(max(branching, 1))
+        if method == 'alphabeta':
+            self.branching = max(self.branching ** .5, 1.)
+        self.safety = safety
+        self.iteration_times = []
+        self.best_moves = []
+        self.iteration_start = None
+
+    def start_iteration(self):
+        """Mark the start of a new search iteration."""
+        self.iteration_start = self.time_left()
+
+    def end_iteration(self, best_move):
+        """Record the duration and the best move of the completed iteration."""
+        self.iteration_times.append(self.iteration_start - self.time_left())
+        self.best_moves.append(best_move)
+
+    def branching_factor(self):
+        """Estimate the effective branching factor of the search from the
+        growth of the iteration times.
+        """
+        if len(self.iteration_times) > 1 and self.iteration_times[-2] > 0:
+            return max(self.iteration_times[-1] / self.iteration_times[-2], 1.)
+        return self.branching
+
+    def predict_next(self):
+        """Predict the duration (in milliseconds) of the next iteration."""
+        if not self.iteration_times:
+            return 0.
+        return self.iteration_times[-1] * self.branching_factor()
+
+    def is_unstable(self):
+        """Test whether the best move changed in the last iteration."""
+        return len(self.best_moves) > 1 and self.best_moves[-1] != self.best_moves[-2]
+
+    def should_continue(self):
+        """Test whether another iteration should be started.
+
+        Returns
+        -------
+        bool
+            False if the next iteration is not expected to finish before the
+            timer threshold is reached, True otherwise.
+        """
+        remaining = self.time_left() - self.threshold
+        if remaining <= 0:
+            return False
+        predicted = self.predict_next()
+        if not self.is_unstable():
+            predicted *= self.safety
+        return predicted < remaining
+
+
+class IsolationGame:
+    """Adapter of `isolation.Board` to the game interface searched by
+    `game_engine.NegamaxSearch`. The states are boards, which are modified
+    in place by `make()` and restored by `unmake()`.
+    """
+
+    def actions(self, state):
+        # equivalent moves lead to symmetric states with the same value
+        return state.get_move_candidates()
+
+    def make(self, state, move):
+        state.apply_move(move)
+        return state
+
+    def unmake(self, state, move):
+        state.undo_move()
+
+    def terminal_test(self, state):
+        return not state.get_legal_moves()
+
+    def utility(self, state, player):
+        return state.utility(player)
+
+    def to_move(self, state):
+        return state.active_player
+
+    def hash_key(self, state):
+        return state.hash_key()
+
+
 class CustomPlayer:
     """Game-playing agent that chooses a move using your evaluation function
     and a depth-limited minimax algorithm with alpha-beta pruning. You must
@@ -131,23 +396,62 @@ class CustomPlayer:
         Flag indicating whether to perform fixed-depth search (False) or
         iterative deepening search (True).
 
-    method : {'minimax', 'alphabeta'} (optional)
+    method : {'minimax', 'alphabeta', 'negamax', 'mcts'} (optional)
         The name of the search method to use in get_move().
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    adaptive : boolean (optional)
+        Flag indicating whether iterative deepening should use a `TimeManager`
+        to stop before starting an iteration that cannot finish in time;
+        otherwise it deepens until `Timeout` is raised.
+
+    exploration : float (optional)
+        The exploration constant of the UCT formula used by 'mcts'.
+
+    rollout_batch : int (optional)
+        The number of random rollouts played from each node expanded by
+        'mcts'.
+
+    rollout_workers : int (optional)
+        The number of worker processes playing the rollouts of a batch for
+        'mcts'; rollouts are played in the agent's process if 0 or if
+        rollout_batch is 1. Call `close()` to stop the processes when the
+        agent is no longer used.
+
+    pondering : boolean (optional)
+        Flag indicating whether the agent searches the predicted position
+        after the opponent's reply while the opponent is thinking (see
+        `ponder()`). Off by default: the search runs in a thread, which only
+        uses idle time when the opponent plays in another process (e.g. with
+        `server.py`); in the same process it takes the interpreter lock from
+        the opponent's search.
     """
 
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10.):
+                 iterative=True, method='minimax', timeout=10.,
+                 adaptive=False, exploration=2 ** .5, rollout_batch=1,
+                 rollout_workers=0, pondering=False):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
         self.method = method
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.adaptive = adaptive
+        self.engine = None
+        self.tree = None
+        self.pondering = pondering
+        self.ponder_thread = None
+        self.ponder_stop = None
+        self.ponder_move = None
+        self.ponder_result = None
+        self.ponder_hit = False
+        if method == 'mcts':
+            self.tree = MCTS(exploration, rollout_batch, rollout_workers)
 
     def get_move(self, game, legal_moves, time_left):
         """Search for the best move from the available legal moves and return a
@@ -185,10 +489,21 @@ class CustomPlayer:
             (-1, -1) if there are no available legal moves.
         """
 
+        self.stop_pondering()
+        pondered = None
+        if self.ponder_hit and self.ponder_result is not None and \
+                self.ponder_result[2] in legal_moves:
+            # the opponent played the predicted move, and the search on the
+            # opponent's time already completed the first iterations
+            pondered = self.ponder_result
+        self.ponder_hit = False
+
         self.time_left = time_left
 
+        # the late phase of conditional_score2 rewards the moves that the
+        # search takes away from the opponent since this position
         global opp_moves_previous
-        opp_moves = len(game.get_legal_moves(game.get_opponent(self)))
+        opp_moves_previous = len(game.get_legal_moves(game.get_opponent(self)))
 
         # Perform any required initializations, including selecting an initial
         # move from the game board (i.e., an opening book), or returning
@@ -197,10 +512,13 @@ class CustomPlayer:
         if len(legal_moves) == 0:
             return (-1, -1)
 
-        # pick the center spot
-        #if (game.move_count == 1) and \
-        #    ((int(game.width / 2), int(game.height / 2)) in legal_moves):
-        #    return (int(game.width / 2), int(game.height / 2))
+        # before the agent's first move every blank space is a legal move;
+        # the search only tries moves that are distinct up to the symmetries
+        # of the board (see `root_moves()`), which is still too wide to
+        # search on large boards
+        if game.get_player_location(self) is None and \
+                game.width * game.height > FIRST_MOVE_SEARCH_CELLS:
+            return self.first_move(game, legal_moves)
 
         # just for safety, grab a random move from the legal ones initially
         best_move = random.choice(legal_moves)
@@ -212,14 +530,33 @@ class CustomPlayer:
             # automatically catch the exception raised by the search method
             # when the timer gets close to expiring
 
-            if self.iterative:
+            if self.method == 'mcts':
+                # Monte Carlo Tree Search is an anytime algorithm; it runs
+                # its own iterations until the timer threshold is reached
+                _, best_move = self.search(game)
+            elif self.iterative:
                 depth = 1
                 # dummy initialization
                 best_score = 0
+                if pondered is not None:
+                    # continue deepening from the last pondered iteration
+                    depth, best_score, best_move = pondered
+                    depth += 1
+                manager = TimeManager(time_left, self.TIMER_THRESHOLD,
+                                      len(legal_moves), self.method)
                 # cutoff condition: realistically, since we maximize, it could only get to +inf
                 while (best_score is not float("-inf")) and (best_score is not float("inf")):
-                    best_score, best_move = max((best_score, best_move), self.search(game, depth))
+                    manager.start_iteration()
+                    score, move = self.search(game, depth)
+                    manager.end_iteration(move)
+                    best_score, best_move = max((best_score, best_move), (score, move))
                     depth += 1
+                    # stop early rather than throw away an iteration that
+                    # is predicted to run past the timer
+                    if self.adaptive and not manager.should_continue():
+                        break
+            elif pondered is not None and pondered[0] >= self.search_depth:
+                best_move = pondered[2]
             else:
                 _, best_move = self.search(game)
         except Timeout:
@@ -232,15 +569,259 @@ class CustomPlayer:
         # Return the best move from the last completed search iteration
         return best_move
 
-    def search(self, game, depth=None):
+    def root_moves(self, game):
+        """Return the moves of the agent searched at the root: its legal
+        moves, keeping only one move of each set of moves that are
+        equivalent under a symmetry of the board when the agent is to move
+        (see `isolation.Board.get_move_candidates()`).
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        Returns
+        -------
+        list<(int, int)>
+            The moves to search.
+        """
+        if game.active_player == self:
+            return game.get_move_candidates()
+        return game.get_legal_moves(self)
+
+    def first_move(self, game, legal_moves):
+        """Select the first move of the agent on boards larger than
+        `FIRST_MOVE_SEARCH_CELLS` with a one-ply evaluation of the candidate
+        moves that are distinct up to the symmetries of the board (see
+        `isolation.Board.get_move_candidates()`), stopping when the timer
+        threshold is reached.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves.
+
+        Returns
+        -------
+        (int, int)
+            The candidate move with the best score among those evaluated
+        """
+        legal = set(legal_moves)
+        candidates = [move for move in game.get_move_candidates() if move in legal]
+        if not candidates:
+            candidates = legal_moves
+
+        best_score, best_move = float("-inf"), candidates[0]
+        for move in candidates:
+            if self.time_left() < self.TIMER_THRESHOLD:
+                break
+            score = self.score(game.forecast_move(move), self)
+            if score > best_score:
+                best_score, best_move = score, move
+        return best_move
+
+    def ponder(self, game):
+        """Start searching on the opponent's time, in a background thread
+        until the opponent's move is known (see `observe_move()`).
+
+        The reply of the opponent is predicted, and the position after it is
+        searched by iterative deepening; if the prediction is right, the
+        next `get_move()` continues deepening from the last pondered
+        iteration. The transposition table of the 'negamax' method stays
+        warm even if the prediction is wrong. The 'mcts' method does not
+        predict the reply: it searches the position with the opponent to
+        move, and the next search reuses the subtree of the reply played.
+
+        Does nothing unless the agent was created with `pondering=True`.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            A copy of the board with the opponent to move.
+        """
+        if not self.pondering:
+            return
+        self.stop_pondering()
+        if not game.get_legal_moves():
+            return
+
+        self.ponder_result = None
+        self.ponder_hit = False
+        self.ponder_stop = threading.Event()
+        if self.method == 'mcts':
+            self.ponder_move = None
+            target = self._ponder_mcts
+        else:
+            self.ponder_move = self.predict_move(game)
+            game = game.forecast_move(self.ponder_move)
+            target = self._ponder
+        self.ponder_thread = threading.Thread(target=target, args=(game, self.ponder_stop))
+        self.ponder_thread.daemon = True
+        self.ponder_thread.start()
+
+    def _ponder(self, game, stop):
+        """Iterative deepening search run by the pondering thread until
+        `stop` is set. The search gets its own timer, so that `time_left` of
+        the agent is only used by `get_move()`.
+        """
+        time_left = lambda: float("-inf") if stop.is_set() else float("inf")
+        try:
+            depth = 1
+            while not stop.is_set():
+                score, move = self.search(game, depth, time_left)
+                self.ponder_result = (depth, score, move)
+                if score == float("inf") or score == float("-inf"):
+                    break
+                depth += 1
+        except Timeout:
+            pass
+
+    def _ponder_mcts(self, game, stop):
+        """Monte Carlo Tree Search of the position with the opponent to move,
+        run by the pondering thread until `stop` is set.
+        """
+        time_left = lambda: float("-inf") if stop.is_set() else float("inf")
+        self.tree.search(game, time_left, self.TIMER_THRESHOLD, keep_root=True)
+
+    def observe_move(self, move):
+        """Receive the opponent's move, stop pondering and record whether the
+        predicted move was played.
+
+        Parameters
+        ----------
+        move : (int, int)
+            The move played by the opponent.
+        """
+        self.ponder_hit = self.ponder_thread is not None and move == self.ponder_move
+        self.stop_pondering()
+
+    def stop_pondering(self):
+        """Stop the pondering thread, if it is running."""
+        if self.ponder_thread is not None:
+            self.ponder_stop.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def close(self):
+        """Stop pondering and shut down the rollout worker processes of the
+        'mcts' method, if any were started. The agent can still be used
+        afterwards; the processes are started again when needed.
+        """
+        self.stop_pondering()
+        if self.tree is not None:
+            self.tree.close()
+
+    def predict_move(self, game):
+        """Predict the move of the player to move (the opponent); the best
+        move stored in the transposition table if the position was searched
+        by the 'negamax' method, otherwise the move with the best score for
+        the opponent.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` with the opponent to move.
+
+        Returns
+        -------
+        (int, int)
+            The predicted move of the opponent.
+        """
+        legal_moves = game.get_legal_moves()
+        if self.engine is not None:
+            entry = self.engine.table.get(game.hash_key())
+            if entry is not None and entry[3] in legal_moves:
+                return entry[3]
+        opponent = game.active_player
+        return max(legal_moves, key=lambda move: self.score(game.forecast_move(move), opponent))
+
+    def search(self, game, depth=None, time_left=None):
         if depth is None:
             depth = self.search_depth
         if self.method == 'minimax':
-            return self.minimax(game, depth)
+            return self.minimax(game, depth, time_left=time_left)
+        elif self.method == 'negamax':
+            return self.negamax(game, depth, time_left)
+        elif self.method == 'mcts':
+            return self.mcts(game, time_left)
         else:
-            return self.alphabeta(game, depth)
+            return self.alphabeta(game, depth, time_left=time_left)
+
+    def negamax(self, game, depth, time_left=None):
+        """Search the game tree with the negamax engine shared with the
+        aimacode games, which adds a transposition table (kept between the
+        moves of the agent) and move ordering to alpha-beta search.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state; the engine applies and undoes moves in place
+
+        depth : int
+            Depth is an integer representing the maximum number of plies to
+            search in the game tree before aborting
+
+        time_left : callable (optional)
+            The timer of the search; `self.time_left` if None
+
+        Returns
+        -------
+        float
+            The score for the current search branch
 
-    def minimax(self, game, depth, maximizing_player=True):
+        tuple(int, int)
+            The best move for the current branch; (-1, -1) for no legal moves
+        """
+        if self.engine is None:
+            self.engine = NegamaxSearch(IsolationGame(), self.score,
+                                        table=TranspositionTable(200000))
+        self.engine.time_left = time_left or self.time_left
+        self.engine.threshold = self.TIMER_THRESHOLD
+        try:
+            score, move = self.engine.search(game, depth)
+        except EngineTimeout:
+            raise Timeout()
+        return score, move if move is not None else (-1, -1)
+
+    def mcts(self, game, time_left=None):
+        """Run Monte Carlo Tree Search with UCT selection from the current game
+        state until the timer threshold is reached. The explored subtree of
+        the selected move is kept and reused on the next call if the
+        opponent's reply was explored.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state
+
+        time_left : callable (optional)
+            The timer of the search; `self.time_left` if None
+
+        Returns
+        -------
+        float
+            The fraction of the rollouts through the selected move that were
+            won by this player
+
+        tuple(int, int)
+            The most visited move at the root; (-1, -1) for no legal moves
+        """
+        if self.tree is None:
+            self.tree = MCTS()
+        root_moves = None
+        if game.get_player_location(self) is None:
+            root_moves = self.root_moves(game)
+        return self.tree.search(game, time_left or self.time_left, self.TIMER_THRESHOLD,
+                                root_moves=root_moves)
+
+    def minimax(self, game, depth, maximizing_player=True, time_left=None):
         """Implement the minimax search algorithm as described in the lectures.
 
         Parameters
@@ -257,6 +838,9 @@ class CustomPlayer:
             Flag indicating whether the current search depth corresponds to a
             maximizing layer (True) or a minimizing layer (False)
 
+        time_left : callable (optional)
+            The timer of the search; `self.time_left` if None
+
         Returns
         -------
         float
@@ -271,7 +855,8 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        time_left = time_left or self.time_left
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # initialize dummy best move
@@ -284,8 +869,8 @@ class CustomPlayer:
 
         if maximizing_player:
             best_score = float("-inf") # this is for clarity purposes, since it's already -inf
-            for move in game.get_legal_moves(self):
-                score = self.__min_value_mm(game.forecast_move(move), depth - 1)
+            for move in self.root_moves(game):
+                score = self.__min_value_mm(game.forecast_move(move), depth - 1, time_left)
                 # check if we get a better score for the current move
                 # if we do, update the best_score and the best_move with the current move
                 if score > best_score:
@@ -293,8 +878,8 @@ class CustomPlayer:
                     best_move = move
         else: # else, if we are the minimizing player, do the same thing but minimize the scores
             best_score = float("inf")
-            for move in game.get_legal_moves(self):
-                score = self.__max_value_mm(game.forecast_move(move), depth - 1)
+            for move in self.root_moves(game):
+                score = self.__max_value_mm(game.forecast_move(move), depth - 1, time_left)
                 # check if we get a better score for the current move
                 # if we do, update the best_score and the best_move with the current move
                 if score < best_score:
@@ -303,7 +888,7 @@ class CustomPlayer:
 
         return (best_score, best_move)
 
-    def __max_value_mm(self, game, depth):
+    def __max_value_mm(self, game, depth, time_left):
         """Max search for minimax. This function recursively searches for
         the maximum score that can be achieved from the current game state
 
@@ -317,12 +902,15 @@ class CustomPlayer:
             Depth is an integer representing the maximum number of plies to
             search in the game tree before aborting
 
+        time_left : callable
+            The timer of the search
+
         Returns
         -------
         float
             Max score of the search branch started at the current game state
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # if we reached a "terminal" state in terms of the depth we wanted to
@@ -335,11 +923,11 @@ class CustomPlayer:
 
         for move in game.get_legal_moves():
             # here we maximize the best score across the other possible branching min-nodes
-            best_score = max(best_score, self.__min_value_mm(game.forecast_move(move), depth - 1))
+            best_score = max(best_score, self.__min_value_mm(game.forecast_move(move), depth - 1, time_left))
 
         return best_score
 
-    def __min_value_mm(self, game, depth):
+    def __min_value_mm(self, game, depth, time_left):
         """Min search for minimax. This function recursively searches for
         the minimum score that can be achieved from the current game state
 
@@ -353,12 +941,15 @@ class CustomPlayer:
             Depth is an integer representing the maximum number of plies to
             search in the game tree before aborting
 
+        time_left : callable
+            The timer of the search
+
         Returns
         -------
         float
             Min score of the search branch started at the current game state
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # if we reached a "terminal" state in terms of the depth we wanted to
@@ -371,11 +962,12 @@ class CustomPlayer:
 
         for move in game.get_legal_moves():
             # here we minimize the best score across the other possible branching max-nodes
-            best_score = min(best_score, self.__max_value_mm(game.forecast_move(move), depth - 1))
+            best_score = min(best_score, self.__max_value_mm(game.forecast_move(move), depth - 1, time_left))
 
         return best_score
 
-    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
+    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True,
+                  time_left=None):
         """Implement minimax search with alpha-beta pruning as described in the
         lectures.
 
@@ -399,6 +991,9 @@ class CustomPlayer:
             Flag indicating whether the current search depth corresponds to a
             maximizing layer (True) or a minimizing layer (False)
 
+        time_left : callable (optional)
+            The timer of the search; `self.time_left` if None
+
         Returns
         -------
         float
@@ -413,7 +1008,8 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        time_left = time_left or self.time_left
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # initialize dummy best move
@@ -426,8 +1022,8 @@ class CustomPlayer:
 
         if maximizing_player:
             best_score = float("-inf") # this is for clarity purposes, since it's already -inf
-            for move in game.get_legal_moves(self):
-                score = self.__min_value_ab(game.forecast_move(move), depth - 1, alpha, beta)
+            for move in self.root_moves(game):
+                score = self.__min_value_ab(game.forecast_move(move), depth - 1, alpha, beta, time_left)
                 # check if we get a better score for the current move
                 # if we do, update the best_score and the best_move with the current move
                 if score > best_score:
@@ -439,8 +1035,8 @@ class CustomPlayer:
                 alpha = max(alpha, best_score)
         else: # else, if we are the minimizing player, do the same thing but minimize the scores
             best_score = float("inf")
-            for move in game.get_legal_moves(self):
-                score = self.__max_value_ab(game.forecast_move(move), depth - 1, alpha, beta)
+            for move in self.root_moves(game):
+                score = self.__max_value_ab(game.forecast_move(move), depth - 1, alpha, beta, time_left)
                 # check if we get a better score for the current move
                 # if we do, update the best_score and the best_move with the current move
                 if score < best_score:
@@ -453,7 +1049,7 @@ class CustomPlayer:
 
         return (best_score, best_move)
 
-    def __max_value_ab(self, game, depth, α, β):
+    def __max_value_ab(self, game, depth, α, β, time_left):
         """Max search for alpha-beta. This function recursively searches for
         the maximum score that can be achieved from the current game state, while
         pruning search branches that would not be considered by the above min-node
@@ -468,12 +1064,15 @@ class CustomPlayer:
             Depth is an integer representing the maximum number of plies to
             search in the game tree before aborting
 
+        time_left : callable
+            The timer of the search
+
         Returns
         -------
         float
             Max score of the search branch started at the current game state
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # if we reached a "terminal" state in terms of the depth we wanted to
@@ -486,7 +1085,7 @@ class CustomPlayer:
 
         for move in game.get_legal_moves():
             # here we maximize the best score across the other possible branching min-nodes
-            best_score = max(best_score, self.__min_value_ab(game.forecast_move(move), depth - 1, α, β))
+            best_score = max(best_score, self.__min_value_ab(game.forecast_move(move), depth - 1, α, β, time_left))
 
             # check if we can prune the remaining nodes
             if best_score >= β:
@@ -499,7 +1098,7 @@ class CustomPlayer:
 
         return best_score
 
-    def __min_value_ab(self, game, depth, α, β):
+    def __min_value_ab(self, game, depth, α, β, time_left):
         """Min search for alpha-beta. This function recursively searches for
         the minimum score that can be achieved from the current game state, while
         pruning search branches that would not be considered by the above max-node
@@ -514,12 +1113,15 @@ class CustomPlayer:
             Depth is an integer representing the maximum number of plies to
             search in the game tree before aborting
 
+        time_left : callable
+            The timer of the search
+
         Returns
         -------
         float
             Min score of the search branch started at the current game state
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
+        if time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
 
         # if we reached a "terminal" state in terms of the depth we wanted to
@@ -532,7 +1134,7 @@ class CustomPlayer:
 
         for move in game.get_legal_moves():
             # here we minimize the best score across the other possible branching max-nodes
-            best_score = min(best_score, self.__max_value_ab(game.forecast_move(move), depth - 1, α, β))
+            best_score = min(best_score, self.__max_value_ab(game.forecast_move(move), depth - 1, α, β, time_left))
 
             # check if we can prune the remaining nodes
             if best_score <= α:
@@ -8,14 +8,29 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 
+import random
 import timeit
 
-from copy import deepcopy
 from copy import copy
 
 
 TIME_LIMIT_MILLIS = 200
 
+# cache of Zobrist keys for the cells of each board size, keyed by
+# (width, height); the keys are seeded by the board size so that the hash
+# keys of positions are stable across processes
+_zobrist_keys = {}
+
+
+def zobrist_keys(width, height):
+    """Return a list of random 64-bit keys, one per cell of the board, in row
+    major order. `Board.hash_key()` combines the keys of the blocked cells.
+    """
+    if (width, height) not in _zobrist_keys:
+        rng = random.Random(width * 1000003 + height)
+        _zobrist_keys[(width, height)] = [rng.getrandbits(64) for _ in range(width * height)]
+    return _zobrist_keys[(width, height)]
+
 
 class Board(object):
     """
@@ -26,11 +41,13 @@ class Board(object):
     ----------
     player_1 : object
         An object with a get_move() function. This is the only function
-        directly called by the Board class for each player.
+        required by the Board class for each player; players may also
+        implement the pondering hooks called by `play()`.
 
     player_2 : object
         An object with a get_move() function. This is the only function
-        directly called by the Board class for each player.
+        required by the Board class for each player; players may also
+        implement the pondering hooks called by `play()`.
 
     width : int (optional)
         The number of columns that the board should have.
@@ -50,8 +67,11 @@ class Board(object):
         self.__active_player__ = player_1
         self.__inactive_player__ = player_2
         self.__board_state__ = [[Board.BLANK for i in range(width)] for j in range(height)]
+        self.__blank_spaces__ = set((i, j) for j in range(width) for i in range(height))
         self.__last_player_move__ = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
         self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
+        self.__blocked_key__ = 0
+        self.__undo_stack__ = []
 
     @property
     def active_player(self):
@@ -99,7 +119,9 @@ class Board(object):
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
+        new_board.__blank_spaces__ = set(self.__blank_spaces__)
+        new_board.__blocked_key__ = self.__blocked_key__
         return new_board
 
     def forecast_move(self, move):
@@ -144,10 +166,61 @@ class Board(object):
 
     def get_blank_spaces(self):
         """
-        Return a list of the locations that are still available on the board.
+        Return a list of the locations that are still available on the board,
+        in row order. The set of blank spaces is maintained by `apply_move()`,
+        so this does not scan the board.
+        """
+        return sorted(self.__blank_spaces__)
+
+    def get_symmetries(self):
+        """
+        Return the symmetries of the board that leave the current game state
+        unchanged, as functions mapping a (row, column) location to its
+        image. Only states where each player moved at most once (i.e., the
+        blocked cells are the player locations) are checked; otherwise
+        only the identity is returned.
+        """
+        h, w = self.height - 1, self.width - 1
+        transforms = [lambda r, c: (r, c),
+                      lambda r, c: (h - r, c),
+                      lambda r, c: (r, w - c),
+                      lambda r, c: (h - r, w - c)]
+        if self.width == self.height:
+            transforms += [lambda r, c: (c, r),
+                           lambda r, c: (w - c, h - r),
+                           lambda r, c: (c, h - r),
+                           lambda r, c: (w - c, r)]
+
+        locations = [loc for loc in self.__last_player_move__.values() if loc is not Board.NOT_MOVED]
+        if len(locations) != self.move_count:
+            return transforms[:1]
+        return [t for t in transforms if all(t(*loc) == loc for loc in locations)]
+
+    def get_move_candidates(self):
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-            if self.__board_state__[i][j] == Board.BLANK]
+        Return the legal moves of the active player, keeping only one move of
+        each set of moves that are equivalent under a symmetry of the game
+        state. This only reduces the moves before the active player's first
+        move, when every blank space is a legal move; otherwise it returns
+        the same list as `get_legal_moves()`.
+
+        Returns
+        ----------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of candidate moves.
+        """
+        if self.__last_player_move__[self.active_player] is not Board.NOT_MOVED:
+            return self.get_legal_moves()
+
+        symmetries = self.get_symmetries()[1:]
+        candidates = []
+        seen = set()
+        for move in sorted(self.__blank_spaces__):
+            if move in seen:
+                continue
+            candidates.append(move)
+            seen.update(t(*move) for t in symmetries)
+        return candidates
 
     def get_player_location(self, player):
         """
@@ -200,11 +273,43 @@ class Board(object):
         None
         """
         row, col = move
+        self.__undo_stack__.append(self.__last_player_move__[self.active_player])
         self.__last_player_move__[self.active_player] = move
         self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
+        self.__blank_spaces__.discard(move)
+        self.__blocked_key__ ^= zobrist_keys(self.width, self.height)[row * self.width + col]
         self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
         self.move_count += 1
 
+    def undo_move(self):
+        """
+        Undo the last move applied with `apply_move()` to this board (moves
+        applied before the board was copied cannot be undone).
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the undone move.
+        """
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        row, col = move = self.__last_player_move__[self.active_player]
+        self.__last_player_move__[self.active_player] = self.__undo_stack__.pop()
+        self.__board_state__[row][col] = Board.BLANK
+        self.__blank_spaces__.add(move)
+        self.__blocked_key__ ^= zobrist_keys(self.width, self.height)[row * self.width + col]
+        self.move_count -= 1
+        return move
+
+    def hash_key(self):
+        """
+        Return a hashable key identifying the current game state, which
+        includes the blocked cells and the locations of the active and the
+        inactive player.
+        """
+        return (self.__blocked_key__,
+                self.__last_player_move__[self.__active_player__],
+                self.__last_player_move__[self.__inactive_player__])
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
         return player == self.inactive_player and not self.get_legal_moves(self.active_player)
@@ -278,32 +383,32 @@ class Board(object):
         p1_loc = self.__last_player_move__[self.__player_1__]
         p2_loc = self.__last_player_move__[self.__player_2__]
 
-        out = ''
-
-        for i in range(self.height):
-            out += ' | '
-
-            for j in range(self.width):
-
-                if not self.__board_state__[i][j]:
-                    out += ' '
-                elif p1_loc and i == p1_loc[0] and j == p1_loc[1]:
-                    out += '1'
-                elif p2_loc and i == p2_loc[0] and j == p2_loc[1]:
-                    out += '2'
-                else:
-                    out += '-'
+        # build each row in a list buffer rather than concatenating strings
+        # cell by cell, which is quadratic in the size of the board
+        rows = []
 
-                out += ' | '
-            out += '\n\r'
+        for i, state_row in enumerate(self.__board_state__):
+            cells = [' ' if not state else '-' for state in state_row]
+            if p1_loc and p1_loc[0] == i and state_row[p1_loc[1]]:
+                cells[p1_loc[1]] = '1'
+            if p2_loc and p2_loc[0] == i and state_row[p2_loc[1]]:
+                cells[p2_loc[1]] = '2'
+            rows.append(' | ' + ' | '.join(cells) + ' | \n\r')
 
-        return out
+        return ''.join(rows)
 
     def play(self, time_limit=TIME_LIMIT_MILLIS):
         """
         Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
+        Players may optionally implement a pondering protocol to think on
+        their opponent's time: `ponder(game)` is called on the waiting
+        player with a copy of the board before the active player is asked
+        for its move, and must return immediately; `observe_move(move)` is
+        called on the waiting player with the move returned by the active
+        player, before the move is checked and applied.
+
         Parameters
         ----------
         time_limit : numeric (optional)
@@ -327,11 +432,18 @@ class Board(object):
 
             game_copy = self.copy()
 
+            # let the waiting player think on the opponent's time
+            if hasattr(self.inactive_player, 'ponder'):
+                self.inactive_player.ponder(self.copy())
+
             move_start = curr_time_millis()
             time_left = lambda : time_limit - (curr_time_millis() - move_start)
             curr_move = self.active_player.get_move(game_copy, legal_player_moves, time_left)
             move_end = time_left()
 
+            if hasattr(self.inactive_player, 'observe_move'):
+                self.inactive_player.observe_move(curr_move)
+
             # print move_end
 
             if curr_move is None:
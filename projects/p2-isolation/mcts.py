@@ -0,0 +1,352 @@
+"""This file contains a Monte Carlo Tree Search (MCTS) implementation for the
+game Isolation, used by `CustomPlayer` when the search method is 'mcts'.
+
+Random rollouts do not use `isolation.Board`, whose `copy()` deep copies the
+nested board lists on every ply. Instead, the position is converted once into
+a `RolloutBoard`, which stores the cells in a flat bytearray and looks up the
+knight moves of every cell in a table that is computed once per board size.
+"""
+import gc
+import math
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2),  (1, 2), (2, -1),  (2, 1)]
+
+# cache of knight move tables, keyed by (width, height)
+_neighbor_tables = {}
+
+
+def knight_neighbors(width, height):
+    """Return a list mapping each flat cell index (row * width + col) of a
+    board to the tuple of flat cell indices reachable with a knight move.
+    """
+    key = (width, height)
+    if key not in _neighbor_tables:
+        table = []
+        for idx in range(width * height):
+            r, c = divmod(idx, width)
+            table.append(tuple((r + dr) * width + c + dc for dr, dc in DIRECTIONS
+                               if 0 <= r + dr < height and 0 <= c + dc < width))
+        _neighbor_tables[key] = table
+    return _neighbor_tables[key]
+
+
+class RolloutBoard:
+    """Lightweight Isolation board used for tree traversal and random rollouts.
+
+    Cells and player locations are flat indices (row * width + col), and the
+    players are identified by their position in the `locations` list: index
+    0 holds the location of the player to move.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    cells : bytearray
+        One entry per cell of the board, nonzero if the cell is blocked.
+
+    locations : list<int or None>
+        The locations of the active and the inactive player; None if the
+        player has not moved yet.
+    """
+    __slots__ = ('width', 'height', 'cells', 'locations')
+
+    def __init__(self, width, height, cells, locations):
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.locations = locations
+
+    @classmethod
+    def from_board(cls, game):
+        """Create a `RolloutBoard` from an `isolation.Board` instance."""
+        cells = bytearray(1 if value else 0
+                          for row in game.__board_state__ for value in row)
+        locations = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            locations.append(None if loc is None else loc[0] * game.width + loc[1])
+        return cls(game.width, game.height, cells, locations)
+
+    def copy(self):
+        return RolloutBoard(self.width, self.height, bytearray(self.cells), list(self.locations))
+
+    def to_move(self, idx):
+        """Convert a flat cell index to a (row, col) move."""
+        return divmod(idx, self.width)
+
+    def get_legal_moves(self):
+        """Return the flat cell indices of the legal moves of the active player."""
+        cells = self.cells
+        loc = self.locations[0]
+        if loc is None:
+            return [idx for idx, blocked in enumerate(cells) if not blocked]
+        return [idx for idx in knight_neighbors(self.width, self.height)[loc] if not cells[idx]]
+
+    def apply_move(self, idx):
+        """Move the active player to the flat cell index `idx` and pass the
+        initiative to the other player.
+        """
+        self.cells[idx] = 1
+        self.locations = [self.locations[1], idx]
+
+    def rollout(self):
+        """Play random moves in place until one of the players cannot move.
+
+        Returns
+        -------
+        int
+            0 if the player to move at the start of the rollout wins, 1 if
+            the other player wins.
+        """
+        neighbors = knight_neighbors(self.width, self.height)
+        cells = self.cells
+        turn = 0
+        while True:
+            if self.locations[0] is None:
+                moves = self.get_legal_moves()
+            else:
+                moves = [idx for idx in neighbors[self.locations[0]] if not cells[idx]]
+            if not moves:
+                # the player to move loses
+                return 1 - turn
+            self.apply_move(random.choice(moves))
+            turn = 1 - turn
+
+
+def rollout_batch(board, count):
+    """Play `count` random rollouts from the given `RolloutBoard` and return
+    the number of them won by the player to move. This is a module level
+    function so that batches can be distributed to a process pool.
+    """
+    wins = 0
+    for _ in range(count):
+        if board.copy().rollout() == 0:
+            wins += 1
+    return wins
+
+
+class MCTSNode:
+    """Node of the Monte Carlo search tree.
+
+    `wins` counts the rollouts won by the player that made `move`, i.e., the
+    player that is *not* to move in the position of this node. Nodes do not
+    keep a reference to their parent, so that the tree has no reference
+    cycles and discarded subtrees are freed without the garbage collector.
+    """
+    __slots__ = ('move', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0
+
+    def select_child(self, exploration):
+        """Select the child with the highest upper confidence bound (UCT)."""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+    def add_child(self, move, untried):
+        child = MCTSNode(move, untried)
+        self.children.append(child)
+        return child
+
+    def find_child(self, move):
+        for child in self.children:
+            if child.move == move:
+                return child
+        return None
+
+
+class MCTS:
+    """Monte Carlo Tree Search with UCT selection and random rollouts.
+
+    The subtree below the chosen move is kept after every search and reused
+    for the next search if the position reached after the opponent's reply
+    is found in the tree.
+
+    Parameters
+    ----------
+    exploration : float (optional)
+        The exploration constant of the UCT formula.
+
+    batch_size : int (optional)
+        The number of rollouts played from every expanded node.
+
+    workers : int (optional)
+        The number of worker processes that play the rollouts of a batch; the
+        rollouts are played in the current process if 0, or if batches have a
+        single rollout. The processes are started by the first search that
+        uses them, and must be shut down with `close()` (or by using the
+        instance as a context manager).
+    """
+
+    def __init__(self, exploration=2 ** .5, batch_size=1, workers=0):
+        self.exploration = exploration
+        self.batch_size = batch_size
+        self.workers = workers if batch_size > 1 else 0
+        self.pool = None
+        self.root = None
+        self.root_board = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the rollout worker processes, if any were started."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def search(self, game, time_left, threshold, keep_root=False, root_moves=None):
+        """Run MCTS iterations from the current game state until the timer
+        threshold is reached.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn.
+
+        threshold : float
+            Time remaining (in milliseconds) when search is stopped.
+
+        keep_root : bool (optional)
+            Keep the tree rooted at the searched position, instead of the
+            subtree of the selected move, so that the next search reuses the
+            subtree of the move played from it (e.g., when searching on the
+            opponent's time before its move is known).
+
+        root_moves : list<(int, int)> (optional)
+            The moves to search at the root if the root is not reused from
+            the previous search; all legal moves if None.
+
+        Returns
+        -------
+        float
+            The fraction of rollouts won through the selected move
+
+        tuple(int, int)
+            The most visited move at the root; (-1, -1) for no legal moves
+        """
+        board = RolloutBoard.from_board(game)
+        root = self._reuse_root(board)
+        if root is None:
+            if root_moves is None:
+                root = MCTSNode(None, board.get_legal_moves())
+            else:
+                root = MCTSNode(None, [row * board.width + col for row, col in root_moves])
+
+        if not root.untried and not root.children:
+            return float("-inf"), (-1, -1)
+
+        # the tree allocates many small objects, which would trigger full
+        # collections of the (large, acyclic) tree in the middle of the turn;
+        # the collector is only paused for searches bounded by a turn, and
+        # not for searches without a time limit (e.g., when pondering)
+        gc_paused = gc.isenabled() and time_left() != float("inf")
+        if gc_paused:
+            gc.disable()
+        try:
+            while time_left() >= threshold:
+                self._iterate(root, board)
+        finally:
+            if gc_paused:
+                gc.enable()
+
+        if not root.children:
+            # no iteration finished in time
+            if keep_root:
+                self.root, self.root_board = root, board
+            return 0., board.to_move(root.untried[0])
+
+        best = max(root.children, key=lambda child: child.visits)
+        if keep_root:
+            self.root = root
+            self.root_board = board
+        else:
+            self.root = best
+            self.root_board = board.copy()
+            self.root_board.apply_move(best.move)
+        return best.wins / best.visits, board.to_move(best.move)
+
+    def _reuse_root(self, board):
+        """Return the node of the previous search tree for the position on the
+        board after the opponent's reply, or None if it was not explored.
+        """
+        if self.root is None or self.root_board.width != board.width or \
+                self.root_board.height != board.height:
+            return None
+        reply = board.locations[1]
+        child = self.root.find_child(reply)
+        if child is None:
+            return None
+        expected = self.root_board.copy()
+        expected.apply_move(reply)
+        if expected.cells != board.cells or expected.locations != board.locations:
+            return None
+        return child
+
+    def _iterate(self, root, root_board):
+        """Run a single selection, expansion, simulation and backpropagation
+        step of the search.
+        """
+        node = root
+        path = [node]
+        board = root_board.copy()
+
+        # selection
+        while not node.untried and node.children:
+            node = node.select_child(self.exploration)
+            board.apply_move(node.move)
+            path.append(node)
+
+        # expansion
+        if node.untried:
+            move = node.untried.pop(random.randrange(len(node.untried)))
+            board.apply_move(move)
+            node = node.add_child(move, board.get_legal_moves())
+            path.append(node)
+
+        # simulation; the wins are counted for the player to move on `board`
+        total = self.batch_size
+        wins = self._simulate(board, total)
+
+        # backpropagation; the statistics of each node are counted for the
+        # player that made its move, so the result alternates between levels
+        value = total - wins
+        for node in reversed(path):
+            node.visits += total
+            node.wins += value
+            value = total - value
+
+    def _simulate(self, board, count):
+        """Play `count` rollouts from `board`, in the worker processes if
+        configured, and return the number won by the player to move.
+        """
+        if self.workers < 1:
+            return rollout_batch(board, count)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        chunks = [count // self.workers + (1 if i < count % self.workers else 0)
+                  for i in range(self.workers)]
+        chunks = [chunk for chunk in chunks if chunk]
+        return sum(self.pool.map(rollout_batch, [board] * len(chunks), chunks))
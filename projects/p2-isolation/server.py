@@ -0,0 +1,399 @@
+"""
+Asynchronous match server for Isolation agents.
+
+`Board.play()` runs both agents in the tournament process and trusts them to
+return before `time_left()` reaches 0, so an agent that blocks (or crashes)
+stalls the whole tournament. The match server instead runs every agent in a
+separate process that connects over a local TCP socket, pairs connected
+agents into matches, and enforces the time limit of every turn on its own
+side: an agent that does not answer in time loses the match while the other
+matches keep running. A single asyncio event loop hosts hundreds of
+simultaneous matches.
+
+The protocol is line based; every message is a line of space separated
+fields. An agent connects and sends
+
+    JOIN <name>
+
+and is paired with the next agent that joins. The server then sends
+
+    START <match id> <player number (1 or 2)> <width> <height>
+    MOVE <row> <col>          every move applied to the board, by either
+                              player (including the random opening moves)
+    GO <milliseconds>         the agent must reply with its move
+    END <WIN|LOSS> <reason>   the match is over; the server closes the
+                              connection
+
+and the agent answers GO with
+
+    <row> <col>
+
+Observers can connect and send `WATCH` to receive a live stream of the state
+of every match:
+
+    STATE <match id> <move count> <row> <col>
+    RESULT <match id> <winner name> <loser name> <reason>
+
+Example (one server and two agents, in separate shells):
+
+    python server.py serve -p 8765 -m 20
+    python server.py agent -p 8765 -n ID_Improved -s improved_score -g 10
+    python server.py agent -p 8765 -n Student -g 10 --ponder
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import socket
+import timeit
+
+import game_agent
+import sample_players
+
+from isolation import Board
+from game_agent import CustomPlayer
+
+TIME_LIMIT = 150  # number of milliseconds before timeout
+NUM_OPENING_MOVES = 2  # number of random moves before the agents play
+
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    """An agent connected to the match server.
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+    writer : asyncio.StreamWriter
+        The streams of the agent's socket.
+
+    name : str
+        The name sent by the agent when it joined.
+    """
+
+    def __init__(self, reader, writer, name):
+        self.reader = reader
+        self.writer = writer
+        self.name = name
+        self.done = asyncio.Event()
+
+    def __repr__(self):
+        return self.name
+
+    async def send(self, *fields):
+        """Send a line with the given fields; ignore closed connections, so
+        that a match can finish after one of the agents disconnected.
+        """
+        if self.writer.is_closing():
+            return
+        self.writer.write((" ".join(str(f) for f in fields) + "\n").encode())
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def receive(self, timeout=None):
+        """Return the fields of the next line sent by the agent.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If no line was received within `timeout` seconds.
+
+        ConnectionError
+            If the agent closed the connection.
+        """
+        line = await asyncio.wait_for(self.reader.readline(), timeout)
+        if not line:
+            raise ConnectionError("connection closed by " + self.name)
+        return line.decode().split()
+
+    def close(self):
+        self.writer.close()
+        self.done.set()
+
+
+class MatchServer:
+    """Pair agents that connect to the server into matches and play them.
+
+    Parameters
+    ----------
+    time_limit : numeric (optional)
+        The maximum number of milliseconds an agent may take to answer GO.
+
+    width, height : int (optional)
+        The size of the board of every match.
+
+    opening_moves : int (optional)
+        The number of random moves applied before the agents play, as in
+        `tournament.py`.
+    """
+
+    def __init__(self, time_limit=TIME_LIMIT, width=7, height=7,
+                 opening_moves=NUM_OPENING_MOVES):
+        self.time_limit = time_limit
+        self.width = width
+        self.height = height
+        self.opening_moves = opening_moves
+        self.server = None
+        self.waiting = None
+        self.watchers = set()
+        self.matches = {}
+        self.tasks = set()
+        self.results = []
+        self.match_ids = itertools.count(1)
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening for agents and return the port of the server."""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for game in list(self.matches.values()):
+            for player in (game.active_player, game.inactive_player):
+                player.close()
+
+    async def handle(self, reader, writer):
+        """Handle a new connection: an agent joining a match or a watcher."""
+        try:
+            fields = (await reader.readline()).decode().split()
+        except ConnectionError:
+            fields = []
+        if fields[:1] == ["WATCH"]:
+            self.watchers.add(writer)
+            try:
+                await reader.read()
+            finally:
+                self.watchers.discard(writer)
+                writer.close()
+            return
+        if len(fields) != 2 or fields[0] != "JOIN":
+            writer.close()
+            return
+
+        conn = Connection(reader, writer, fields[1])
+        if self.waiting is not None and \
+                (self.waiting.reader.at_eof() or self.waiting.writer.is_closing()):
+            # the waiting agent disconnected before it was paired
+            self.waiting.close()
+            self.waiting = None
+        if self.waiting is None:
+            self.waiting = conn
+        else:
+            opponent, self.waiting = self.waiting, None
+            task = asyncio.ensure_future(self.play_match(opponent, conn))
+            self.tasks.add(task)
+            task.add_done_callback(self.match_done)
+        # keep the connection open until the match is over
+        await conn.done.wait()
+
+    def match_done(self, task):
+        """Forget a finished match task and log the error it failed with."""
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("match failed", exc_info=task.exception())
+
+    async def broadcast(self, *fields):
+        """Send a line to every watcher, dropping the watchers that
+        disconnected.
+        """
+        line = (" ".join(str(f) for f in fields) + "\n").encode()
+
+        async def send(writer):
+            try:
+                writer.write(line)
+                await writer.drain()
+            except ConnectionError:
+                self.watchers.discard(writer)
+
+        await asyncio.gather(*(send(writer) for writer in list(self.watchers)))
+
+    async def play_match(self, player_1, player_2):
+        """Play a match between two connected agents.
+
+        Returns
+        -------
+        (Connection, Connection, str)
+            The winner, the loser and the reason for losing.
+        """
+        match_id = next(self.match_ids)
+        game = Board(player_1, player_2, self.width, self.height)
+        self.matches[match_id] = game
+        try:
+            for number, player in enumerate((player_1, player_2), 1):
+                await player.send("START", match_id, number, self.width, self.height)
+            for _ in range(self.opening_moves):
+                await self.apply_move(match_id, game, random.choice(game.get_legal_moves()))
+
+            while True:
+                player = game.active_player
+                legal_moves = game.get_legal_moves()
+                if not legal_moves:
+                    reason = "no legal moves"
+                    break
+
+                await player.send("GO", self.time_limit)
+                try:
+                    fields = await player.receive(self.time_limit / 1000.)
+                    move = (int(fields[0]), int(fields[1]))
+                except asyncio.TimeoutError:
+                    reason = "timeout"
+                    break
+                except ConnectionError:
+                    reason = "disconnected"
+                    break
+                except (ValueError, IndexError):
+                    reason = "invalid message"
+                    break
+                if move not in legal_moves:
+                    reason = "illegal move"
+                    break
+
+                await self.apply_move(match_id, game, move)
+
+            winner, loser = game.inactive_player, game.active_player
+            await winner.send("END", "WIN", reason)
+            await loser.send("END", "LOSS", reason)
+            await self.broadcast("RESULT", match_id, winner.name, loser.name, reason)
+            self.results.append((winner, loser, reason))
+            return winner, loser, reason
+        finally:
+            del self.matches[match_id]
+            player_1.close()
+            player_2.close()
+
+    async def apply_move(self, match_id, game, move):
+        """Apply a move and send it to both agents and the watchers."""
+        game.apply_move(move)
+        for player in (game.active_player, game.inactive_player):
+            await player.send("MOVE", *move)
+        await self.broadcast("STATE", match_id, game.move_count, *move)
+
+
+def play_remote(player, name, host='127.0.0.1', port=8765):
+    """Connect an agent to a match server and play a single match, keeping a
+    copy of the board in this process. Agents that implement the pondering
+    protocol of `Board.play()` think on the opponent's time.
+
+    Parameters
+    ----------
+    player : object
+        An agent implementing `get_move(game, legal_moves, time_left)`.
+
+    name : str
+        The name of the agent, without whitespace.
+
+    host, port : (optional)
+        The address of the server.
+
+    Returns
+    -------
+    (str, str)
+        'WIN' or 'LOSS', and the reason for losing.
+    """
+    curr_time_millis = lambda: 1000 * timeit.default_timer()
+
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile('rw', newline='\n')
+        stream.write("JOIN {}\n".format(name))
+        stream.flush()
+
+        game = None
+        for line in stream:
+            fields = line.split()
+            if fields[0] == "START":
+                width, height = int(fields[3]), int(fields[4])
+                if fields[2] == "1":
+                    game = Board(player, "opponent", width, height)
+                else:
+                    game = Board("opponent", player, width, height)
+            elif fields[0] == "MOVE":
+                move = (int(fields[1]), int(fields[2]))
+                if game.active_player != player and hasattr(player, 'observe_move'):
+                    player.observe_move(move)
+                game.apply_move(move)
+                if game.inactive_player == player and hasattr(player, 'ponder') \
+                        and game.get_legal_moves():
+                    player.ponder(game.copy())
+            elif fields[0] == "GO":
+                move_start = curr_time_millis()
+                time_limit = float(fields[1])
+                time_left = lambda: time_limit - (curr_time_millis() - move_start)
+                move = player.get_move(game.copy(), game.get_legal_moves(), time_left)
+                if move is None:
+                    move = (-1, -1)
+                try:
+                    stream.write("{} {}\n".format(*move))
+                    stream.flush()
+                except ConnectionError:
+                    # the server ended the match, e.g., on a timeout; the
+                    # END line may still be in the receive buffer
+                    pass
+            elif fields[0] == "END":
+                if hasattr(player, 'stop_pondering'):
+                    player.stop_pondering()
+                return fields[1], " ".join(fields[2:])
+
+    return "LOSS", "disconnected"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Isolation matches between " +
+        "agents running in separate processes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8765)
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve = subparsers.add_parser('serve', help="Run the match server.")
+    serve.add_argument('-t', '--time-limit', type=float, default=TIME_LIMIT,
+                       help="Milliseconds per move.")
+    serve.add_argument('-W', '--width', type=int, default=7)
+    serve.add_argument('-H', '--height', type=int, default=7)
+    serve.add_argument('-m', '--matches', type=int, default=None,
+                       help="Stop after this many matches (default: run forever).")
+
+    agent = subparsers.add_parser('agent', help="Connect a CustomPlayer to a server.")
+    agent.add_argument('-n', '--name', default="Student")
+    agent.add_argument('-s', '--score', default="custom_score",
+                       help="Name of the heuristic in game_agent or sample_players.")
+    agent.add_argument('-M', '--method', default="alphabeta")
+    agent.add_argument('-g', '--games', type=int, default=1,
+                       help="Number of matches to play.")
+    agent.add_argument('--ponder', action='store_true',
+                       help="Search on the opponent's time (see CustomPlayer.ponder).")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        async def serve():
+            server = MatchServer(args.time_limit, args.width, args.height)
+            port = await server.start(args.host, args.port)
+            print("Serving matches on {}:{}".format(args.host, port))
+            while args.matches is None or len(server.results) < args.matches:
+                await asyncio.sleep(.1)
+            await server.close()
+            for winner, loser, reason in server.results:
+                print("{} beat {} ({})".format(winner.name, loser.name, reason))
+        asyncio.run(serve())
+    elif args.command == 'agent':
+        score_fn = getattr(game_agent, args.score, None) or getattr(sample_players, args.score)
+        player = CustomPlayer(score_fn=score_fn, method=args.method, pondering=args.ponder)
+        wins = 0
+        try:
+            for _ in range(args.games):
+                result, reason = play_remote(player, args.name, args.host, args.port)
+                wins += result == "WIN"
+                print("{} {} ({})".format(args.name, result, reason))
+        finally:
+            player.close()
+        print("{} won {} of {} matches".format(args.name, wins, args.games))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
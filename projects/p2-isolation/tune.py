@@ -0,0 +1,196 @@
+"""
+Tune the weights of the weighted heuristic evaluation functions in
+`game_agent.py` (see `game_agent.WEIGHTED_HEURISTICS`) by self-play.
+
+The weights are optimized with Simultaneous Perturbation Stochastic
+Approximation (SPSA): every iteration perturbs all of the weights at once in a
+random direction, plays a batch of fixed-depth alpha-beta games between the
+agent using the positively perturbed weights and the agent using the
+negatively perturbed weights, and moves the weights in the direction of the
+winner. The games of a batch are played in parallel in a process pool.
+
+Games are "fair" in the same way as in `tournament.py`: each opening (two
+random moves) is played twice, with the agents swapping initiative.
+
+By default the heuristic played by the agent (`game_agent.DEPLOYED_HEURISTIC`,
+which `custom_score` delegates to) is tuned. The tuned weights are written to
+the namespace of the heuristic in `game_agent.PARAMS_FILE` (or the file given
+with -o), which `game_agent` loads when it is imported.
+"""
+
+import argparse
+import json
+import random
+
+from multiprocessing import Pool
+
+import game_agent
+from isolation import Board
+from game_agent import CustomPlayer
+
+# scale of the perturbation and the step of each weight; the phase thresholds
+# are fractions of the board size and need much smaller steps than the
+# weights of the move counts
+SCALES = {
+    "edges_high": 1.,
+    "edges_medium": 1.,
+    "edges_low": 1.,
+    "late_edges_high": 1.,
+    "late_edges_medium": 1.,
+    "late_edges_low": 1.,
+    "diff_weight": 1.,
+    "prev_diff_weight": 1.,
+    "early_phase": .05,
+    "late_phase": .05,
+}
+
+# range of valid values of the phase thresholds
+PHASE_PARAMS = ["early_phase", "late_phase"]
+
+
+def play_pair(args):
+    """Play two games between agents using the same heuristic with different
+    weights from a common random opening, switching initiative between the
+    games. This is a module level function so that it can be used by a
+    process pool.
+
+    Parameters
+    ----------
+    args : (str, dict, dict, int, int)
+        The name of the heuristic, the weights of the first and the second
+        agent, the search depth and the random seed for the opening.
+
+    Returns
+    -------
+    int
+        The number of games (0, 1 or 2) won by the first agent.
+    """
+    heuristic, weights_a, weights_b, depth, seed = args
+    player_a = CustomPlayer(depth, game_agent.weighted_score(heuristic, weights_a),
+                            iterative=False, method='alphabeta')
+    player_b = CustomPlayer(depth, game_agent.weighted_score(heuristic, weights_b),
+                            iterative=False, method='alphabeta')
+    rng = random.Random(seed)
+    games = [Board(player_a, player_b), Board(player_b, player_a)]
+    for _ in range(2):
+        move = rng.choice(games[0].get_legal_moves())
+        games[0].apply_move(move)
+        games[1].apply_move(move)
+
+    wins = 0
+    for game in games:
+        winner, _, _ = game.play(time_limit=float("inf"))
+        if winner == player_a:
+            wins += 1
+    return wins
+
+
+def clip(weights):
+    """Keep the phase thresholds ordered fractions of the board size."""
+    for name in PHASE_PARAMS:
+        if name in weights:
+            weights[name] = min(max(weights[name], 0.), 1.)
+    if "early_phase" in weights and "late_phase" in weights and \
+            weights["early_phase"] > weights["late_phase"]:
+        weights["early_phase"] = weights["late_phase"]
+    return weights
+
+
+def spsa(heuristic, iterations, pairs, depth, workers, a=.5, c=.5, seed=None):
+    """Optimize the weights of a heuristic with SPSA.
+
+    Parameters
+    ----------
+    heuristic : str
+        The name of the heuristic in `game_agent.WEIGHTED_HEURISTICS`.
+
+    iterations : int
+        The number of SPSA iterations.
+
+    pairs : int
+        The number of pairs of games played per iteration.
+
+    depth : int
+        The fixed search depth of the self-play agents.
+
+    workers : int
+        The number of processes playing the games.
+
+    a, c : float (optional)
+        The initial step size and perturbation size, relative to `SCALES`.
+
+    seed : int (optional)
+        The seed of the random perturbations and openings.
+
+    Returns
+    -------
+    dict
+        The tuned weights of the heuristic.
+    """
+    rng = random.Random(seed)
+    names = game_agent.WEIGHTED_HEURISTICS[heuristic]
+    theta = {name: game_agent.params[heuristic][name] for name in names}
+
+    with Pool(workers) as pool:
+        for k in range(iterations):
+            # standard SPSA gain sequences
+            a_k = a / (k + 1) ** .602
+            c_k = c / (k + 1) ** .101
+            delta = {name: rng.choice((-1, 1)) for name in names}
+            plus = clip({name: theta[name] + c_k * SCALES[name] * delta[name] for name in names})
+            minus = clip({name: theta[name] - c_k * SCALES[name] * delta[name] for name in names})
+
+            tasks = [(heuristic, plus, minus, depth, rng.getrandbits(32)) for _ in range(pairs)]
+            wins = sum(pool.map(play_pair, tasks))
+            # fraction of games won by the positive perturbation, centered on 0
+            result = wins / (2. * pairs) - .5
+
+            for name in names:
+                theta[name] += a_k * SCALES[name] * result / (c_k * delta[name])
+            clip(theta)
+
+            print("Iteration {}: {:.2f} won by +delta; {}".format(
+                k + 1, result + .5, ", ".join("{}={:.3f}".format(n, theta[n]) for n in names)))
+
+    return theta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the weights of the heuristic " +
+        "evaluation functions in game_agent.py by self-play with SPSA.")
+    parser.add_argument('heuristic', nargs='?', default=game_agent.DEPLOYED_HEURISTIC,
+                        choices=sorted(game_agent.WEIGHTED_HEURISTICS),
+                        help="The heuristic to tune (default: {}, used by custom_score).".format(
+                            game_agent.DEPLOYED_HEURISTIC))
+    parser.add_argument('-i', '--iterations', type=int, default=50,
+                        help="Number of SPSA iterations.")
+    parser.add_argument('-g', '--pairs', type=int, default=32,
+                        help="Number of pairs of games played per iteration.")
+    parser.add_argument('-d', '--depth', type=int, default=3,
+                        help="Fixed alpha-beta search depth of the self-play agents.")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Number of processes playing games (default: number of CPUs).")
+    parser.add_argument('-s', '--seed', type=int, default=None,
+                        help="Seed of the perturbations and openings.")
+    parser.add_argument('-o', '--output', default=game_agent.PARAMS_FILE,
+                        help="Parameter file to write the tuned weights to.")
+    args = parser.parse_args()
+
+    tuned = spsa(args.heuristic, args.iterations, args.pairs, args.depth,
+                 args.workers, seed=args.seed)
+
+    # keep the weights of other heuristics that are already in the file
+    output = {}
+    try:
+        with open(args.output) as f:
+            output = json.load(f)
+    except FileNotFoundError:
+        pass
+    output.setdefault(args.heuristic, {}).update(tuned)
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=4, sort_keys=True)
+    print("Wrote tuned weights to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Negamax search engine for two-player, zero-sum games (Chapter 5)
+
+This module implements depth-limited negamax search with alpha-beta pruning,
+a transposition table, iterative deepening and a time limit. It does not
+depend on the rest of aimacode, so that other game implementations (e.g., the
+Isolation agent) can use it as well. The searched game must provide:
+
+    game.actions(state)        the legal moves of the player to move
+    game.make(state, move)     the state after the move; may modify and
+                               return `state` in place
+    game.unmake(state, move)   undo `make` on the returned state (does
+                               nothing for games that copy states in `make`)
+    game.terminal_test(state)  True if the game is over
+    game.utility(state, player)
+    game.to_move(state)        the player to move
+    game.hash_key(state)       a hashable key identifying the state
+
+`games.Game` provides copy-based defaults for `make`, `unmake` and
+`hash_key`."""
+
+infinity = float('inf')
+
+# flags of transposition table entries
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class Timeout(Exception):
+    """Raised when the time limit of the search is reached."""
+    pass
+
+
+class TranspositionTable:
+    """Map from state keys to the results of previous searches. An entry is a
+    tuple (depth, value, flag, move), where flag tells whether the value is
+    exact, a lower bound (the search failed high) or an upper bound (the
+    search failed low), and depth is infinite if the search reached terminal
+    states only. The table is cleared when it reaches `max_entries`."""
+
+    def __init__(self, max_entries=1000000):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, depth, value, flag, move):
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = (depth, value, flag, move)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class NegamaxSearch:
+    """Negamax search with alpha-beta pruning and a transposition table.
+
+    eval_fn(state, player) estimates the value of a non-terminal state for
+    player when the depth limit is reached; the default uses the utility.
+    time_left is a function returning the remaining time, and the search
+    raises Timeout when it falls below threshold. The transposition table is
+    kept between searches, so the engine should be reused for the states of
+    the same game."""
+
+    def __init__(self, game, eval_fn=None, time_left=None, threshold=0,
+                 table=None):
+        self.game = game
+        self.eval_fn = eval_fn or game.utility
+        self.time_left = time_left
+        self.threshold = threshold
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+        self.cutoff = False
+
+    def search(self, state, depth):
+        """Search the state to a fixed depth and return (value, move), with
+        the value for the player to move."""
+        self.cutoff = False
+        return self.negamax(state, depth, -infinity, infinity)
+
+    def iterative_deepening(self, state, max_depth=None):
+        """Search the state with increasing depths until the time limit or
+        max_depth is reached, or the game tree has been searched completely.
+        Return (value, move, depth) of the last completed iteration; the
+        move is None if no iteration completed."""
+        value, move, depth = None, None, 0
+        try:
+            while max_depth is None or depth < max_depth:
+                value, move = self.search(state, depth + 1)
+                depth += 1
+                if not self.cutoff or abs(value) == infinity:
+                    # no node was cut off by the depth limit, or the game
+                    # is decided; deeper searches return the same result
+                    break
+        except Timeout:
+            pass
+        return value, move, depth
+
+    def negamax(self, state, depth, alpha, beta):
+        """Return (value, move) of the state for the player to move, searched
+        to the given depth within the (alpha, beta) window."""
+        # self.cutoff tells whether the depth limit was reached anywhere in
+        # the subtree searched so far; track it separately for this subtree
+        outer_cutoff = self.cutoff
+        self.cutoff = False
+        try:
+            return self._negamax(state, depth, alpha, beta)
+        finally:
+            self.cutoff = self.cutoff or outer_cutoff
+
+    def _negamax(self, state, depth, alpha, beta):
+        game = self.game
+        self.nodes += 1
+        if self.time_left is not None and self.time_left() < self.threshold:
+            raise Timeout()
+
+        key = game.hash_key(state)
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_value, flag, table_move = entry
+            if entry_depth >= depth:
+                # entries of completely searched subtrees have an infinite
+                # depth; others were cut off by the depth limit
+                if entry_depth < infinity:
+                    self.cutoff = True
+                if flag == EXACT:
+                    return entry_value, table_move
+                elif flag == LOWER:
+                    alpha = max(alpha, entry_value)
+                else:
+                    beta = min(beta, entry_value)
+                if alpha >= beta:
+                    return entry_value, table_move
+
+        player = game.to_move(state)
+        if game.terminal_test(state):
+            return game.utility(state, player), None
+        if depth == 0:
+            self.cutoff = True
+            return self.eval_fn(state, player), None
+
+        moves = game.actions(state)
+        # search the best move of a previous search first
+        if table_move is not None and table_move in moves:
+            moves = [table_move] + [m for m in moves if m != table_move]
+
+        alpha_orig = alpha
+        best_value, best_move = -infinity, moves[0]
+        for move in moves:
+            child = game.make(state, move)
+            try:
+                value = -self.negamax(child, depth - 1, -beta, -alpha)[0]
+            finally:
+                game.unmake(child, move)
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth if self.cutoff else infinity,
+                         best_value, flag, best_move)
+        return best_value, best_move
@@ -2,9 +2,11 @@
 
 from collections import namedtuple
 import random
+import time
 
 from .utils import argmax
 from .canvas import Canvas
+from .game_engine import NegamaxSearch
 
 infinity = float('inf')
 GameState = namedtuple('GameState', 'to_move, utility, board, moves')
@@ -153,6 +155,16 @@ def alphabeta_player(game, state):
     return alphabeta_full_search(state, game)
 
 
+def negamax_player(game, state, time_limit=1., eval_fn=None):
+    """A player that chooses a move with iterative deepening negamax search,
+    stopping after time_limit seconds."""
+    deadline = time.perf_counter() + time_limit
+    engine = NegamaxSearch(game, eval_fn,
+                           time_left=lambda: deadline - time.perf_counter())
+    _, move, _ = engine.iterative_deepening(state)
+    return move if move is not None else random_player(game, state)
+
+
 def play_game(game, *players):
     """Play an n-person, move-alternating game."""
 
@@ -202,6 +214,19 @@ class Game:
         "Print or otherwise display the state."
         print(state)
 
+    def make(self, state, move):
+        """Return the state after the move, for game_engine.NegamaxSearch.
+        Subclasses with mutable states may apply the move in place instead."""
+        return self.result(state, move)
+
+    def unmake(self, state, move):
+        "Undo make(state, move); states are not modified by default."
+        pass
+
+    def hash_key(self, state):
+        "Return a hashable key identifying the state."
+        return state
+
     def __repr__(self):
         return '<%s>' % self.__class__.__name__
 
@@ -272,6 +297,9 @@ class TicTacToe(Game):
         "A state is terminal if it is won or there are no empty squares."
         return state.utility != 0 or len(state.moves) == 0
 
+    def hash_key(self, state):
+        return state.to_move, frozenset(state.board.items())
+
     def display(self, state):
         board = state.board
         for x in range(1, self.h + 1):
@@ -22,6 +22,7 @@ Then we implement various functions for doing logical inference:
     tt_entails       Say if a statement is entailed by a KB
     pl_resolution    Do resolution on propositional sentences
     dpll_satisfiable See if a propositional sentence is satisfiable
+    cdcl_satisfiable The same, with a clause learning SAT solver (CDCLSolver)
     WalkSAT          Try to find a solution for a set of clauses
 
 And a few other functions:
@@ -37,6 +38,7 @@ from .utils import (
 )
 import aimacode.agents as agents
 
+import heapq
 import itertools
 import random
 from collections import defaultdict
@@ -670,6 +672,316 @@ def WalkSAT(clauses, p=0.5, max_flips=10000):
     return None
 
 # ______________________________________________________________________________
+# Conflict-Driven Clause Learning
+
+
+def luby(i):
+    """The i-th element (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    >>> [luby(i) for i in range(1, 8)]
+    [1, 1, 2, 1, 1, 2, 4]
+    """
+    # find the complete subsequence 1, 1, 2, ..., 2**seq containing i
+    size, seq = 1, 0
+    while size < i:
+        seq += 1
+        size = 2 * size + 1
+    i -= 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return 1 << seq
+
+
+class CDCLSolver:
+    """Incremental SAT solver with conflict-driven clause learning.
+
+    Variables are positive integers created with new_var(), and literals are
+    +v or -v as in the DIMACS format. Clauses are watched by two literals,
+    conflicts are analyzed to the first unique implication point, the
+    learned clause is kept and the search jumps back to the level where it
+    becomes unit. Decisions follow the variable activities (VSIDS) with the
+    saved phase of each variable, and the search restarts after a number of
+    conflicts following the Luby sequence.
+
+    Clauses can be added between calls of solve(), which also takes a list
+    of assumptions: literals that hold for that call only. Learned clauses
+    are derived from the clauses alone, so they stay valid for later calls
+    with other assumptions or more clauses."""
+
+    restart_base = 100
+    var_decay = 0.95
+
+    def __init__(self):
+        self.num_vars = 0
+        self.ok = True
+        self.clauses = []
+        self.learnts = []
+        self.watches = defaultdict(list)
+        # per variable, indexed from 1
+        self.assigns = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.]
+        self.phase = [False]
+        self.order = []
+        self.var_inc = 1.
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.model = None
+        self.conflicts = 0
+
+    def new_var(self):
+        """Create a new variable and return its number."""
+        self.num_vars += 1
+        self.assigns.append(None)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.)
+        self.phase.append(False)
+        heapq.heappush(self.order, (0., self.num_vars))
+        return self.num_vars
+
+    def value(self, lit):
+        """True or False if the literal is assigned, else None."""
+        val = self.assigns[abs(lit)]
+        if val is None:
+            return None
+        return val if lit > 0 else not val
+
+    def add_clause(self, lits):
+        """Add a clause, given as an iterable of literals. Return False if the
+        clauses are known to be unsatisfiable."""
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        clause = []
+        for lit in set(lits):
+            while abs(lit) > self.num_vars:
+                self.new_var()
+            if -lit in clause or self.value(lit) is True:
+                return True
+            if self.value(lit) is None and lit not in clause:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+            self.clauses.append(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def enqueue(self, lit, reason):
+        var = abs(lit)
+        self.assigns[var] = lit > 0
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """Propagate the assignments on the trail through the watched
+        literals; return a conflicting clause, or None."""
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches[false_lit]
+            kept = []
+            for n, clause in enumerate(watchers):
+                # the false literal goes second, so clause[0] is the literal
+                # implied when all the others are false
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if self.value(first) is True:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_lit
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(first) is False:
+                        kept.extend(watchers[n + 1:])
+                        self.watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        return clause
+                    self.enqueue(first, clause)
+            self.watches[false_lit] = kept
+        return None
+
+    def analyze(self, conflict):
+        """Learn a clause from a conflict by resolving it with the reasons of
+        the literals of the current decision level until one is left. Return
+        the clause, with that literal first, and the level to jump back to."""
+        seen = set()
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+        current = len(self.trail_lim)
+        while True:
+            for q in clause:
+                var = abs(q)
+                if q == lit or var in seen or self.level[var] == 0:
+                    continue
+                seen.add(var)
+                self.bump(var)
+                if self.level[var] == current:
+                    counter += 1
+                else:
+                    learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(lit)]
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = -lit
+
+        if len(learnt) == 1:
+            return learnt, 0
+        # the literal of the highest other level is watched with learnt[0]
+        best = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, var):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            for v in range(1, self.num_vars + 1):
+                self.activity[v] *= 1e-100
+            self.var_inc *= 1e-100
+            self.order = [(-self.activity[v], v) for v in range(1, self.num_vars + 1)
+                          if self.assigns[v] is None]
+            heapq.heapify(self.order)
+        if self.assigns[var] is None:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def cancel_until(self, level):
+        """Undo the assignments of the decision levels above level."""
+        if len(self.trail_lim) <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            var = abs(lit)
+            self.assigns[var] = None
+            self.reason[var] = None
+            self.phase[var] = lit > 0
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch_var(self):
+        """The unassigned variable with the highest activity, or None."""
+        while self.order:
+            var = heapq.heappop(self.order)[1]
+            if self.assigns[var] is None:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """Search for a model of the clauses in which the assumptions hold.
+        Return True and store the model in self.model (a list of bool indexed
+        by variable) if there is one, else return False."""
+        self.model = None
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        for lit in assumptions:
+            while abs(lit) > self.num_vars:
+                self.new_var()
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+        restarts = 1
+        limit = self.conflicts + self.restart_base * luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnts.append(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.var_inc /= self.var_decay
+                continue
+
+            if self.conflicts >= limit:
+                restarts += 1
+                limit = self.conflicts + self.restart_base * luby(restarts)
+                self.cancel_until(0)
+                continue
+
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                # one decision level per assumption, so that backjumping
+                # keeps the assumptions that are still consistent
+                lit = assumptions[level]
+                if self.value(lit) is False:
+                    self.cancel_until(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if self.value(lit) is None:
+                    self.enqueue(lit, None)
+                continue
+
+            var = self.pick_branch_var()
+            if var is None:
+                self.model = list(self.assigns)
+                self.cancel_until(0)
+                return True
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(var if self.phase[var] else -var, None)
+
+
+def cdcl_satisfiable(s):
+    """Check satisfiability of a propositional sentence with the CDCL solver.
+    Return a model like dpll_satisfiable, or False.
+    >>> cdcl_satisfiable(A & ~B) == {A: True, B: False}
+    True
+    """
+    solver = CDCLSolver()
+    symbols = {}
+    for clause in conjuncts(to_cnf(s)):
+        lits = []
+        for literal in disjuncts(clause):
+            if literal == expr('True'):
+                break
+            if literal == expr('False'):
+                continue
+            symbol, value = inspect_literal(literal)
+            if symbol not in symbols:
+                symbols[symbol] = solver.new_var()
+            lits.append(symbols[symbol] if value else -symbols[symbol])
+        else:
+            solver.add_clause(lits)
+    for symbol in prop_symbols(s):
+        if symbol not in symbols:
+            symbols[symbol] = solver.new_var()
+    if not solver.solve():
+        return False
+    return {symbol: solver.model[var] for symbol, var in symbols.items()}
+
+# ______________________________________________________________________________
 
 
 class HybridWumpusAgent(agents.Agent):
@@ -12,6 +12,9 @@ from .utils import (
 from .grid import distance
 
 from collections import defaultdict
+from multiprocessing import Pool
+import heapq
+import itertools
 import math
 import random
 import sys
@@ -67,6 +70,25 @@ class Problem(object):
         and action. The default method costs 1 for every step in the path."""
         return c + 1
 
+    def predecessors(self, state):
+        """Return a list of (action, state1) pairs, one for every state1 from
+        which the action leads to the given state, i.e., with
+        self.result(state1, action) == state. Searches that work backward
+        from the goal, such as bidirectional_breadth_first_search, need
+        this method; it is not needed otherwise."""
+        raise NotImplementedError
+
+    def goal_states(self):
+        """Return the list of goal states, where backward searches start.
+        The default method returns self.goal, or the states in self.goal if
+        it is a list, as goal_test does. Override this method if the goal is
+        not given as states; raise ValueError if there are too many goal
+        states to list."""
+        if isinstance(self.goal, list):
+            return list(self.goal)
+        else:
+            return [self.goal]
+
     def value(self, state):
         """For optimization problems, each state has a value.  Hill-climbing
         and related algorithms try to maximize this value."""
@@ -81,19 +103,21 @@ class Node:
     that if a state is arrived at by two paths, then there are two nodes with
     the same state.  Also includes the action that got us to this state, and
     the total path_cost (also known as g) to reach the node.  Other functions
-    may add an f and h value; see best_first_graph_search and astar_search for
-    an explanation of how the f and h values are handled. You will not need to
+    may set the f and h values, which are unset until then; see
+    best_first_graph_search and astar_search for an explanation of how the f
+    and h values are handled. Searches create millions of nodes, so nodes
+    have fixed slots instead of an attribute dict; you will not need to
     subclass this class."""
 
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'f', 'h')
+
     def __init__(self, state, parent=None, action=None, path_cost=0):
         "Create a search tree Node, derived from a parent by an action."
         self.state = state
         self.parent = parent
         self.action = action
         self.path_cost = path_cost
-        self.depth = 0
-        if parent:
-            self.depth = parent.depth + 1
+        self.depth = 0 if parent is None else parent.depth + 1
 
     def __repr__(self):
         return "<Node %s>" % (self.state,)
@@ -120,10 +144,11 @@ class Node:
     def path(self):
         "Return a list of nodes forming the path from the root to this node."
         node, path_back = self, []
-        while node:
+        while node is not None:
             path_back.append(node)
             node = node.parent
-        return list(reversed(path_back))
+        path_back.reverse()
+        return path_back
 
     # We want for a queue of nodes in breadth_first_search or
     # astar_search to have no duplicated states, so we treat nodes
@@ -258,13 +283,10 @@ def best_first_graph_search(problem, f):
             return node
         explored.add(node.state)
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
-                frontier.append(child)
-            elif child in frontier:
-                incumbent = frontier[child]
-                if f(child) < f(incumbent):
-                    del frontier[incumbent]
-                    frontier.append(child)
+            # add the child, or replace a frontier node of the same state
+            # with a higher f value
+            if child.state not in explored:
+                frontier.decrease_key(child)
     return None
 
 
@@ -301,6 +323,167 @@ def iterative_deepening_search(problem):
         if result != 'cutoff':
             return result
 
+
+def bidirectional_solution(problem, node, backward_node):
+    """Join a node reached from the initial state and a node of the same
+    state reached backward from a goal state: extend node with the actions
+    on the path of backward_node, and return the node of the goal state."""
+    while backward_node.parent is not None:
+        action, state = backward_node.action, backward_node.parent.state
+        node = Node(state, node, action,
+                    problem.path_cost(node.path_cost, node.state, action, state))
+        backward_node = backward_node.parent
+    return node
+
+
+def predecessor_nodes(problem, node):
+    """List the nodes of a backward search reachable in one step from node:
+    the parent of such a node is the node it leads to, and its path_cost is
+    the cost from its state to the goal."""
+    return [Node(state, node, action,
+                 problem.path_cost(node.path_cost, state, action, node.state))
+            for action, state in problem.predecessors(node.state)]
+
+
+def bidirectional_breadth_first_search(problem):
+    """Breadth-first search forward from the initial state and backward from
+    the goal states (see Problem.predecessors and Problem.goal_states) until
+    the two searches meet. Each step expands a whole level of the smaller
+    frontier, so the first state reached by both searches is on a shortest
+    path; each search only goes about half as deep as breadth_first_search."""
+    node = Node(problem.initial)
+    if problem.goal_test(node.state):
+        return node
+    forward = {node.state: node}
+    backward = {state: Node(state) for state in problem.goal_states()}
+    forward_level, backward_level = [node], list(backward.values())
+    while forward_level and backward_level:
+        if len(forward_level) <= len(backward_level):
+            next_level = []
+            for node in forward_level:
+                for child in node.expand(problem):
+                    if child.state in backward:
+                        return bidirectional_solution(problem, child, backward[child.state])
+                    if child.state not in forward:
+                        forward[child.state] = child
+                        next_level.append(child)
+            forward_level = next_level
+        else:
+            next_level = []
+            for node in backward_level:
+                for child in predecessor_nodes(problem, node):
+                    if child.state in forward:
+                        return bidirectional_solution(problem, forward[child.state], child)
+                    if child.state not in backward:
+                        backward[child.state] = child
+                        next_level.append(child)
+            backward_level = next_level
+    return None
+
+
+def bidirectional_uniform_cost_search(problem):
+    """Uniform-cost search forward from the initial state and backward from
+    the goal states (see Problem.predecessors and Problem.goal_states),
+    expanding the cheapest node of either search. Every state reached by
+    both searches gives a solution; the search stops when the costs of the
+    cheapest nodes of the two frontiers add up to the cost of the best
+    solution found, which is then optimal for nonnegative step costs."""
+    node = Node(problem.initial)
+    if problem.goal_test(node.state):
+        return node
+    counter = itertools.count()
+    reached = ({node.state: node},
+               {state: Node(state) for state in problem.goal_states()})
+    frontiers = ([(0, next(counter), node)],
+                 [(0, next(counter), n) for n in reached[1].values()])
+    best_cost, best = infinity, None
+    while frontiers[0] and frontiers[1]:
+        if frontiers[0][0][0] + frontiers[1][0][0] >= best_cost:
+            break
+        side = 0 if frontiers[0][0][0] <= frontiers[1][0][0] else 1
+        node = heapq.heappop(frontiers[side])[2]
+        if reached[side][node.state] is not node:
+            # a cheaper node of the same state was reached after this one
+            continue
+        if side == 0:
+            children = node.expand(problem)
+        else:
+            children = predecessor_nodes(problem, node)
+        for child in children:
+            old = reached[side].get(child.state)
+            if old is None or child.path_cost < old.path_cost:
+                reached[side][child.state] = child
+                heapq.heappush(frontiers[side], (child.path_cost, next(counter), child))
+                other = reached[1 - side].get(child.state)
+                if other is not None and child.path_cost + other.path_cost < best_cost:
+                    best_cost = child.path_cost + other.path_cost
+                    best = (child, other) if side == 0 else (other, child)
+    if best is None:
+        return None
+    return bidirectional_solution(problem, *best)
+
+
+# the problem of the worker processes of parallel_breadth_first_search
+worker_problem = None
+
+
+def init_worker_problem(problem):
+    global worker_problem
+    worker_problem = problem
+
+
+def expand_state(state):
+    """Return a list of (action number, child state, goal test of the child)
+    for every action of worker_problem in the state, where the action number
+    is the index of the action in worker_problem.actions(state)."""
+    problem = worker_problem
+    children = []
+    for i, action in enumerate(problem.actions(state)):
+        child = problem.result(state, action)
+        children.append((i, child, problem.goal_test(child)))
+    return children
+
+
+def parallel_breadth_first_search(problem, workers=None, chunksize=None):
+    """Level-synchronous breadth-first search: the states of each level are
+    expanded, and their children goal tested, in a pool of worker processes.
+    Only states and action numbers are sent between processes; the main
+    process keeps the parent of every reached state, and builds the nodes
+    of the solution path at the end. The states are expanded in the same
+    order as breadth_first_search, which finds the same solution. The
+    problem must be picklable; statistics of an InstrumentedProblem only
+    count the work of the main process."""
+    if problem.goal_test(problem.initial):
+        return Node(problem.initial)
+    # the parent state and action number of every reached state
+    parents = {problem.initial: None}
+    level = [problem.initial]
+    goal = None
+    with Pool(workers, init_worker_problem, (problem,)) as pool:
+        while level and goal is None:
+            next_level = []
+            for state, children in zip(level, pool.map(expand_state, level, chunksize)):
+                for i, child, is_goal in children:
+                    if child not in parents:
+                        parents[child] = (state, i)
+                        if is_goal:
+                            goal = child
+                            break
+                        next_level.append(child)
+                if goal is not None:
+                    break
+            level = next_level
+    if goal is None:
+        return None
+    steps = []
+    while parents[goal] is not None:
+        steps.append(parents[goal])
+        goal = parents[goal][0]
+    node = Node(problem.initial)
+    for state, i in reversed(steps):
+        node = node.child_node(problem, list(problem.actions(state))[i])
+    return node
+
 # ______________________________________________________________________________
 # Informed (Heuristic) Search
 
@@ -351,6 +534,156 @@ def recursive_best_first_search(problem, h=None):
     return result
 
 
+def ida_star_search(problem, h=None):
+    """Iterative deepening A* search [Korf 1985]: depth-first searches that
+    cut off the nodes with f(n) = g(n)+h(n) above a bound, raising the bound
+    to the lowest f value cut off in the previous iteration. Memory grows
+    with the depth of the solution only; repeated states are only detected
+    on the current path."""
+    h = memoize(h or problem.h, 'h')
+
+    def search(node, bound, path_states):
+        f = node.path_cost + h(node)
+        if f > bound:
+            return None, f
+        if problem.goal_test(node.state):
+            return node, f
+        next_bound = infinity
+        for child in node.expand(problem):
+            if child.state in path_states:
+                continue
+            path_states.add(child.state)
+            result, child_f = search(child, bound, path_states)
+            path_states.discard(child.state)
+            if result is not None:
+                return result, child_f
+            next_bound = min(next_bound, child_f)
+        return None, next_bound
+
+    node = Node(problem.initial)
+    bound = h(node)
+    while True:
+        result, bound = search(node, bound, {node.state})
+        if result is not None:
+            return result
+        if bound == infinity:
+            return None
+
+
+class SMANode:
+
+    """Bookkeeping of sma_star_search for a node in memory: its f value, the
+    children in memory, the actions whose children are not in memory
+    (pending is None until the node is expanded) and the f values backed
+    up from the children that were forgotten."""
+
+    __slots__ = ('node', 'f', 'parent', 'children', 'pending', 'forgotten', 'alive')
+
+    def __init__(self, node, f, parent=None):
+        self.node = node
+        self.f = f
+        self.parent = parent
+        self.children = []
+        self.pending = None
+        self.forgotten = {}
+        self.alive = True
+
+
+def sma_star_search(problem, h=None, max_nodes=100000):
+    """Simplified memory-bounded A* search [Russell 1992]. Like A*, it
+    expands the node with the lowest f(n) = g(n)+h(n) (the deepest one on
+    ties), but it generates one child at a time and keeps at most max_nodes
+    nodes in memory. When memory is full, the leaf with the highest f value
+    (the shallowest one on ties) is forgotten, and its f value is backed up
+    to its parent, which regenerates it if the rest of its subtree turns out
+    to be worse. The solution is optimal if the path to the shallowest
+    optimal goal fits in memory; nodes that are max_nodes - 1 deep cannot
+    lead to a goal that fits and get an infinite f value, and children that
+    repeat a state of their path are not generated. Return None if no
+    solution fits in memory."""
+    h = memoize(h or problem.h, 'h')
+    counter = itertools.count()
+    # heaps with lazy deletion: an entry is stale if its f value is not the
+    # current f value of the node, or the node is not open (leaf) any more
+    open_heap = []
+    leaf_heap = []
+
+    def push(n):
+        heapq.heappush(open_heap, (n.f, -n.node.depth, next(counter), n))
+        if not n.children and n.parent is not None:
+            heapq.heappush(leaf_heap, (-n.f, n.node.depth, next(counter), n))
+
+    def backup(n):
+        # the f value of a node whose children have all been generated is
+        # the lowest f value of its children, in memory or forgotten
+        while n is not None and all(a in n.forgotten for a in n.pending):
+            f = min([c.f for c in n.children] + [n.forgotten[a] for a in n.pending],
+                    default=infinity)
+            if f == n.f:
+                break
+            n.f = f
+            push(n)
+            n = n.parent
+
+    root = SMANode(Node(problem.initial), 0)
+    root.f = h(root.node)
+    push(root)
+    used = 1
+    while open_heap:
+        f, _, _, best = heapq.heappop(open_heap)
+        if not best.alive or f != best.f or best.pending == []:
+            continue
+        if f == infinity:
+            return None
+        if best.pending is None:
+            if problem.goal_test(best.node.state):
+                return best.node
+            best.pending = list(problem.actions(best.node.state))
+            if not best.pending:
+                best.f = infinity
+                backup(best.parent)
+                push(best)
+                continue
+
+        action = best.pending.pop(0)
+        child = best.node.child_node(problem, action)
+        # walk up the parent links instead of building the path
+        ancestor = best.node
+        while ancestor is not None and ancestor.state != child.state:
+            ancestor = ancestor.parent
+        if ancestor is not None:
+            # a cycle never leads to a better path
+            best.forgotten.pop(action, None)
+            backup(best)
+            push(best)
+            continue
+        if child.depth >= max_nodes - 1 and not problem.goal_test(child.state):
+            child_f = infinity
+        else:
+            child_f = max(best.f, child.path_cost + h(child))
+        child_f = max(child_f, best.forgotten.pop(action, child_f))
+        s = SMANode(child, child_f, best)
+        best.children.append(s)
+        used += 1
+        push(s)
+        backup(best)
+        if best.pending:
+            push(best)
+
+        while used > max_nodes and leaf_heap:
+            neg_f, _, _, leaf = heapq.heappop(leaf_heap)
+            if not leaf.alive or -neg_f != leaf.f or leaf.children:
+                continue
+            parent = leaf.parent
+            leaf.alive = False
+            used -= 1
+            parent.children.remove(leaf)
+            parent.pending.append(leaf.node.action)
+            parent.forgotten[leaf.node.action] = leaf.f
+            push(parent)
+    return None
+
+
 def hill_climbing(problem):
     """From the initial node, keep choosing the neighbor with highest value,
     stopping when no neighbor is better. [Figure 4.2]"""
@@ -805,6 +1138,12 @@ class GraphProblem(Problem):
     def path_cost(self, cost_so_far, A, action, B):
         return cost_so_far + (self.graph.get(A, B) or infinity)
 
+    def predecessors(self, B):
+        "The predecessors of a graph node are the nodes with a link to it."
+        if not self.graph.directed:
+            return [(B, A) for A in self.graph.get(B)]
+        return [(B, A) for A in self.graph.nodes() if B in self.graph.get(A)]
+
     def h(self, node):
         "h function is straight-line distance from a node's state to goal."
         locs = getattr(self.graph, 'locations', None)
@@ -1125,6 +1464,15 @@ class InstrumentedProblem(Problem):
     def path_cost(self, c, state1, action, state2):
         return self.problem.path_cost(c, state1, action, state2)
 
+    def predecessors(self, state):
+        self.succs += 1
+        predecessors = self.problem.predecessors(state)
+        self.states += len(predecessors)
+        return predecessors
+
+    def goal_states(self):
+        return self.problem.goal_states()
+
     def value(self, state):
         return self.problem.value(state)
 
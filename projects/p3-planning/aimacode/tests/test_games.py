@@ -59,6 +59,26 @@ def test_alphabeta_full_search():
     assert alphabeta_full_search(state, ttt) == (1, 3)
 
 
+def test_negamax_search():
+    # Fig52Game only defines the utility of terminal states
+    engine = NegamaxSearch(f52, eval_fn=lambda state, player: 0)
+    for state, move in [('A', 'a1'), ('B', 'b1'), ('C', 'c1'), ('D', 'd3')]:
+        assert engine.iterative_deepening(state)[1] == move
+
+    state = gen_state(to_move='X', x_positions=[(1, 1), (3, 3)],
+                      o_positions=[(1, 2), (3, 2)])
+    assert NegamaxSearch(ttt).iterative_deepening(state)[:2] == (1, (2, 2))
+
+    state = gen_state(to_move='O', x_positions=[(1, 1), (3, 1), (3, 3)],
+                      o_positions=[(1, 2), (3, 2)])
+    assert NegamaxSearch(ttt).iterative_deepening(state)[1] == (2, 2)
+
+    # the transposition table lets the whole game tree be solved quickly
+    engine = NegamaxSearch(ttt)
+    value, _, depth = engine.iterative_deepening(ttt.initial)
+    assert value == 0 and depth == 9
+
+
 def test_random_tests():
     assert play_game(Fig52Game(), alphabeta_player, alphabeta_player) == 3
 
@@ -68,6 +88,8 @@ def test_random_tests():
     # The player 'X' (one who plays first) in TicTacToe never loses:
     assert play_game(ttt, alphabeta_player, random_player) >= 0
 
+    assert play_game(ttt, negamax_player, negamax_player) == 0
+
 
 if __name__ == '__main__':
     pytest.main()
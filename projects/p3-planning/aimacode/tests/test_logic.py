@@ -115,6 +115,19 @@ def test_dpll():
     assert dpll_satisfiable(P & ~P) == False
 
 
+def test_cdcl():
+    assert (cdcl_satisfiable(A & ~B & C & (A | ~D) & (~E | ~D) & (C | ~D) & (~A | ~F) & (E | ~F)
+                             & (~D | ~F) & (B | ~C | D) & (A | ~E | F) & (~A | E | D))
+            == {B: False, C: True, A: True, F: False, D: True, E: False})
+    assert cdcl_satisfiable(A & ~B) == {A: True, B: False}
+    assert cdcl_satisfiable(P & ~P) == False
+    # assumptions on variables that no clause mentions
+    solver = CDCLSolver()
+    assert solver.solve([3]) and solver.model[3] is True
+    assert solver.add_clause([1, -3]) and not solver.solve([-1, 3])
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
 def test_unify():
     assert unify(x, x, {}) == {}
     assert unify(x, 3, {}) == {x: 3}
@@ -224,6 +237,7 @@ def test_SAT_plan():
                   (1, 0): {'Right': (1, 0), 'Up': (1, 0), 'Left': (1, 0), 'Down': (1, 0)},
                   (1, 1): {'Left': (1, 0), 'Up': (0, 1)}}
     assert SAT_plan((0, 0), transition, (1, 1), 4) == ['Right', 'Down']
+    assert SAT_plan((0, 0), transition, (1, 1), 4, cdcl_satisfiable) == ['Right', 'Down']
 
 
 if __name__ == '__main__':
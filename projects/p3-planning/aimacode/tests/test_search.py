@@ -19,6 +19,26 @@ def test_uniform_cost_search():
     assert uniform_cost_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
 
 
+def test_bidirectional_breadth_first_search():
+    assert bidirectional_breadth_first_search(romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    problem = GraphProblem('A', 'D', Graph({'A': {'B': 1}, 'B': {'C': 1}, 'C': {'D': 5}}))
+    assert bidirectional_breadth_first_search(problem).solution() == ['B', 'C', 'D']
+    assert bidirectional_breadth_first_search(GraphProblem('D', 'A', problem.graph)) is None
+
+
+def test_bidirectional_uniform_cost_search():
+    node = bidirectional_uniform_cost_search(romania_problem)
+    assert node.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert node.path_cost == 418
+    node = bidirectional_uniform_cost_search(GraphProblem('Oradea', 'Neamt', romania_map))
+    assert node.path_cost == uniform_cost_search(GraphProblem('Oradea', 'Neamt', romania_map)).path_cost
+
+
+def test_parallel_breadth_first_search():
+    problem = GraphProblem('Oradea', 'Neamt', romania_map)
+    assert parallel_breadth_first_search(problem, 2).solution() == breadth_first_search(problem).solution()
+
+
 def test_depth_first_graph_search():
     solution = depth_first_graph_search(romania_problem).solution()
     assert solution[-1] == 'Bucharest'
@@ -40,10 +60,34 @@ def test_astar_search():
     assert astar_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
 
 
+def test_node():
+    node = astar_search(romania_problem)
+    assert not hasattr(node, '__dict__')
+    assert [n.state for n in node.path()] == ['Arad', 'Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert node.depth == 4 and node.path_cost == 418
+    # astar_search caches the f and h values of the nodes it evaluated
+    assert node.h == 0 and node.f == 418
+
+
 def test_recursive_best_first_search():
     assert recursive_best_first_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
 
 
+def test_ida_star_search():
+    assert ida_star_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+
+def test_sma_star_search():
+    assert sma_star_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    # the optimal path still fits when the other nodes are forgotten
+    assert sma_star_search(romania_problem, max_nodes=5).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    # only the path through Fagaras fits
+    assert sma_star_search(romania_problem, max_nodes=4).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    assert sma_star_search(romania_problem, max_nodes=3) is None
+    problem = InstrumentedProblem(romania_problem)
+    assert sma_star_search(problem, max_nodes=5).path_cost == 418
+
+
 def test_BoggleFinder():
     board = list('SARTELNID')
     """
@@ -44,6 +44,22 @@ def test_argminmax():
     assert argmax(['one', 'to', 'three'], key=len) == 'three'
 
 
+def test_memoize():
+    calls = []
+
+    class Slotted:
+        __slots__ = ('value',)
+
+    def f(obj):
+        calls.append(obj)
+        return None
+
+    g = memoize(f, 'value')
+    obj = Slotted()
+    assert g(obj) is None and g(obj) is None
+    assert calls == [obj] and obj.value is None
+
+
 def test_histogram():
     assert histogram([1, 2, 4, 2, 4, 5, 7, 9, 2, 1]) == [(1, 2), (2, 3),
                                                          (4, 2), (5, 1),
@@ -56,6 +72,12 @@ def test_histogram():
                                                             (7, 1), (5, 1)]
 
 
+def test_weighted_sampler():
+    sample = weighted_sampler('abc', [0, 1, 0])
+    assert [sample() for _ in range(10)] == ['b'] * 10
+    assert weighted_sample_with_replacement('abc', [1, 0, 0], 3) == ['a'] * 3
+
+
 def test_dotproduct():
     assert dotproduct([1, 2, 3], [1000, 100, 10]) == 1230
 
@@ -176,5 +198,60 @@ def test_expr():
     assert (expr('GP(x, z) <== P(x, y) & P(y, z)')
             == Expr('<==', GP(x, z), P(x, y) & P(y, z)))
 
+
+def test_priority_queue():
+    q = PriorityQueue(min, lambda x: x[1])
+    q.extend([('a', 3), ('b', 1), ('c', 2)])
+    assert len(q) == 3 and ('b', 1) in q and ('d', 1) not in q
+    assert q[('c', 2)] == ('c', 2)
+    del q[('c', 2)]
+    assert ('c', 2) not in q and len(q) == 2
+    assert q.pop() == ('b', 1)
+    assert q.pop() == ('a', 3)
+    with pytest.raises(IndexError):
+        q.pop()
+
+    q = PriorityQueue(max)
+    q.extend([2, 5, 3])
+    assert [q.pop() for _ in range(3)] == [5, 3, 2]
+
+    # equal items are kept, and f values need not be numbers
+    q = PriorityQueue(max, lambda x: x[0])
+    q.extend(['b', 'a', 'b', 'c'])
+    assert len(q) == 4 and q['b'] == 'b'
+    assert [q.pop() for _ in range(2)] == ['c', 'b'] and 'b' in q
+    del q['b']
+    assert 'b' not in q and len(q) == 1 and q.pop() == 'a'
+
+
+def test_priority_queue_decrease_key():
+    f = {'a': 3, 'b': 2}
+    q = PriorityQueue(min, lambda x: f[x])
+    q.extend(['a', 'b'])
+    f['a'] = 4
+    assert not q.decrease_key('a')
+    f['a'] = 1
+    assert q.decrease_key('a')
+    assert len(q) == 2
+    assert [q.pop(), q.pop()] == ['a', 'b']
+    assert q.decrease_key('a') and len(q) == 1
+
+
+def test_stack_and_fifo_queue():
+    s = Stack()
+    s.extend([1, 2, 2])
+    assert len(s) == 3 and 2 in s and 3 not in s
+    assert s.pop() == 2 and 2 in s
+    assert s.pop() == 2 and 2 not in s
+    assert s.pop() == 1 and not s
+
+    q = FIFOQueue()
+    q.extend([1, 2, 1])
+    assert q.pop() == 1 and 1 in q
+    assert q.pop() == 2 and 2 not in q
+    assert q.pop() == 1 and 1 not in q and len(q) == 0
+    with pytest.raises(IndexError):
+        q.pop()
+
 if __name__ == '__main__':
     pytest.main()
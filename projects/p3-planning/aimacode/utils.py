@@ -1,9 +1,9 @@
 """Provides some utilities widely used by other modules"""
 
-import bisect
 import collections
 import collections.abc
 import functools
+import heapq
 import operator
 import os.path
 import random
@@ -203,7 +203,7 @@ def weighted_sampler(seq, weights):
     for w in weights:
         totals.append(w + totals[-1] if totals else w)
 
-    return lambda: seq[bisect.bisect(totals, random.uniform(0, totals[-1]))]
+    return lambda: random.choices(seq, cum_weights=totals)[0]
 
 
 def rounder(numbers, d=4):
@@ -270,16 +270,18 @@ except ImportError:
 
 def memoize(fn, slot=None):
     """Memoize fn: make it remember the computed value for any argument list.
-    If slot is specified, store result in that slot of first argument.
+    If slot is specified, store result in that slot of first argument; an
+    unset slot has no value yet, and a stored None is a value.
     If slot is false, store results in a dictionary."""
     if slot:
+        missing = object()
+
         def memoized_fn(obj, *args):
-            if hasattr(obj, slot):
-                return getattr(obj, slot)
-            else:
+            val = getattr(obj, slot, missing)
+            if val is missing:
                 val = fn(obj, *args)
                 setattr(obj, slot, val)
-                return val
+            return val
     else:
         def memoized_fn(*args):
             if args not in memoized_fn.cache:
@@ -525,8 +527,8 @@ class Queue:
         q.pop()         -- return the top item from the queue
         len(q)          -- number of items in q (also q.__len())
         item in q       -- does q contain item?
-    Note that isinstance(Stack(), Queue) is false, because we implement stacks
-    as lists.  If Python ever gets interfaces, Queue will be an interface."""
+    Membership tests take constant time: the queues keep a dict of their
+    items, so the items must be hashable."""
 
     def __init__(self):
         raise NotImplementedError
@@ -536,38 +538,49 @@ class Queue:
             self.append(item)
 
 
-def Stack():
-    """Return an empty list, suitable as a Last-In-First-Out Queue."""
-    return []
-
+class CountedQueue(Queue):
 
-class FIFOQueue(Queue):
-
-    """A First-In-First-Out Queue."""
+    """Base class of Stack and FIFOQueue: a deque of items, and a count of
+    the copies of each item in it for membership tests."""
 
     def __init__(self):
-        self.A = []
-        self.start = 0
+        self.A = collections.deque()
+        self.counts = {}
 
     def append(self, item):
         self.A.append(item)
+        self.counts[item] = self.counts.get(item, 0) + 1
 
     def __len__(self):
-        return len(self.A) - self.start
+        return len(self.A)
 
-    def extend(self, items):
-        self.A.extend(items)
+    def __contains__(self, item):
+        return item in self.counts
+
+    def removed(self, item):
+        """Update the counts after item was taken out of the deque; return it."""
+        count = self.counts[item] - 1
+        if count:
+            self.counts[item] = count
+        else:
+            del self.counts[item]
+        return item
+
+
+class Stack(CountedQueue):
+
+    """A Last-In-First-Out Queue."""
 
     def pop(self):
-        e = self.A[self.start]
-        self.start += 1
-        if self.start > 5 and self.start > len(self.A) / 2:
-            self.A = self.A[self.start:]
-            self.start = 0
-        return e
+        return self.removed(self.A.pop())
 
-    def __contains__(self, item):
-        return item in self.A[self.start:]
+
+class FIFOQueue(CountedQueue):
+
+    """A First-In-First-Out Queue."""
+
+    def pop(self):
+        return self.removed(self.A.popleft())
 
 
 class PriorityQueue(Queue):
@@ -575,37 +588,97 @@ class PriorityQueue(Queue):
     """A queue in which the minimum (or maximum) element (as determined by f and
     order) is returned first. If order is min, the item with minimum f(x) is
     returned first; if order is max, then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
+    Items with the same f(x) are returned in the order of the items.
+    Also supports dict-like lookup.
+
+    The items are kept in a binary heap, and a dict maps each item to its
+    heap entries, so that membership tests and lookups take constant time.
+    Deleted or replaced items are only marked as removed in the heap, and
+    skipped when they reach its top."""
 
     def __init__(self, order=min, f=lambda x: x):
-        self.A = []
+        self.heap = []
+        self.index = {}
+        self.size = 0
         self.order = order
         self.f = f
 
+    def entry(self, item):
+        # [key, tie breaker, removed, item]; the heap pops the lowest key
+        if self.order == min:
+            return [self.f(item), item, False, item]
+        return [ReverseOrder(self.f(item)), ReverseOrder(item), False, item]
+
     def append(self, item):
-        bisect.insort(self.A, (self.f(item), item))
+        """Add an item, keeping the equal items already in the queue."""
+        entry = self.entry(item)
+        self.index.setdefault(item, []).append(entry)
+        self.size += 1
+        heapq.heappush(self.heap, entry)
+
+    def decrease_key(self, item):
+        """Add an item, unless an equal item with a better (or the same) f
+        value is already in the queue; then keep that one, otherwise replace
+        the equal items. Return True if the item was added."""
+        incumbents = self.index.get(item)
+        if incumbents is not None:
+            entry = self.entry(item)
+            if any(not entry[0] < incumbent[0] for incumbent in incumbents):
+                return False
+            del self[item]
+        self.append(item)
+        return True
 
     def __len__(self):
-        return len(self.A)
+        return self.size
 
     def pop(self):
-        if self.order == min:
-            return self.A.pop(0)[1]
-        else:
-            return self.A.pop()[1]
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            if not entry[2]:
+                entries = self.index[entry[3]]
+                if len(entries) == 1:
+                    del self.index[entry[3]]
+                else:
+                    # equal items can have equal entries, so remove this one
+                    # by identity
+                    entries.pop(next(i for i, e in enumerate(entries) if e is entry))
+                self.size -= 1
+                return entry[3]
+        raise IndexError('pop from empty priority queue')
 
     def __contains__(self, item):
-        return any(item == pair[1] for pair in self.A)
+        return item in self.index
 
     def __getitem__(self, key):
-        for _, item in self.A:
-            if item == key:
-                return item
+        entries = self.index.get(key)
+        if entries is not None:
+            return entries[0][3]
 
     def __delitem__(self, key):
-        for i, (value, item) in enumerate(self.A):
-            if item == key:
-                self.A.pop(i)
+        """Remove all the items equal to key."""
+        entries = self.index.pop(key, ())
+        for entry in entries:
+            entry[2] = True
+        self.size -= len(entries)
+
+
+class ReverseOrder:
+
+    """Wrapper of a key that compares in reverse order, so that the heap of a
+    max-first PriorityQueue pops the largest key first without negating it
+    (f values need not be numbers)."""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
 
 # ______________________________________________________________________________
 # Useful Shorthands
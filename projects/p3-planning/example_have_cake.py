@@ -36,7 +36,7 @@ class HaveCakeProblem(Problem):
                              [effect_add, effect_rem])
         return [eat_action, bake_action]
 
-    def actions(self, state: str) -> list:  # of Action
+    def actions(self, state: int) -> list:  # of Action
         possible_actions = []
         kb = PropKB()
         kb.tell(decode_state(state, self.state_map).pos_sentence())
@@ -52,7 +52,7 @@ class HaveCakeProblem(Problem):
                 possible_actions.append(action)
         return possible_actions
 
-    def result(self, state: str, action: Action):
+    def result(self, state: int, action: Action):
         new_state = FluentState([], [])
         old_state = decode_state(state, self.state_map)
         for fluent in old_state.pos:
@@ -69,7 +69,7 @@ class HaveCakeProblem(Problem):
                 new_state.neg.append(fluent)
         return encode_state(new_state, self.state_map)
 
-    def goal_test(self, state: str) -> bool:
+    def goal_test(self, state: int) -> bool:
         kb = PropKB()
         kb.tell(decode_state(state, self.state_map).pos_sentence())
         for clause in self.goal:
@@ -1,5 +1,10 @@
 from aimacode.logic import associate
-from aimacode.utils import expr
+from aimacode.utils import expr, Expr
+
+# interned fluent and action expressions, see intern_expr, and the same
+# expressions keyed by their operator and argument names, see fluent
+_interned = {}
+_fluents = {}
 
 
 class FluentState():
@@ -18,6 +23,75 @@ class FluentState():
         return expr(conjunctive_sentence(self.pos, []))
 
 
+def intern_expr(e: Expr) -> Expr:
+    """ return the canonical instance of an expression equal to e
+
+    Interned expressions are shared between states, actions and planning graphs
+    of all problems, so that dict and set lookups mostly compare identical
+    objects.
+
+    :param e: expr
+    :return: expr equal to e
+    """
+    return _interned.setdefault(e, e)
+
+
+def fluent(op: str, *args: str) -> Expr:
+    """ interned ground expression op(args), built without parsing a string
+
+    :param op: str eg. 'At'
+    :param args: str constants eg. 'C1', 'SFO'
+    :return: expr equal to expr("At(C1, SFO)")
+    """
+    key = (op,) + args
+    e = _fluents.get(key)
+    if e is None:
+        e = intern_expr(Expr(op, *(intern_expr(Expr(arg)) for arg in args)))
+        _fluents[key] = e
+    return e
+
+
+def relaxed_reachable_actions(actions: list, initial: list) -> list:
+    """ actions whose positive preconditions are reachable from the initial fluents
+
+    Reachability is computed in the relaxed problem that ignores delete effects
+    and negative preconditions, so an action that is not returned can never be
+    applied in any state reachable from the initial state.
+
+    :param actions: list of Action
+    :param initial: list of fluents true in the initial state
+    :return: list of Action in the order of actions
+    """
+    # number of unreached preconditions of every action, and the actions
+    # waiting for each fluent
+    missing = []
+    waiting = {}
+    for i, action in enumerate(actions):
+        preconds = set(action.precond_pos)
+        missing.append(len(preconds))
+        for p in preconds:
+            waiting.setdefault(p, []).append(i)
+
+    reached = set()
+    enabled = [i for i, count in enumerate(missing) if count == 0]
+    queue = list(initial)
+    while queue or enabled:
+        while enabled:
+            queue.extend(actions[enabled.pop()].effect_add)
+        if not queue:
+            break
+        f = queue.pop()
+        if f in reached:
+            continue
+        reached.add(f)
+        for i in waiting.get(f, ()):
+            missing[i] -= 1
+            if missing[i] == 0:
+                enabled.append(i)
+
+    return [action for action, count in zip(actions, missing) if count == 0]
+
+
 def conjunctive_sentence(pos_list, neg_list):
     """ returns expr conjuntive sentence given positive and negative fluent lists
 
@@ -34,35 +108,72 @@ def conjunctive_sentence(pos_list, neg_list):
     return associate('&', clauses)
 
 
-def encode_state(fs: FluentState, fluent_map: list) -> str:
-    """ encode fluents to a string of T/F using mapping
+def fluent_indices(fluent_map: list) -> dict:
+    """ map each fluent to its bit position in encoded states
+
+    :param fluent_map: ordered list of possible fluents for the problem
+    :return: dict of fluent -> int index into fluent_map
+    """
+    return {fluent: idx for idx, fluent in enumerate(fluent_map)}
+
+
+def fluent_mask(fluents: list, indices: dict) -> int:
+    """ bitset of the given fluents, in the same encoding as encode_state
+
+    :param fluents: list of fluents, all of which must be in indices
+    :param indices: dict from fluent_indices(fluent_map)
+    :return: int with the bit of every fluent set
+    """
+    mask = 0
+    for fluent in fluents:
+        mask |= 1 << indices[fluent]
+    return mask
+
+
+def set_bits(state: int):
+    """ iterate over the indices of the set bits of an encoded state, lowest first
+
+    :param state: int bitset
+    :return: generator of int
+    """
+    while state:
+        low = state & -state
+        yield low.bit_length() - 1
+        state ^= low
+
+
+def encode_state(fs: FluentState, fluent_map: list, indices: dict=None) -> int:
+    """ encode fluents to an int bitset using mapping
+
+    Bit i of the state is set if fluent_map[i] is a positive fluent of fs;
+    positive fluents that are not in the map are ignored.
 
     :param fs: FluentState object
     :param fluent_map: ordered list of possible fluents for the problem
-    :return: str eg. "TFFTFT" string of mapped positive and negative fluents
+    :param indices: dict from fluent_indices(fluent_map); computed if not given
+    :return: int eg. 0b101001 for the fluents 0, 3 and 5 positive
     """
-    state_tf = []
-    for fluent in fluent_map:
-        if fluent in fs.pos:
-            state_tf.append('T')
-        else:
-            state_tf.append('F')
-    return "".join(state_tf)
+    if indices is None:
+        indices = fluent_indices(fluent_map)
+    state = 0
+    for fluent in fs.pos:
+        idx = indices.get(fluent)
+        if idx is not None:
+            state |= 1 << idx
+    return state
 
 
-def decode_state(state: str, fluent_map: list) -> FluentState:
-    """ decode string of T/F as fluent per mapping
+def decode_state(state: int, fluent_map: list) -> FluentState:
+    """ decode int bitset as fluent per mapping
 
-    :param state: str eg. "TFFTFT" string of mapped positive and negative fluents
+    :param state: int bitset of mapped positive fluents, see encode_state
     :param fluent_map: ordered list of possible fluents for the problem
     :return: fs: FluentState object
-
-    lengths of state string and fluent_map list must be the same
     """
     fs = FluentState([], [])
-    for idx, char in enumerate(state):
-        if char == 'T':
-            fs.pos.append(fluent_map[idx])
+    for idx, fluent in enumerate(fluent_map):
+        if state >> idx & 1:
+            fs.pos.append(fluent)
         else:
-            fs.neg.append(fluent_map[idx])
+            fs.neg.append(fluent)
     return fs
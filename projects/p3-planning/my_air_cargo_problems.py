@@ -1,13 +1,20 @@
-from aimacode.logic import PropKB
+import itertools
+import random
+
 from aimacode.planning import Action
 from aimacode.search import (
     Node, Problem,
 )
 from aimacode.utils import expr
 from lp_utils import (
-    FluentState, encode_state, decode_state,
+    FluentState, encode_state, decode_state, fluent_indices, fluent_mask,
+    set_bits, fluent, intern_expr, relaxed_reachable_actions,
 )
-from my_planning_graph import PlanningGraph
+from my_planning_graph import CompiledPlanningGraph
+
+# goal_states refuses to list more goal states than this; there are
+# airports ** planes of them if the goal does not place the planes
+MAX_GOAL_STATES = 100000
 
 
 class AirCargoProblem(Problem):
@@ -25,13 +32,26 @@ class AirCargoProblem(Problem):
         :param goal: list of expr
             literal fluents required for goal test
         """
-        self.state_map = initial.pos + initial.neg
-        self.initial_state_TF = encode_state(initial, self.state_map)
-        Problem.__init__(self, self.initial_state_TF, goal=goal)
+        self.state_map = [intern_expr(f) for f in initial.pos + initial.neg]
+        # states are int bitsets; bit i is set if state_map[i] is true
+        self.fluent_index = fluent_indices(self.state_map)
+        self.initial_state_TF = encode_state(initial, self.state_map, self.fluent_index)
+        Problem.__init__(self, self.initial_state_TF, goal=[intern_expr(g) for g in goal])
         self.cargos = cargos
         self.planes = planes
         self.airports = airports
         self.actions_list = self.get_actions()
+        self.compile_preconditions()
+        self.effect_masks = {action: self.compile_effects(action) for action in self.actions_list}
+        # only backward searches need the regression tables, which are
+        # compiled by the first call to predecessors or goal_states
+        self.invariant_masks = None
+        self.planning_graph = CompiledPlanningGraph(self)
+        # the planning graph of the last state a heuristic was computed for
+        self.graph_cache = (None, None)
+        # h_pg_setlevel value per state; the search meets most states on
+        # several paths, and the mutex levels are too slow to recompute
+        self.setlevel_cache = {}
 
     def get_actions(self):
         '''
@@ -40,6 +60,11 @@ class AirCargoProblem(Problem):
         aimacode.planning module. It is computationally expensive to call this method directly;
         however, it is called in the constructor and the results cached in the `actions_list` property.
 
+        Actions are built from interned fluents (see lp_utils.fluent) without
+        parsing expression strings, and actions that cannot be applied in any
+        state reachable from the initial state are pruned with a relaxed
+        (delete-free) reachability analysis.
+
         Returns:
         ----------
         list<Action>
@@ -66,14 +91,14 @@ class AirCargoProblem(Problem):
             for c in self.cargos:
                 for p in self.planes:
                     for a in self.airports:
-                        precond_pos = [expr("At({}, {})".format(c, a)),
-                                        expr("At({}, {})".format(p, a))]
+                        precond_pos = [fluent('At', c, a),
+                                        fluent('At', p, a)]
                         precond_neg = []
 
-                        effect_add = [expr("In({}, {})".format(c, p))]
-                        effect_rem = [expr("At({}, {})".format(c, a))]
+                        effect_add = [fluent('In', c, p)]
+                        effect_rem = [fluent('At', c, a)]
 
-                        load = Action(expr("Load({}, {}, {})".format(c, p, a)),
+                        load = Action(fluent('Load', c, p, a),
                                         [precond_pos, precond_neg],
                                         [effect_add, effect_rem])
                         loads.append(load)
@@ -94,14 +119,14 @@ class AirCargoProblem(Problem):
             for c in self.cargos:
                 for p in self.planes:
                     for a in self.airports:
-                        precond_pos = [expr("In({}, {})".format(c, p)),
-                                        expr("At({}, {})".format(p, a))]
+                        precond_pos = [fluent('In', c, p),
+                                        fluent('At', p, a)]
                         precond_neg = []
 
-                        effect_add = [expr("At({}, {})".format(c, a))]
-                        effect_rem = [expr("In({}, {})".format(c, p))]
+                        effect_add = [fluent('At', c, a)]
+                        effect_rem = [fluent('In', c, p)]
 
-                        unload = Action(expr("Unload({}, {}, {})".format(c, p, a)),
+                        unload = Action(fluent('Unload', c, p, a),
                                         [precond_pos, precond_neg],
                                         [effect_add, effect_rem])
                         unloads.append(unload)
@@ -121,44 +146,227 @@ class AirCargoProblem(Problem):
                 for to in self.airports:
                     if fr != to:
                         for p in self.planes:
-                            precond_pos = [expr("At({}, {})".format(p, fr)),
+                            precond_pos = [fluent('At', p, fr),
                                            ]
                             precond_neg = []
-                            effect_add = [expr("At({}, {})".format(p, to))]
-                            effect_rem = [expr("At({}, {})".format(p, fr))]
-                            fly = Action(expr("Fly({}, {}, {})".format(p, fr, to)),
+                            effect_add = [fluent('At', p, to)]
+                            effect_rem = [fluent('At', p, fr)]
+                            fly = Action(fluent('Fly', p, fr, to),
                                          [precond_pos, precond_neg],
                                          [effect_add, effect_rem])
                             flys.append(fly)
             return flys
 
-        return load_actions() + unload_actions() + fly_actions()
+        initial = decode_state(self.initial_state_TF, self.state_map).pos
+        return relaxed_reachable_actions(load_actions() + unload_actions() + fly_actions(), initial)
+
+    def compile_preconditions(self):
+        '''
+        Compile the preconditions of every action in `actions_list` and the
+        goal into bitmasks over the state encoding, so that `actions` and
+        `goal_test` are mask tests on the state.
+
+        Instance variables calculated:
+            precond_masks: list of (pos mask, neg mask) per action in actions_list
+            actions_by_fluent: list with, for each fluent index, the indices of
+                the actions that have the fluent as a positive precondition
+            free_actions: indices of the actions without positive preconditions
+            goal_mask: int mask of the goal fluents; None if a goal fluent is
+                not in state_map, i.e., the goal can never be reached
+        '''
+        self.precond_masks = []
+        self.actions_by_fluent = [[] for _ in self.state_map]
+        self.free_actions = []
+        for i, action in enumerate(self.actions_list):
+            if any(p not in self.fluent_index for p in action.precond_pos):
+                # a precondition that is not a fluent of the problem never holds
+                self.precond_masks.append(None)
+                continue
+            pos = fluent_mask(action.precond_pos, self.fluent_index)
+            # negative preconditions that are not fluents of the problem always hold
+            neg = fluent_mask([p for p in action.precond_neg if p in self.fluent_index],
+                              self.fluent_index)
+            self.precond_masks.append((pos, neg))
+            if pos:
+                for idx in set_bits(pos):
+                    self.actions_by_fluent[idx].append(i)
+            else:
+                self.free_actions.append(i)
+        if all(g in self.fluent_index for g in self.goal):
+            self.goal_mask = fluent_mask(self.goal, self.fluent_index)
+        else:
+            self.goal_mask = None
+
+    def compile_effects(self, action: Action) -> tuple:
+        '''
+        Compile the effects of an action into masks over the state encoding.
+        Effect fluents that are not in state_map cannot be represented in a
+        state and are ignored.
+
+        :param action: Action
+        :return: (add mask, delete mask)
+        '''
+        add = fluent_mask([e for e in action.effect_add if e in self.fluent_index],
+                          self.fluent_index)
+        rem = fluent_mask([e for e in action.effect_rem if e in self.fluent_index],
+                          self.fluent_index)
+        return add, rem
 
-    def actions(self, state: str) -> list:
+    def compile_regression(self):
+        '''
+        Prepare the backward (regression) search of the state space used by
+        `predecessors` and `goal_states`.
+
+        Every cargo is at exactly one airport or in exactly one plane, and
+        every plane is at exactly one airport, in every state reachable from
+        the initial state. These groups of fluents are the invariants of the
+        domain: states that break them are not reachable, so regression
+        skips them, and the goal states are the states that satisfy both the
+        goal and the invariants. A group is only used if the initial state
+        satisfies it and every action keeps it satisfied.
+
+        Instance variables calculated:
+            invariant_masks: list of int masks, one per invariant group
+            actions_by_add: list with, for each fluent index, the indices of
+                the actions that add the fluent first (lowest index)
+            delete_only_actions: indices of the actions without add effects
+        '''
+        groups = [[fluent('At', c, a) for a in self.airports] +
+                  [fluent('In', c, p) for p in self.planes] for c in self.cargos]
+        groups += [[fluent('At', p, a) for a in self.airports] for p in self.planes]
+        self.invariant_masks = []
+        for group in groups:
+            if not all(f in self.fluent_index for f in group):
+                continue
+            mask = fluent_mask(group, self.fluent_index)
+            if bin(self.initial & mask).count('1') != 1:
+                continue
+            if all(self.keeps_invariant(i, mask) for i in range(len(self.actions_list))):
+                self.invariant_masks.append(mask)
+
+        self.actions_by_add = [[] for _ in self.state_map]
+        self.delete_only_actions = []
+        for i, action in enumerate(self.actions_list):
+            add = self.effect_masks[action][0]
+            if self.precond_masks[i] is None:
+                continue
+            if add:
+                self.actions_by_add[next(set_bits(add))].append(i)
+            else:
+                self.delete_only_actions.append(i)
+
+    def keeps_invariant(self, i: int, mask: int) -> bool:
+        ''' True if action i keeps exactly one fluent of the mask true '''
+        if self.precond_masks[i] is None:
+            return True
+        pos = self.precond_masks[i][0]
+        add, rem = self.effect_masks[self.actions_list[i]]
+        if not (add | rem) & mask:
+            return True
+        # the action must move the true fluent of the group to another one
+        return (bin(add & mask).count('1') == 1 and bin(pos & mask).count('1') == 1 and
+                rem & mask == pos & mask and not add & rem & mask)
+
+    def is_consistent(self, state: int) -> bool:
+        ''' True if the state satisfies the invariants, see compile_regression '''
+        return all(bin(state & mask).count('1') == 1 for mask in self.invariant_masks)
+
+    def predecessors(self, state: int) -> list:
+        """ Return the states from which an action leads to the given state
+        (regression of the state through the actions), skipping the states
+        that break the invariants of the domain.
+
+        :param state: int bitset representing state
+        :return: list of (Action, int) pairs
+        """
+        if self.invariant_masks is None:
+            self.compile_regression()
+        candidates = set(self.delete_only_actions)
+        for idx in set_bits(state):
+            candidates.update(self.actions_by_add[idx])
+
+        predecessors = []
+        for i in sorted(candidates):
+            action = self.actions_list[i]
+            pos, neg = self.precond_masks[i]
+            add, rem = self.effect_masks[action]
+            changed = add | rem
+            # the effects must hold in the state, and the preconditions on
+            # fluents that the action does not change must hold as well
+            if state & add != add or state & rem & ~add:
+                continue
+            if state & pos & ~changed != pos & ~changed or state & neg & ~changed:
+                continue
+            # the changed fluents without a precondition may have had either value
+            base = state & ~changed | pos
+            free = list(set_bits(changed & ~(pos | neg)))
+            for values in itertools.product((0, 1), repeat=len(free)):
+                previous = base
+                for idx, value in zip(free, values):
+                    previous |= value << idx
+                if self.is_consistent(previous):
+                    predecessors.append((action, previous))
+        return predecessors
+
+    def goal_states(self) -> list:
+        """ Return the states that satisfy the goal and the invariants of the
+        domain (see compile_regression), where backward searches start.
+
+        :return: list of int
+        :raises ValueError: if there are more than MAX_GOAL_STATES candidate
+            goal states
+        """
+        if self.goal_mask is None:
+            return []
+        if self.invariant_masks is None:
+            self.compile_regression()
+        # each invariant group has one true fluent, the goal fluent of the
+        # group if there is one; other fluents may have either value
+        choices = []
+        grouped = 0
+        for mask in self.invariant_masks:
+            grouped |= mask
+            if self.goal_mask & mask:
+                choices.append([self.goal_mask & mask])
+            else:
+                choices.append([1 << idx for idx in set_bits(mask)])
+        for idx in set_bits((1 << len(self.state_map)) - 1 & ~grouped):
+            if self.goal_mask >> idx & 1:
+                choices.append([1 << idx])
+            else:
+                choices.append([0, 1 << idx])
+        count = 1
+        for bits in choices:
+            count *= len(bits)
+        if count > MAX_GOAL_STATES:
+            raise ValueError("{} candidate goal states for a backward search, more than {}".format(
+                count, MAX_GOAL_STATES))
+        return [sum(bits) for bits in itertools.product(*choices)
+                if self.is_consistent(sum(bits))]
+
+    def actions(self, state: int) -> list:
         """ Return the actions that can be executed in the given state.
 
-        :param state: str
-            state represented as T/F string of mapped fluents (state variables)
-            e.g. 'FTTTFF'
+        :param state: int
+            state represented as a bitset of mapped fluents (state variables)
+            e.g. 0b001110
         :return: list of Action objects
         """
-        # TODO implement
+        # only the actions that need one of the true fluents, or no fluent at
+        # all, can be applicable
+        candidates = set(self.free_actions)
+        for idx in set_bits(state):
+            candidates.update(self.actions_by_fluent[idx])
+
         possible_actions = []
-        kb = PropKB()
-        kb.tell(decode_state(state, self.state_map).pos_sentence())
-        for action in self.actions_list:
-            is_possible = True
-            for clause in action.precond_pos:
-                if clause not in kb.clauses:
-                    is_possible = False
-            for clause in action.precond_neg:
-                if clause in kb.clauses:
-                    is_possible = False
-            if is_possible:
-                possible_actions.append(action)
+        # keep the order of actions_list, which determines the search order
+        for i in sorted(candidates):
+            pos, neg = self.precond_masks[i]
+            if state & pos == pos and not state & neg:
+                possible_actions.append(self.actions_list[i])
         return possible_actions
 
-    def result(self, state: str, action: Action):
+    def result(self, state: int, action: Action):
         """ Return the state that results from executing the given
         action in the given state. The action must be one of
         self.actions(state).
@@ -167,37 +375,21 @@ class AirCargoProblem(Problem):
         :param action: Action applied
         :return: resulting state after action
         """
-        # TODO implement
-        new_state = FluentState([], [])
-        old_state = decode_state(state, self.state_map)
-
-        for fluent in old_state.pos:
-            if fluent not in action.effect_rem:
-                new_state.pos.append(fluent)
-        for fluent in action.effect_add:
-            if fluent not in new_state.pos:
-                new_state.pos.append(fluent)
-        for fluent in old_state.neg:
-            if fluent not in action.effect_add:
-                new_state.neg.append(fluent)
-        for fluent in action.effect_rem:
-            if fluent not in new_state.neg:
-                new_state.neg.append(fluent)
-
-        return encode_state(new_state, self.state_map)
-
-    def goal_test(self, state: str) -> bool:
+        masks = self.effect_masks.get(action)
+        if masks is None:
+            # an action that was not grounded by this problem
+            masks = self.compile_effects(action)
+        add, rem = masks
+        # added fluents win over removed ones, as in the effect lists
+        return state & ~rem | add
+
+    def goal_test(self, state: int) -> bool:
         """ Test the state to see if goal is reached
 
-        :param state: str representing state
+        :param state: int bitset representing state
         :return: bool
         """
-        kb = PropKB()
-        kb.tell(decode_state(state, self.state_map).pos_sentence())
-        for clause in self.goal:
-            if clause not in kb.clauses:
-                return False
-        return True
+        return self.goal_mask is not None and state & self.goal_mask == self.goal_mask
 
     def h_1(self, node: Node):
         # note that this is not a true heuristic
@@ -211,10 +403,52 @@ class AirCargoProblem(Problem):
         out from the current state in order to satisfy each individual goal
         condition.
         '''
-        # requires implemented PlanningGraph class
-        pg = PlanningGraph(self, node.state)
-        pg_levelsum = pg.h_levelsum()
-        return pg_levelsum
+        # the planning graph structure is compiled once per problem, and only
+        # the literal levels of the relaxed graph (without mutexes) are
+        # computed for every state; the result is a lower bound on
+        # PlanningGraph(self, node.state).h_levelsum()
+        return self.state_graph(node.state).h_levelsum(self.goal)
+
+    def h_pg_maxlevel(self, node: Node):
+        '''
+        This heuristic uses a planning graph representation of the problem
+        state space to estimate the number of levels needed to satisfy the
+        hardest goal condition. It is admissible.
+        '''
+        return self.state_graph(node.state).h_maxlevel(self.goal)
+
+    def h_pg_setlevel(self, node: Node):
+        '''
+        This heuristic uses a planning graph representation of the problem
+        state space, including its mutexes, to estimate the number of levels
+        needed to satisfy all of the goal conditions together. It is
+        admissible and dominates h_pg_maxlevel.
+        '''
+        h = self.setlevel_cache.get(node.state)
+        if h is None:
+            h = self.state_graph(node.state).h_setlevel(self.goal)
+            self.setlevel_cache[node.state] = h
+        return h
+
+    def h_pg_ff(self, node: Node):
+        '''
+        This heuristic counts the actions of a relaxed plan (a plan ignoring
+        the delete effects of actions) extracted from a planning graph
+        representation of the problem state space, as in the FF planner.
+        '''
+        return self.state_graph(node.state).h_ff(self.goal)
+
+    def state_graph(self, state: int):
+        '''the planning graph of a state, shared by the planning graph heuristics
+
+        :param state: int bitset representing state
+        :return: StateGraph
+        '''
+        cached_state, graph = self.graph_cache
+        if cached_state != state:
+            graph = self.planning_graph.build(state)
+            self.graph_cache = (state, graph)
+        return graph
 
     def h_ignore_preconditions(self, node: Node):
         '''
@@ -225,10 +459,9 @@ class AirCargoProblem(Problem):
         '''
         # TODO implement (see Russell-Norvig Ed-3 10.2.3  or Russell-Norvig Ed-2 11.2)
         count = len(self.goal) # how many goals do we have
-        current_state = decode_state(node.state, self.state_map)
-        for pos_fluent in current_state.pos:
-            if pos_fluent in self.goal: # means that it was already achieved
-                count -= 1
+        # subtract the goals that were already achieved
+        for idx in set_bits(node.state & (self.goal_mask or 0)):
+            count -= 1
         return count # we only want to return the delta: how many goal fluents still need to be achieved
 
 
@@ -363,4 +596,46 @@ def air_cargo_p3() -> AirCargoProblem:
             expr('At(C2, SFO)'),
             expr('At(C4, SFO)')
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
\ No newline at end of file
+    return AirCargoProblem(cargos, planes, airports, init, goal)
+
+
+def air_cargo_generated(num_cargos: int, num_planes: int, num_airports: int,
+                        seed=None) -> AirCargoProblem:
+    '''
+    Generate an air cargo problem of the given size. Cargos and planes start
+    at random airports, and every cargo must be delivered to a random airport
+    other than its start (if there is more than one airport).
+
+    The negative fluents of the initial state are derived with the
+    closed-world assumption: every At and In fluent of the domain that is not
+    true initially is false.
+
+    :param num_cargos: int number of cargos C1, C2, ...
+    :param num_planes: int number of planes P1, P2, ...
+    :param num_airports: int number of airports A1, A2, ...
+    :param seed: seed of the random initial state and goal
+    :return: AirCargoProblem
+    '''
+    rng = random.Random(seed)
+    cargos = ['C{}'.format(i + 1) for i in range(num_cargos)]
+    planes = ['P{}'.format(i + 1) for i in range(num_planes)]
+    airports = ['A{}'.format(i + 1) for i in range(num_airports)]
+
+    location = {}
+    goal = []
+    for c in cargos:
+        location[c] = rng.choice(airports)
+        destinations = [a for a in airports if a != location[c]] or airports
+        goal.append(fluent('At', c, rng.choice(destinations)))
+    for p in planes:
+        location[p] = rng.choice(airports)
+
+    pos = [fluent('At', x, location[x]) for x in cargos + planes]
+    neg = []
+    for c in cargos:
+        neg.extend(fluent('At', c, a) for a in airports if a != location[c])
+        neg.extend(fluent('In', c, p) for p in planes)
+    for p in planes:
+        neg.extend(fluent('At', p, a) for a in airports if a != location[p])
+
+    return AirCargoProblem(cargos, planes, airports, FluentState(pos, neg), goal)
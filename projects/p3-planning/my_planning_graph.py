@@ -1,7 +1,13 @@
+import weakref
+
 from aimacode.planning import Action
-from aimacode.search import Problem
-from aimacode.utils import expr
-from lp_utils import decode_state
+from aimacode.search import Node, Problem
+from aimacode.utils import expr, Expr
+from lp_utils import decode_state, set_bits
+
+# (prenodes, effnodes, is_persistent) of the ground actions seen by PgNode_a;
+# the S-nodes in them are templates that are never connected to a graph
+_action_templates = weakref.WeakKeyDictionary()
 
 
 class PgNode():
@@ -12,6 +18,7 @@ class PgNode():
     children: the set of nodes in the subsequent level
     mutex: the set of sibling nodes that are mutually exclusive with this node
     '''
+    __slots__ = ('parents', 'children', 'mutex')
 
     def __init__(self):
         self.parents = set()
@@ -56,6 +63,7 @@ class PgNode_s(PgNode):
         Boolean flag indicating whether the literal expression is positive or
         negative.
     '''
+    __slots__ = ('symbol', 'is_pos', 'literal', 'hash_value')
 
     def __init__(self, symbol: str, is_pos: bool):
         ''' S-level Planning Graph node constructor
@@ -73,9 +81,11 @@ class PgNode_s(PgNode):
         PgNode.__init__(self)
         self.symbol = symbol
         self.is_pos = is_pos
-        self.literal = expr(self.symbol)
+        # symbols of planning problems are already expressions; only parse strings
+        self.literal = symbol if isinstance(symbol, Expr) else expr(symbol)
         if not self.is_pos:
-            self.literal = expr('~{}'.format(self.symbol))
+            self.literal = ~self.literal
+        self.hash_value = hash(self.symbol) ^ hash(self.is_pos)
 
     def show(self):
         '''helper print for debugging shows literal plus counts of parents, children, siblings
@@ -97,12 +107,13 @@ class PgNode_s(PgNode):
                    and (self.is_pos == other.is_pos)
 
     def __hash__(self):
-        return hash(self.symbol) ^ hash(self.is_pos)
+        return self.hash_value
 
 
 class PgNode_a(PgNode):
     '''A-type (action) Planning Graph node - inherited from PgNode
     '''
+    __slots__ = ('action', 'prenodes', 'effnodes', 'is_persistent', 'hash_value')
 
     def __init__(self, action: Action):
         '''A-level Planning Graph node constructor
@@ -123,11 +134,16 @@ class PgNode_a(PgNode):
        '''
         PgNode.__init__(self)
         self.action = action
-        self.prenodes = self.precond_s_nodes()
-        self.effnodes = self.effect_s_nodes()
-        self.is_persistent = False
-        if self.prenodes == self.effnodes:
-            self.is_persistent = True
+        # the precondition and effect nodes only depend on the action, so
+        # they are computed once and shared by the nodes of all levels
+        template = _action_templates.get(action)
+        if template is None:
+            self.prenodes = frozenset(self.precond_s_nodes())
+            self.effnodes = frozenset(self.effect_s_nodes())
+            template = (self.prenodes, self.effnodes, self.prenodes == self.effnodes)
+            _action_templates[action] = template
+        self.prenodes, self.effnodes, self.is_persistent = template
+        self.hash_value = hash(self.action.name) ^ hash(self.action.args)
 
     def show(self):
         '''helper print for debugging shows action plus counts of parents, children, siblings
@@ -181,7 +197,7 @@ class PgNode_a(PgNode):
                    and (self.action.args == other.action.args)
 
     def __hash__(self):
-        return hash(self.action.name) ^ hash(self.action.args)
+        return self.hash_value
 
 
 def mutexify(node1: PgNode, node2: PgNode):
@@ -198,16 +214,244 @@ def mutexify(node1: PgNode, node2: PgNode):
     node2.mutex.add(node1)
 
 
+class MutexTables():
+    '''
+    Level-independent mutex relations of the actions of a problem as bitsets,
+    computed once per problem and shared by the planning graphs of all of
+    its states (see mutex_tables).
+
+    Actions are numbered in the order of PlanningGraph.all_actions, and
+    literals are numbered 2 * i (positive) and 2 * i + 1 (negative) for the
+    i-th fluent (the fluents of the problem state_map first, then fluents in
+    the order seen), so that a literal and its negation differ in the lowest
+    bit. Bit j of a mask stands for action (or literal) j.
+    '''
+
+    def __init__(self, actions: list, serial: bool, fluents: list=()):
+        '''
+        :param actions: list of Action, including no-op actions
+        :param serial: bool whether the planning graph is serial
+        :param fluents: list of fluents to number first, e.g. the problem state_map
+        Instance variables calculated:
+            action_ids: dict of Action -> action number
+            fluent_ids: dict of fluent -> fluent number
+            preconds: list of precondition literal masks, per action
+            precond_lits: list of the precondition literal numbers, per action
+            effect_lits: list of the effect literal numbers, per action
+            effects: list of effect literal masks, per action
+            needed_by: dict of literal number -> mask of the actions that need it
+            added_by: dict of literal number -> mask of the actions that add it
+            static: list of masks of the actions that are mutex with each action at
+                every level: serial, inconsistent effects and interference mutexes
+        '''
+        self.action_ids = {}
+        self.fluent_ids = {}
+        self.preconds = []
+        self.effects = []
+        self.precond_lits = []
+        self.effect_lits = []
+        self.needed_by = {}
+        self.added_by = {}
+        self.static = []
+        for f in fluents:
+            self.literal_id(f, True)
+
+        adders, removers, pos_needers, neg_needers = {}, {}, {}, {}
+        nonpersistent = 0
+        for i, action in enumerate(actions):
+            self.action_ids[action] = i
+            bit = 1 << i
+            pre = 0
+            for f in action.precond_pos:
+                pos_needers[f] = pos_needers.get(f, 0) | bit
+                pre |= 1 << self.literal_id(f, True)
+            for f in action.precond_neg:
+                neg_needers[f] = neg_needers.get(f, 0) | bit
+                pre |= 1 << self.literal_id(f, False)
+            eff = 0
+            for f in action.effect_add:
+                adders[f] = adders.get(f, 0) | bit
+                eff |= 1 << self.literal_id(f, True)
+            for f in action.effect_rem:
+                removers[f] = removers.get(f, 0) | bit
+                eff |= 1 << self.literal_id(f, False)
+            self.preconds.append(pre)
+            self.effects.append(eff)
+            self.precond_lits.append(list(set_bits(pre)))
+            self.effect_lits.append(list(set_bits(eff)))
+            for lit in set_bits(pre):
+                self.needed_by[lit] = self.needed_by.get(lit, 0) | bit
+            for lit in set_bits(eff):
+                self.added_by[lit] = self.added_by.get(lit, 0) | bit
+            if not self.is_persistent(action):
+                nonpersistent |= bit
+
+        for i, action in enumerate(actions):
+            mask = 0
+            if serial and nonpersistent >> i & 1:
+                mask |= nonpersistent
+            # inconsistent effects: one action negates an effect of the other
+            for f in action.effect_add:
+                mask |= removers.get(f, 0)
+                # interference: an effect negates a precondition of the other
+                mask |= neg_needers.get(f, 0)
+            for f in action.effect_rem:
+                mask |= adders.get(f, 0)
+                mask |= pos_needers.get(f, 0)
+            # interference the other way around
+            for f in action.precond_pos:
+                mask |= removers.get(f, 0)
+            for f in action.precond_neg:
+                mask |= adders.get(f, 0)
+            self.static.append(mask & ~(1 << i))
+
+    @staticmethod
+    def is_persistent(action: Action) -> bool:
+        '''True for no-op actions, whose preconditions are their effects (see PgNode_a)'''
+        return (set(action.precond_pos) == set(action.effect_add) and
+                set(action.precond_neg) == set(action.effect_rem))
+
+    def literal_id(self, fluent, is_pos: bool) -> int:
+        '''number of a literal, assigning a new number to fluents not seen before'''
+        f = self.fluent_ids.setdefault(fluent, len(self.fluent_ids))
+        return 2 * f + (0 if is_pos else 1)
+
+    def consistent(self, i: int, s_mutexes: dict) -> bool:
+        '''whether no pair of preconditions of an action is mutex, so that the
+        action can be added to the A-level after an S-level
+
+        :param i: int action number
+        :param s_mutexes: dict of literal number -> mask of mutex literals in the S-level
+        :return: bool
+        '''
+        pre = self.preconds[i]
+        for lit in set_bits(pre):
+            if s_mutexes.get(lit, 0) & pre:
+                return False
+        return True
+
+    def action_mutexes(self, level_mask: int, s_mutexes: dict, cache: dict=None,
+                       changed: set=None) -> dict:
+        '''mutexes of the actions of an A-level, see PlanningGraph.update_a_mutex
+
+        The mutexes of an action only depend on the S-level through the
+        mutexes of its preconditions, so the graph of a state can keep them
+        in a cache from one level to the next and only recompute the actions
+        with a precondition whose mutexes changed.
+
+        :param level_mask: int mask of the actions in the level, which are all consistent
+        :param s_mutexes: dict of literal number -> mask of mutex literals in the previous S-level
+        :param cache: dict of action number -> mask of all the actions mutex with it,
+            updated in place; nothing is cached if None
+        :param changed: set of the literals whose mutexes changed since the S-level the
+            cache was computed for; every action is computed if None
+        :return: dict of action number -> mask of the mutex actions in the level
+        '''
+        if cache is None:
+            cache = {}
+        # actions needing a literal that is mutex with each precondition
+        competing = {}
+        mutexes = {}
+        for i in set_bits(level_mask):
+            mask = cache.get(i)
+            if mask is None or changed is None or not changed.isdisjoint(self.precond_lits[i]):
+                mask = self.static[i]
+                for lit in self.precond_lits[i]:
+                    needing = competing.get(lit)
+                    if needing is None:
+                        needing = 0
+                        for other in set_bits(s_mutexes.get(lit, 0)):
+                            needing |= self.needed_by.get(other, 0)
+                        competing[lit] = needing
+                    mask |= needing
+                cache[i] = mask
+            mutexes[i] = mask & level_mask
+        return mutexes
+
+    def literal_mutexes(self, parents: dict, a_mutexes: dict) -> dict:
+        '''mutexes of the literals of an S-level, see PlanningGraph.update_s_mutex
+
+        Two literals are mutex if every action adding one is mutex with every
+        action adding the other. Action mutexes are symmetric, so the literals
+        mutex with a literal are those supported by all of its adders, where
+        an action supports the literals whose adders are all mutex with it.
+
+        :param parents: dict of literal number -> mask of the actions adding it in the previous A-level
+        :param a_mutexes: dict of action number -> mask of mutex actions in the previous A-level
+        :return: dict of literal number -> mask of the mutex literals in the level
+        '''
+        level_mask = 0
+        for parents_mask in parents.values():
+            level_mask |= parents_mask
+
+        # mask of the literals supported by each action; the bit loops are
+        # inlined since this runs for every level of every state graph
+        supports = [0] * len(self.static)
+        for lit, parents_mask in parents.items():
+            supported = level_mask
+            while parents_mask:
+                low = parents_mask & -parents_mask
+                supported &= a_mutexes.get(low.bit_length() - 1, 0)
+                parents_mask ^= low
+            bit = 1 << lit
+            while supported:
+                low = supported & -supported
+                supports[low.bit_length() - 1] |= bit
+                supported ^= low
+
+        mutexes = {}
+        for lit, parents_mask in parents.items():
+            mask = -1
+            for j in set_bits(parents_mask):
+                mask &= supports[j]
+            if lit ^ 1 in parents:
+                mask |= 1 << (lit ^ 1)
+            mutexes[lit] = mask & ~(1 << lit)
+        return mutexes
+
+
+# MutexTables per problem and serial flag, and graph actions (including the
+# no-op actions) per problem; both are dropped with the problem
+_mutex_tables = weakref.WeakKeyDictionary()
+_noop_actions = weakref.WeakKeyDictionary()
+
+
+def graph_actions(problem: Problem) -> list:
+    '''the actions of a problem followed by its no-op actions, see PlanningGraph.noop_actions
+
+    :param problem: PlanningProblem
+    :return: list of Action, the same list for every call
+    '''
+    actions = _noop_actions.get(problem)
+    if actions is None:
+        actions = problem.actions_list + PlanningGraph.noop_actions(problem.state_map)
+        _noop_actions[problem] = actions
+    return actions
+
+
+def mutex_tables(problem: Problem, serial: bool) -> MutexTables:
+    '''the MutexTables of the graph actions of a problem, computed on first use
+
+    :param problem: PlanningProblem
+    :param serial: bool whether the planning graph is serial
+    :return: MutexTables
+    '''
+    tables = _mutex_tables.setdefault(problem, {})
+    if serial not in tables:
+        tables[serial] = MutexTables(graph_actions(problem), serial, problem.state_map)
+    return tables[serial]
+
+
 class PlanningGraph():
     '''
     A planning graph as described in chapter 10 of the AIMA text. The planning
     graph can be used to reason about
     '''
 
-    def __init__(self, problem: Problem, state: str, serial_planning=True):
+    def __init__(self, problem: Problem, state: int, serial_planning=True):
         '''
         :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
-        :param state: str (will be in form TFTTFF... representing fluent states)
+        :param state: int (bitset of the fluents in problem.state_map, see lp_utils.encode_state)
         :param serial_planning: bool (whether or not to assume that only one action can occur at a time)
         Instance variable calculated:
             fs: FluentState
@@ -219,12 +463,18 @@ class PlanningGraph():
         self.problem = problem
         self.fs = decode_state(state, problem.state_map)
         self.serial = serial_planning
-        self.all_actions = self.problem.actions_list + self.noop_actions(self.problem.state_map)
+        self.all_actions = graph_actions(problem)
         self.s_levels = []
         self.a_levels = []
+        # mutexes of every level as masks, see MutexTables: dicts of action
+        # number -> mask of mutex actions, and literal number -> mask of mutex literals
+        self.tables = mutex_tables(problem, serial_planning)
+        self.a_mutexes = []
+        self.s_mutexes = []
         self.create_graph()
 
-    def noop_actions(self, literal_list):
+    @staticmethod
+    def noop_actions(literal_list):
         '''create persistent action for each possible fluent
 
         "No-Op" actions are virtual actions (i.e., actions that only exist in
@@ -240,16 +490,17 @@ class PlanningGraph():
         negative precondition and remove the literal expression as an effect in
         the output.
 
-        This function should only be called by the class constructor.
+        This function should only be called through graph_actions, which
+        reuses the no-op actions for all the planning graphs of a problem.
 
         :param literal_list:
         :return: list of Action
         '''
         action_list = []
         for fluent in literal_list:
-            act1 = Action(expr("Noop_pos({})".format(fluent)), ([fluent], []), ([fluent], []))
+            act1 = Action(Expr('Noop_pos', fluent), ([fluent], []), ([fluent], []))
             action_list.append(act1)
-            act2 = Action(expr("Noop_neg({})".format(fluent)), ([], [fluent]), ([], [fluent]))
+            act2 = Action(Expr('Noop_neg', fluent), ([], [fluent]), ([], [fluent]))
             action_list.append(act2)
         return action_list
 
@@ -281,20 +532,30 @@ class PlanningGraph():
         for literal in self.fs.neg:
             self.s_levels[level].add(PgNode_s(literal, False))
         # no mutexes at the first level
+        self.s_mutexes.append({})
 
         # continue to build the graph alternating A, S levels until last two S levels contain the same literals,
         # i.e. until it is "leveled"
         while not leveled:
-            self.add_action_level(level)
-            self.update_a_mutex(self.a_levels[level])
-
+            self.expand()
             level += 1
-            self.add_literal_level(level)
-            self.update_s_mutex(self.s_levels[level])
 
             if self.s_levels[level] == self.s_levels[level - 1]:
                 leveled = True
 
+    def expand(self):
+        ''' add an A-level and the following S-level, with their mutexes, to the graph
+
+        The graph is built by the class constructor until the literals of the
+        last two S-levels are the same; GraphPlan expands it further until
+        the mutexes level off as well.
+        '''
+        level = len(self.s_levels) - 1
+        self.add_action_level(level)
+        self.update_a_mutex(self.a_levels[level])
+        self.add_literal_level(level + 1)
+        self.update_s_mutex(self.s_levels[level + 1])
+
     def add_action_level(self, level):
         ''' add an A (action) level to the Planning Graph
 
@@ -313,16 +574,24 @@ class PlanningGraph():
         #   action node is added, it MUST be connected to the S node instances in the appropriate s_level set.
 
         actions = set()
+        # the node instances of the previous level, to connect to
+        s_nodes = {s_node: s_node for s_node in self.s_levels[level]}
+        s_mutexes = self.s_mutexes[level]
         for action in self.all_actions:
-            a_node = PgNode_a(action)
+            template = _action_templates.get(action)
+            prenodes = template[0] if template is not None else PgNode_a(action).prenodes
 
-            # check if the prerequisites are a subset of the previous literals level
-            if a_node.prenodes.issubset(self.s_levels[level]):
+            # check if the prerequisites are a subset of the previous literals
+            # level, and none of them are mutex with each other
+            if prenodes.issubset(self.s_levels[level]) and \
+                    self.tables.consistent(self.tables.action_ids[action], s_mutexes):
                 # add this action to the set of actions at this level
+                a_node = PgNode_a(action)
                 actions.add(a_node)
 
                 # connect the nodes
-                for s_node in a_node.prenodes:
+                for prenode in a_node.prenodes:
+                    s_node = s_nodes[prenode]
                     a_node.parents.add(s_node)
                     s_node.children.add(a_node)
 
@@ -345,17 +614,21 @@ class PlanningGraph():
         #   may be "added" to the set without fear of duplication.  However, it is important to then correctly create and connect
         #   all of the new S nodes as children of all the A nodes that could produce them, and likewise add the A nodes to the
         #   parent sets of the S nodes
-        literals = set()
+        # one new node per literal, connected to every action that adds it;
+        # the effnodes of the actions are shared templates
+        literals = {}
         # for each action in the previous action level
         for a_node in self.a_levels[level - 1]:
             # for each of the action's effect literals
-            for s_node in a_node.effnodes:
-                literals.add(s_node)
+            for effnode in a_node.effnodes:
+                s_node = literals.get(effnode)
+                if s_node is None:
+                    s_node = literals[effnode] = PgNode_s(effnode.symbol, effnode.is_pos)
                 # connect the nodes
                 s_node.parents.add(a_node)
                 a_node.children.add(s_node)
 
-        self.s_levels.append(literals)
+        self.s_levels.append(set(literals.values()))
 
     def update_a_mutex(self, nodeset):
         ''' Determine and update sibling mutual exclusion for A-level nodes
@@ -368,18 +641,29 @@ class PlanningGraph():
            Interference
            Competing needs
 
+        The pairwise tests are the methods below; for the levels of the graph
+        they are evaluated with bitsets instead. The serial, inconsistent
+        effects and interference mutexes do not depend on the level and come
+        from the MutexTables of the problem, and competing needs are the
+        actions that need a literal mutex with a precondition in the
+        previous S-level.
+
         :param nodeset: set of PgNode_a (siblings in the same level)
         :return:
             mutex set in each PgNode_a in the set is appropriately updated
         '''
-        nodelist = list(nodeset)
-        for i, n1 in enumerate(nodelist[:-1]):
-            for n2 in nodelist[i + 1:]:
-                if (self.serialize_actions(n1, n2) or
-                        self.inconsistent_effects_mutex(n1, n2) or
-                        self.interference_mutex(n1, n2) or
-                        self.competing_needs_mutex(n1, n2)):
-                    mutexify(n1, n2)
+        tables = self.tables
+        nodes = {tables.action_ids[n.action]: n for n in nodeset}
+        level_mask = 0
+        for i in nodes:
+            level_mask |= 1 << i
+        s_mutexes = self.s_mutexes[-1] if self.s_mutexes else {}
+
+        mutexes = tables.action_mutexes(level_mask, s_mutexes)
+        for i, node in nodes.items():
+            # the relation is symmetric, so the other node adds this one
+            node.mutex.update(nodes[j] for j in set_bits(mutexes[i]))
+        self.a_mutexes.append(mutexes)
 
     def serialize_actions(self, node_a1: PgNode_a, node_a2: PgNode_a) -> bool:
         '''
@@ -476,15 +760,32 @@ class PlanningGraph():
            Negation
            Inconsistent support
 
+        As for update_a_mutex, the pairwise tests below are evaluated with
+        bitsets: literal numbers of a literal and its negation differ in the
+        lowest bit, and two literals have inconsistent support if all the
+        actions adding one are in the intersection of the mutex masks of the
+        actions adding the other.
+
         :param nodeset: set of PgNode_a (siblings in the same level)
         :return:
             mutex set in each PgNode_a in the set is appropriately updated
         '''
-        nodelist = list(nodeset)
-        for i, n1 in enumerate(nodelist[:-1]):
-            for n2 in nodelist[i + 1:]:
-                if self.negation_mutex(n1, n2) or self.inconsistent_support_mutex(n1, n2):
-                    mutexify(n1, n2)
+        tables = self.tables
+        a_mutexes = self.a_mutexes[-1] if self.a_mutexes else {}
+        nodes = {tables.literal_id(n.symbol, n.is_pos): n for n in nodeset}
+
+        # actions adding each literal
+        parents = {}
+        for lit, node in nodes.items():
+            parents_mask = 0
+            for a_node in node.parents:
+                parents_mask |= 1 << tables.action_ids[a_node.action]
+            parents[lit] = parents_mask
+
+        mutexes = tables.literal_mutexes(parents, a_mutexes)
+        for lit, node in nodes.items():
+            node.mutex.update(nodes[other] for other in set_bits(mutexes[lit]))
+        self.s_mutexes.append(mutexes)
 
     def negation_mutex(self, node_s1: PgNode_s, node_s2: PgNode_s) -> bool:
         '''
@@ -540,3 +841,481 @@ class PlanningGraph():
                     level_sum += level
                     break
         return level_sum
+
+
+class GraphPlan():
+    '''
+    The GraphPlan algorithm of Blum and Furst, as described in chapter 10 of
+    the AIMA text: a planning graph without serial mutexes is expanded one
+    level at a time, and a parallel plan is extracted from it by a backward
+    search as soon as the goals appear in the last S-level without mutexes
+    between them.
+
+    The backward search works on the masks of PlanningGraph.tables: the
+    goals of a level are a literal mask, and the actions chosen for them
+    an action mask. Goal sets that cannot be achieved at a level (no-goods)
+    are memoized, and the search fails once the graph has leveled off and an
+    expansion did not add any no-goods at the level where it leveled off.
+    '''
+
+    def __init__(self, problem: Problem):
+        '''
+        :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
+        Instance variables calculated:
+            graph: PlanningGraph of the initial state of the problem
+            literal_masks: list of the literal masks of the S-levels
+            action_masks: list of the action masks of the A-levels
+            nogoods: list of sets of goal masks that cannot be achieved, per S-level
+        '''
+        self.problem = problem
+        self.graph = PlanningGraph(problem, problem.initial, serial_planning=False)
+        self.tables = self.graph.tables
+        self.literal_masks = []
+        self.action_masks = []
+        self.nogoods = []
+        self.goal_mask = 0
+        for g in problem.goal:
+            self.goal_mask |= 1 << self.tables.literal_id(g, True)
+
+    def search(self) -> list:
+        ''' find a parallel plan for the problem
+
+        :return: list of the steps of the plan, each a list of Action that can be
+            executed in any order; None if the problem has no solution
+        '''
+        level = 0
+        leveled_off = None
+        nogoods_count = None
+        while True:
+            while len(self.graph.s_levels) <= level:
+                self.graph.expand()
+            self.update_masks()
+
+            if leveled_off is None and level > 0 and \
+                    self.literal_masks[level] == self.literal_masks[level - 1] and \
+                    self.graph.s_mutexes[level] == self.graph.s_mutexes[level - 1]:
+                leveled_off = level - 1
+            if self.goals_possible(self.goal_mask, level):
+                steps = self.extract(self.goal_mask, level)
+                if steps is not None:
+                    actions = self.graph.all_actions
+                    return [[actions[i] for i in set_bits(step)
+                             if i < len(self.problem.actions_list)] for step in steps]
+            if leveled_off is not None:
+                if not self.goals_possible(self.goal_mask, leveled_off):
+                    return None
+                if len(self.nogoods[leveled_off]) == nogoods_count:
+                    return None
+                nogoods_count = len(self.nogoods[leveled_off])
+            level += 1
+
+    def update_masks(self):
+        ''' compute the literal and action masks of the levels added to the graph '''
+        tables = self.tables
+        for level in self.graph.s_levels[len(self.literal_masks):]:
+            mask = 0
+            for node in level:
+                mask |= 1 << tables.literal_id(node.symbol, node.is_pos)
+            self.literal_masks.append(mask)
+            self.nogoods.append(set())
+        for mutexes in self.graph.a_mutexes[len(self.action_masks):]:
+            mask = 0
+            for i in mutexes:
+                mask |= 1 << i
+            self.action_masks.append(mask)
+
+    def goals_possible(self, goals: int, level: int) -> bool:
+        ''' test whether the goals are in an S-level and no pair of them is mutex '''
+        if goals & ~self.literal_masks[level]:
+            return False
+        mutexes = self.graph.s_mutexes[level]
+        return not any(mutexes.get(lit, 0) & goals for lit in set_bits(goals))
+
+    def extract(self, goals: int, level: int) -> list:
+        ''' extract the steps of a plan achieving the goals in an S-level
+
+        :param goals: int literal mask
+        :param level: int S-level
+        :return: list of action masks, one per A-level before the S-level; None
+            if the goals cannot be achieved
+        '''
+        if level == 0:
+            return [] if not goals & ~self.literal_masks[0] else None
+        if goals in self.nogoods[level] or not self.goals_possible(goals, level):
+            return None
+        steps = self.assign(goals, 0, 0, 0, level)
+        if steps is None:
+            self.nogoods[level].add(goals)
+        return steps
+
+    def assign(self, goals: int, chosen: int, excluded: int, achieved: int, level: int) -> list:
+        ''' choose non-mutex actions of the previous A-level achieving the goals,
+        then extract a plan for their preconditions
+
+        The goal with the fewest achievers that are not mutex with the actions
+        chosen so far is assigned first, and the search backtracks as soon as
+        a goal has none left.
+
+        :param goals: int literal mask of the goals that are not achieved yet
+        :param chosen: int mask of the actions chosen so far
+        :param excluded: int mask of the actions mutex with the chosen actions
+        :param achieved: int literal mask of the effects of the chosen actions
+        :param level: int S-level of the goals
+        :return: list of action masks, see extract
+        '''
+        tables = self.tables
+        goals &= ~achieved
+        if not goals:
+            preconds = 0
+            for i in set_bits(chosen):
+                preconds |= tables.preconds[i]
+            steps = self.extract(preconds, level - 1)
+            return None if steps is None else steps + [chosen]
+
+        actions = self.action_masks[level - 1] & ~excluded
+        best = None
+        for lit in set_bits(goals):
+            achievers = tables.added_by.get(lit, 0) & actions
+            if not achievers:
+                return None
+            count = bin(achievers).count('1')
+            if best is None or count < best[0]:
+                best = (count, achievers)
+
+        a_mutexes = self.graph.a_mutexes[level - 1]
+        # no-op actions are numbered after the problem actions; trying them
+        # first prefers plans that achieve goals as early as possible
+        for i in reversed(list(set_bits(best[1]))):
+            steps = self.assign(goals, chosen | 1 << i, excluded | a_mutexes[i],
+                                achieved | tables.effects[i], level)
+            if steps is not None:
+                return steps
+        return None
+
+
+def graphplan(problem: Problem) -> Node:
+    ''' solve a planning problem with GraphPlan, see GraphPlan
+
+    The steps of the parallel plan are executed one after the other, so the
+    result is a search Node like those of the aimacode.search searches.
+
+    :param problem: PlanningProblem
+    :return: Node of the goal state; None if the problem has no solution
+    '''
+    steps = GraphPlan(problem).search()
+    if steps is None:
+        return None
+    node = Node(problem.initial)
+    for step in steps:
+        for action in step:
+            node = node.child_node(problem, action)
+    return node
+
+
+class CompiledPlanningGraph():
+    '''
+    The action layer structure of the planning graph of a problem, compiled
+    once into index arrays so that the level costs of many states can be
+    computed without building a PlanningGraph (and its nodes and mutexes)
+    for every state.
+
+    Literals are numbered 2 * i for the positive and 2 * i + 1 for the
+    negative literal of the fluent problem.state_map[i]. The level of a
+    literal is the index of the first S-level of the planning graph that
+    contains it. The levels are those of the relaxed planning graph, without
+    mutexes, so they are computed by a layered propagation over the actions:
+    an action is added to the A-level after the last of its preconditions
+    appears, and its effects appear in the following S-level. No-op actions
+    are implicit, since a literal stays in every later level once it appears.
+    PlanningGraph leaves out the actions whose preconditions are mutex, so
+    its levels are never lower.
+    '''
+
+    def __init__(self, problem: Problem):
+        '''
+        :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
+        Instance variables calculated:
+            index: dict of fluent -> index into problem.state_map
+            num_literals: int number of positive and negative literals
+            preconds: list of precondition literal lists, per action of problem.actions_list
+            effects: list of effect literal lists, per action
+            waiting: list of the actions that have each literal as a precondition
+            free: actions without preconditions
+        '''
+        self.problem = problem
+        self.index = {fluent: i for i, fluent in enumerate(problem.state_map)}
+        self.num_literals = 2 * len(problem.state_map)
+        self.preconds = []
+        self.effects = []
+        self.waiting = [[] for _ in range(self.num_literals)]
+        self.free = []
+        for a, action in enumerate(problem.actions_list):
+            pre = self.literals(action.precond_pos, action.precond_neg)
+            self.preconds.append(pre)
+            self.effects.append(self.literals(action.effect_add, action.effect_rem))
+            if pre is None:
+                continue
+            for lit in pre:
+                self.waiting[lit].append(a)
+            if not pre:
+                self.free.append(a)
+
+    def literals(self, pos: list, neg: list):
+        '''literal indices of positive and negative fluents
+
+        :param pos: list of fluents
+        :param neg: list of fluents
+        :return: list of int, or None if a positive fluent is not in the problem state_map
+            (the literal can never hold); negative fluents not in the map are dropped
+        '''
+        lits = set()
+        for f in pos:
+            if f not in self.index:
+                return None
+            lits.add(2 * self.index[f])
+        for f in neg:
+            if f in self.index:
+                lits.add(2 * self.index[f] + 1)
+        return sorted(lits)
+
+    def literal(self, fluent, is_pos=True) -> int:
+        '''literal index of a fluent, or None if it is not in the problem state_map'''
+        i = self.index.get(fluent)
+        if i is None:
+            return None
+        return 2 * i + (0 if is_pos else 1)
+
+    def levels(self, state: int) -> list:
+        '''level of every literal in the planning graph built from a state
+
+        :param state: int (bitset of the fluents in problem.state_map, see lp_utils.encode_state)
+        :return: list of int level per literal index; None for literals that never appear
+        '''
+        return self.propagate(state)[0]
+
+    def propagate(self, state: int) -> tuple:
+        '''levels of the literals in the planning graph built from a state, and
+        the first action found to achieve each of them
+
+        :param state: int (bitset of the fluents in problem.state_map, see lp_utils.encode_state)
+        :return: tuple (levels, achievers) of lists per literal index; the level is None
+            for literals that never appear, and the achiever is the index into
+            problem.actions_list of an action in the A-level before the literal
+            appears, or None for literals in S0
+        '''
+        levels = [None] * self.num_literals
+        achievers = [None] * self.num_literals
+        layer = []
+        for i in range(len(self.problem.state_map)):
+            lit = 2 * i + (0 if state >> i & 1 else 1)
+            levels[lit] = 0
+            layer.append(lit)
+
+        missing = [None if pre is None else len(pre) for pre in self.preconds]
+        enabled = list(self.free)
+        level = 0
+        while layer or enabled:
+            # actions whose last precondition appeared in this level
+            for lit in layer:
+                for a in self.waiting[lit]:
+                    missing[a] -= 1
+                    if missing[a] == 0:
+                        enabled.append(a)
+            level += 1
+            layer = []
+            for a in enabled:
+                for lit in self.effects[a]:
+                    if levels[lit] is None:
+                        levels[lit] = level
+                        achievers[lit] = a
+                        layer.append(lit)
+            enabled = []
+        return levels, achievers
+
+    def build(self, state: int):
+        '''the planning graph of a state, for computing any number of heuristics
+
+        :param state: int bitset
+        :return: StateGraph
+        '''
+        return StateGraph(self, state)
+
+    def h_levelsum(self, state: int, goal: list) -> int:
+        '''The sum of the level costs of the goals, see PlanningGraph.h_levelsum
+
+        :param state: int bitset
+        :param goal: list of positive goal fluents
+        :return: int
+        '''
+        return self.build(state).h_levelsum(goal)
+
+
+class StateGraph():
+    '''
+    The planning graph of a single state, computed from a CompiledPlanningGraph.
+
+    The literal levels and achievers are computed when the graph is built and
+    are shared by all of the heuristics. The mutexes are only needed by
+    h_setlevel, so the mutex levels are computed from the MutexTables of the
+    problem the first time it is called. Literal numbers are the same as in
+    the CompiledPlanningGraph, since the MutexTables number the fluents of
+    problem.state_map first.
+    '''
+
+    def __init__(self, compiled: CompiledPlanningGraph, state: int):
+        '''
+        :param compiled: CompiledPlanningGraph of the problem
+        :param state: int bitset
+        Instance variables calculated:
+            levels: list of int level per literal, see CompiledPlanningGraph.propagate
+            achievers: list of the action achieving each literal
+            literal_masks: list of the literal masks of the S-levels computed with mutexes
+            literal_mutexes: list of dicts of literal number -> mask of mutex literals, per S-level
+            leveled_off: bool whether the last S-level computed with mutexes is a fixed point
+            action_mask: int mask of the actions in the last A-level computed with mutexes
+            parents: dict of literal number -> mask of the actions adding it in that A-level
+            action_cache: dict of action number -> mask of all the actions mutex with it,
+                see MutexTables.action_mutexes
+        '''
+        self.compiled = compiled
+        self.state = state
+        self.levels, self.achievers = compiled.propagate(state)
+        self.literal_masks = []
+        self.literal_mutexes = []
+        self.leveled_off = False
+        self.action_mask = 0
+        self.parents = {}
+        self.action_cache = {}
+
+    def goal_literals(self, goal: list) -> list:
+        '''literal numbers of the goals, or None if a goal is not in the problem state_map'''
+        lits = [self.compiled.literal(g) for g in goal]
+        if None in lits:
+            return None
+        return lits
+
+    def h_levelsum(self, goal: list) -> int:
+        '''The sum of the level costs of the goals, see PlanningGraph.h_levelsum
+
+        :param goal: list of positive goal fluents
+        :return: int
+        '''
+        level_sum = 0
+        for g in goal:
+            lit = self.compiled.literal(g)
+            # as in PlanningGraph.h_levelsum, goals that never appear add nothing
+            if lit is not None and self.levels[lit] is not None:
+                level_sum += self.levels[lit]
+        return level_sum
+
+    def h_maxlevel(self, goal: list):
+        '''The maximum level cost of the goals (admissible)
+
+        :param goal: list of positive goal fluents
+        :return: int, or float('inf') if a goal never appears
+        '''
+        lits = self.goal_literals(goal)
+        if lits is None or any(self.levels[lit] is None for lit in lits):
+            return float('inf')
+        return max((self.levels[lit] for lit in lits), default=0)
+
+    def h_ff(self, goal: list):
+        '''The number of actions in a relaxed plan for the goals, as in the FF planner
+
+        The relaxed plan is extracted backwards from the goals: every goal not
+        in S0 is achieved by the action that first adds it, whose preconditions
+        become goals of the earlier levels.
+
+        :param goal: list of positive goal fluents
+        :return: int, or float('inf') if a goal never appears
+        '''
+        lits = self.goal_literals(goal)
+        if lits is None or any(self.levels[lit] is None for lit in lits):
+            return float('inf')
+        plan = set()
+        achieved = set()
+        agenda = list(lits)
+        while agenda:
+            lit = agenda.pop()
+            if lit in achieved or self.levels[lit] == 0:
+                continue
+            a = self.achievers[lit]
+            if a in plan:
+                continue
+            plan.add(a)
+            achieved.update(self.compiled.effects[a])
+            agenda.extend(self.compiled.preconds[a])
+        return len(plan)
+
+    def h_setlevel(self, goal: list):
+        '''The level of the first S-level where all of the goals appear and no
+        pair of goals is mutex (admissible)
+
+        :param goal: list of positive goal fluents
+        :return: int, or float('inf') if the graph levels off first
+        '''
+        lits = self.goal_literals(goal)
+        if lits is None or any(self.levels[lit] is None for lit in lits):
+            return float('inf')
+        goal_mask = 0
+        for lit in lits:
+            goal_mask |= 1 << lit
+        # the goals cannot be reached together before the last of them appears
+        level = max((self.levels[lit] for lit in lits), default=0)
+        while True:
+            while len(self.literal_masks) <= level and not self.leveled_off:
+                self.add_mutex_level()
+            if level >= len(self.literal_masks):
+                return float('inf')
+            mutexes = self.literal_mutexes[level]
+            if self.literal_masks[level] & goal_mask == goal_mask and \
+                    not any(mutexes.get(lit, 0) & goal_mask for lit in lits):
+                return level
+            level += 1
+
+    def add_mutex_level(self):
+        '''compute the literals and literal mutexes of the next S-level, as in
+        PlanningGraph.update_a_mutex and PlanningGraph.update_s_mutex
+        '''
+        tables = mutex_tables(self.compiled.problem, True)
+        if not self.literal_masks:
+            lits = 0
+            for i in range(len(self.compiled.problem.state_map)):
+                lits |= 1 << (2 * i + (0 if self.state >> i & 1 else 1))
+            self.literal_masks.append(lits)
+            self.literal_mutexes.append({})
+            return
+
+        lits = self.literal_masks[-1]
+        previous = self.literal_mutexes[-1]
+        # the actions needing a literal that is not in the level
+        blocked = 0
+        for lit in set_bits((1 << 2 * len(tables.fluent_ids)) - 1 & ~lits):
+            blocked |= tables.needed_by.get(lit, 0)
+        # mutexes only disappear from one level to the next, so the actions
+        # of the previous A-level are still consistent
+        level_mask = self.action_mask
+        for i in set_bits((1 << len(tables.preconds)) - 1 & ~blocked & ~level_mask):
+            if tables.consistent(i, previous):
+                level_mask |= 1 << i
+        # the literals whose mutexes changed since the previous A-level
+        changed = None
+        if len(self.literal_mutexes) > 1:
+            before = self.literal_mutexes[-2]
+            changed = {lit for lit, mask in previous.items() if before.get(lit) != mask}
+        a_mutexes = tables.action_mutexes(level_mask, previous, self.action_cache, changed)
+        # the A-levels only grow, so only the new actions add parents
+        parents = self.parents
+        for i in set_bits(level_mask & ~self.action_mask):
+            for lit in tables.effect_lits[i]:
+                parents[lit] = parents.get(lit, 0) | 1 << i
+        s_mutexes = tables.literal_mutexes(parents, a_mutexes)
+        self.action_mask = level_mask
+        new_lits = 0
+        for lit in parents:
+            new_lits |= 1 << lit
+        if new_lits == lits and s_mutexes == previous:
+            self.leveled_off = True
+            return
+        self.literal_masks.append(new_lits)
+        self.literal_mutexes.append(s_mutexes)
@@ -1,11 +1,27 @@
 import argparse
+import csv
+import functools
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
 from timeit import default_timer as timer
 from aimacode.search import InstrumentedProblem
 from aimacode.search import (breadth_first_search, astar_search,
     breadth_first_tree_search, depth_first_graph_search, uniform_cost_search,
     greedy_best_first_graph_search, depth_limited_search,
-    recursive_best_first_search)
-from my_air_cargo_problems import air_cargo_p1, air_cargo_p2, air_cargo_p3
+    recursive_best_first_search, ida_star_search, sma_star_search,
+    bidirectional_breadth_first_search, bidirectional_uniform_cost_search)
+from my_air_cargo_problems import (air_cargo_p1, air_cargo_p2, air_cargo_p3,
+    air_cargo_generated)
+from my_planning_graph import graphplan
+from sat_planning import sat_plan
+
+try:
+    import resource
+except ImportError:
+    # no memory limits or peak memory measurements (e.g. on Windows)
+    resource = None
 
 PROBLEM_CHOICE_MSG = """
 Select from the following list of air cargo problems. You may choose more than
@@ -36,6 +52,15 @@ SEARCHES = [["breadth_first_search", breadth_first_search, ""],
             ['astar_search', astar_search, 'h_1'],
             ['astar_search', astar_search, 'h_ignore_preconditions'],
             ['astar_search', astar_search, 'h_pg_levelsum'],
+            ['astar_search', astar_search, 'h_pg_maxlevel'],
+            ['astar_search', astar_search, 'h_pg_setlevel'],
+            ['astar_search', astar_search, 'h_pg_ff'],
+            ['ida_star_search', ida_star_search, 'h_ignore_preconditions'],
+            ['sma_star_search', sma_star_search, 'h_ignore_preconditions'],
+            ['graphplan', graphplan, ""],
+            ['sat_plan', sat_plan, ""],
+            ['bidirectional_breadth_first_search', bidirectional_breadth_first_search, ""],
+            ['bidirectional_uniform_cost_search', bidirectional_uniform_cost_search, ""],
             ]
 
 
@@ -53,10 +78,15 @@ def run_search(problem, search_function, parameter=None):
 
     start = timer()
     ip = PrintableProblem(problem)
-    if parameter is not None:
-        node = search_function(ip, parameter)
-    else:
-        node = search_function(ip)
+    try:
+        if parameter is not None:
+            node = search_function(ip, parameter)
+        else:
+            node = search_function(ip)
+    except ValueError as e:
+        # e.g. too many goal states for a backward search
+        print("\nSearch failed: {}\n".format(e))
+        return
     end = timer()
     print("\nExpansions   Goal Tests   New Nodes")
     print("{}\n".format(ip))
@@ -85,10 +115,58 @@ def manual():
                                                " ".join(s_choices)))
 
 
-def main(p_choices, s_choices):
+def main(p_choices, s_choices, **options):
 
     problems = [PROBLEMS[i-1] for i in map(int, p_choices)]
     searches = [SEARCHES[i-1] for i in map(int, s_choices)]
+    solve(problems, searches, **options)
+
+
+def sweep(sizes, s_choices, seed=None, **options):
+    """ solve generated problems of increasing size, see air_cargo_generated
+
+    :param sizes: list of (cargos, planes, airports) tuples
+    :param s_choices: list of indices into SEARCHES
+    :param seed: seed of the generated problems
+    :param options: options of the experiment runner, see solve
+    """
+    problems = [["Generated Problem {}x{}x{}".format(*size),
+                 functools.partial(air_cargo_generated, *size, seed=seed)]
+                for size in sizes]
+    searches = [SEARCHES[i-1] for i in map(int, s_choices)]
+    solve(problems, searches, **options)
+
+
+def parse_size(size):
+    """ parse a problem size given as CARGOSxPLANESxAIRPORTS, e.g. 6x3x5 """
+    try:
+        cargos, planes, airports = map(int, size.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("sizes must be given as CARGOSxPLANESxAIRPORTS, e.g. 6x3x5")
+    return cargos, planes, airports
+
+
+def solve(problems, searches, workers=None, timeout=None, memory_limit=None, output=None):
+    """ solve every problem with every search
+
+    The searches run one after the other in this process and print their
+    plans, unless one of the options of the experiment runner is given; then
+    they run with run_matrix, and only a table of the results is printed.
+
+    :param problems: list of [name, problem function] pairs
+    :param searches: list of [name, search function, heuristic name] triples
+    :param workers: number of searches run at once, see run_matrix
+    :param timeout: seconds before a search is stopped
+    :param memory_limit: megabytes of memory a search may use
+    :param output: CSV or JSON file to write the results to, see write_results
+    """
+    if any(option is not None for option in (workers, timeout, memory_limit, output)):
+        results = run_matrix(problems, searches, workers, timeout, memory_limit)
+        print_results(results)
+        if output is not None:
+            write_results(results, output)
+            print("\nWrote the results to {}".format(output))
+        return
 
     for pname, p in problems:
 
@@ -101,6 +179,135 @@ def main(p_choices, s_choices):
             run_search(_p, s, _h)
 
 
+RESULT_FIELDS = ["problem", "search", "heuristic", "status", "expansions", "goal_tests",
+                 "new_nodes", "plan_length", "time", "peak_memory"]
+
+
+def new_result(pname, sname, heuristic, status):
+    """ result of a run of run_matrix, with the measurements still unknown """
+    result = dict.fromkeys(RESULT_FIELDS)
+    result.update(problem=pname, search=sname, heuristic=heuristic, status=status)
+    return result
+
+
+def run_experiment(conn, pname, problem_fn, sname, search_fn, heuristic, memory_limit=None):
+    """ solve a problem with a search in a child process of run_matrix, and
+    send the result through a connection
+
+    Peak memory is the maximum resident set size of the process in megabytes,
+    including the interpreter and the problem.
+    """
+    result = new_result(pname, sname, heuristic, "ok")
+    if memory_limit is not None and resource is not None:
+        limit = int(memory_limit * 2 ** 20)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    ip = None
+    try:
+        problem = problem_fn()
+        ip = PrintableProblem(problem)
+        start = timer()
+        if heuristic:
+            node = search_fn(ip, getattr(problem, heuristic))
+        else:
+            node = search_fn(ip)
+        if node is None:
+            result["status"] = "no solution"
+        else:
+            result["plan_length"] = len(node.solution())
+    except MemoryError:
+        result["status"] = "memory limit"
+    except Exception as e:
+        result["status"] = "error: {}".format(e)
+    if ip is not None:
+        # the counts so far if the search failed
+        result.update(expansions=ip.succs, goal_tests=ip.goal_tests, new_nodes=ip.states,
+                      time=timer() - start)
+    if resource is not None:
+        # kilobytes on Linux
+        result["peak_memory"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    conn.send(result)
+    conn.close()
+
+
+def run_matrix(problems, searches, workers=None, timeout=None, memory_limit=None):
+    """ solve every problem with every search, each in a new process
+
+    The runs are independent: every process builds its own problem, so that
+    the counts and the memory of one run do not include those of another.
+    A run that takes longer than the timeout is terminated, and one that
+    needs more memory than the limit fails with status "memory limit".
+
+    :param problems: list of [name, problem function] pairs
+    :param searches: list of [name, search function, heuristic name] triples
+    :param workers: number of runs at once; the number of CPUs by default
+    :param timeout: seconds before a run is terminated; no timeout by default
+    :param memory_limit: megabytes of address space of every run; no limit by default
+    :return: list of dicts with the RESULT_FIELDS of every run, problems first
+    """
+    runs = [(pname, p, sname, s, h) for pname, p in problems for sname, s, h in searches]
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(runs)
+    pending = list(range(len(runs)))
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            i = pending.pop(0)
+            recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_experiment,
+                                              args=(send_conn,) + runs[i] + (memory_limit,))
+            process.start()
+            send_conn.close()
+            running[i] = (process, recv_conn, timer())
+
+        ready = multiprocessing.connection.wait([conn for _, conn, _ in running.values()],
+                                                timeout=.1)
+        for i, (process, conn, start) in list(running.items()):
+            pname, _, sname, _, h = runs[i]
+            if conn in ready:
+                try:
+                    results[i] = conn.recv()
+                except EOFError:
+                    # killed, e.g. by the operating system when out of memory
+                    results[i] = new_result(pname, sname, h, "crashed")
+            elif timeout is not None and timer() - start > timeout:
+                process.terminate()
+                results[i] = new_result(pname, sname, h, "timeout")
+                results[i]["time"] = timeout
+            else:
+                continue
+            process.join()
+            conn.close()
+            del running[i]
+            print("Finished {} using {}{} ({})".format(
+                pname, sname, " with {}".format(h) if h else "", results[i]["status"]))
+    return results
+
+
+def print_results(results):
+    """ print a table of the results of run_matrix """
+    row = "{:<32}  {:<40}  {:<14}  {:>10}  {:>10}  {:>10}  {:>6}  {:>10}  {:>10}"
+    print()
+    print(row.format("Problem", "Search", "Status", "Expansions", "Goal Tests",
+                     "New Nodes", "Plan", "Time (s)", "Memory (MB)"))
+    for r in results:
+        search = r["search"] + (" with {}".format(r["heuristic"]) if r["heuristic"] else "")
+        print(row.format(r["problem"], search, r["status"][:14], *[
+            "-" if r[f] is None else "{:.2f}".format(r[f]) if isinstance(r[f], float) else r[f]
+            for f in ("expansions", "goal_tests", "new_nodes", "plan_length", "time", "peak_memory")]))
+
+
+def write_results(results, path):
+    """ write the results of run_matrix to a JSON file if the path ends with
+    .json, else to a CSV file with the RESULT_FIELDS as columns """
+    with open(path, 'w', newline='') as f:
+        if path.lower().endswith('.json'):
+            json.dump(results, f, indent=4)
+        else:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+
+
 def show_solution(node, elapsed_time):
     print("Plan length: {}  Time elapsed in seconds: {}".format(len(node.solution()), elapsed_time))
     for action in node.solution():
@@ -116,12 +323,28 @@ if __name__=="__main__":
                         help="Specify the indices of the problems to solve as a list of space separated values. Choose from: {!s}".format(list(range(1, len(PROBLEMS)+1))))
     parser.add_argument('-s', '--searches', nargs="+", choices=range(1, len(SEARCHES)+1), type=int, metavar='',
                         help="Specify the indices of the search algorithms to use as a list of space separated values. Choose from: {!s}".format(list(range(1, len(SEARCHES)+1))))
+    parser.add_argument('-g', '--generate', nargs="+", type=parse_size, metavar='',
+                        help="Solve generated problems instead, sized as a list of space separated CARGOSxPLANESxAIRPORTS values, e.g. 4x2x4 6x3x5.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed of the generated problems.")
+    parser.add_argument('-w', '--workers', type=int,
+                        help="Run the searches in this many processes at once, and print a table of the results.")
+    parser.add_argument('-t', '--timeout', type=float,
+                        help="Stop every search after this many seconds (runs the searches in processes, as -w).")
+    parser.add_argument('--memory', type=float, metavar='MB',
+                        help="Limit the memory of every search to this many megabytes (runs the searches in processes, as -w).")
+    parser.add_argument('-o', '--output',
+                        help="Write the results to a .json or .csv file (runs the searches in processes, as -w).")
     args = parser.parse_args()
+    options = dict(workers=args.workers, timeout=args.timeout, memory_limit=args.memory,
+                   output=args.output)
 
     if args.manual:
         manual()
+    elif args.generate and args.searches:
+        sweep(args.generate, list(sorted(set(args.searches))), args.seed, **options)
     elif args.problems and args.searches:
-        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))))
+        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))), **options)
     else:
         print()
         parser.print_help()
@@ -0,0 +1,147 @@
+from aimacode.logic import CDCLSolver
+from aimacode.search import Node, Problem
+from lp_utils import set_bits
+from my_planning_graph import CompiledPlanningGraph, mutex_tables
+
+
+class SATPlanner():
+    '''
+    Planning as satisfiability (SATPlan) for the ground actions of a planning
+    problem, as described in chapter 10 of the AIMA text, solved with the
+    incremental CDCLSolver of aimacode.logic.
+
+    The plan of horizon T is encoded with a variable per fluent of
+    problem.state_map at each step 0..T and a variable per action at each
+    step 0..T-1:
+        - the initial state holds at step 0
+        - an action implies its preconditions at its step and its effects
+          at the next step
+        - explanatory frame axioms: a fluent only changes between two steps
+          if an action adding (or removing) it is taken
+        - mutex actions (inconsistent effects and interference, see
+          MutexTables) are not taken at the same step, so the actions of a
+          step can be executed in any order
+        - the goals hold at step T
+
+    Only the actions whose preconditions appear in the planning graph of the
+    initial state by a step are encoded at that step, and fluents that cannot
+    change yet are fixed. The horizon starts at the level where all of the
+    goals first appear, and every longer horizon adds the clauses of one more
+    step to the same solver. The goals are passed as assumptions instead of
+    clauses, so the clauses learned for the shorter horizons remain valid.
+    '''
+
+    def __init__(self, problem: Problem):
+        '''
+        :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
+        Instance variables calculated:
+            compiled: CompiledPlanningGraph of the problem
+            levels: list of the level of every literal in the planning graph of the initial state
+            fluent_vars: list of lists of the variable of each fluent, per step
+            action_vars: list of dicts of action index -> variable, per step
+        '''
+        self.problem = problem
+        self.compiled = CompiledPlanningGraph(problem)
+        self.levels = self.compiled.levels(problem.initial)
+        self.tables = mutex_tables(problem, False)
+        self.solver = CDCLSolver()
+        self.fluent_vars = [self.add_fluents(0)]
+        self.action_vars = []
+        for i, var in enumerate(self.fluent_vars[0]):
+            self.solver.add_clause([var if problem.initial >> i & 1 else -var])
+
+    def add_fluents(self, step: int) -> list:
+        ''' create the fluent variables of a step, fixing those that cannot change yet '''
+        fluents = []
+        for i in range(len(self.problem.state_map)):
+            var = self.solver.new_var()
+            fluents.append(var)
+            if step > 0:
+                pos, neg = self.levels[2 * i], self.levels[2 * i + 1]
+                if pos is None or pos > step:
+                    self.solver.add_clause([-var])
+                elif neg is None or neg > step:
+                    self.solver.add_clause([var])
+        return fluents
+
+    def literal(self, lit: int, step: int) -> int:
+        ''' solver literal of a literal number of the CompiledPlanningGraph at a step '''
+        var = self.fluent_vars[step][lit >> 1]
+        return -var if lit & 1 else var
+
+    def add_step(self):
+        ''' add the actions of the last step and the fluents of the step after it '''
+        step = len(self.action_vars)
+        solver = self.solver
+        compiled = self.compiled
+        self.fluent_vars.append(self.add_fluents(step + 1))
+
+        actions = {}
+        adders = {}
+        for a, pre in enumerate(compiled.preconds):
+            if pre is None or any(self.levels[lit] is None or self.levels[lit] > step
+                                  for lit in pre):
+                continue
+            var = actions[a] = solver.new_var()
+            for lit in pre:
+                solver.add_clause([-var, self.literal(lit, step)])
+            for lit in compiled.effects[a]:
+                solver.add_clause([-var, self.literal(lit, step + 1)])
+                adders.setdefault(lit, []).append(var)
+        self.action_vars.append(actions)
+
+        # a literal only becomes true if an action makes it true
+        for i in range(len(self.problem.state_map)):
+            for lit in (2 * i, 2 * i + 1):
+                solver.add_clause([self.literal(lit, step), -self.literal(lit, step + 1)] +
+                                  adders.get(lit, []))
+
+        # mutex actions, numbered in the MutexTables like in problem.actions_list
+        available = 0
+        for a in actions:
+            available |= 1 << self.tables.action_ids[self.problem.actions_list[a]]
+        for a, var in actions.items():
+            i = self.tables.action_ids[self.problem.actions_list[a]]
+            for j in set_bits(self.tables.static[i] & available):
+                if j > i:
+                    solver.add_clause([-var, -actions[j]])
+
+    def search(self, max_steps: int=50) -> list:
+        ''' find a parallel plan for the problem
+
+        :param max_steps: int longest horizon tried
+        :return: list of the steps of the plan, each a list of Action that can be
+            executed in any order; None if there is no plan of max_steps steps or less
+        '''
+        goals = [self.compiled.literal(g) for g in self.problem.goal]
+        if None in goals or any(self.levels[lit] is None for lit in goals):
+            return None
+        for horizon in range(max((self.levels[lit] for lit in goals), default=0), max_steps + 1):
+            while len(self.action_vars) < horizon:
+                self.add_step()
+            if self.solver.solve([self.literal(lit, horizon) for lit in goals]):
+                model = self.solver.model
+                return [[self.problem.actions_list[a] for a, var in sorted(actions.items())
+                         if model[var]]
+                        for actions in self.action_vars[:horizon]]
+        return None
+
+
+def sat_plan(problem: Problem, max_steps: int=50) -> Node:
+    ''' solve a planning problem with SATPlan, see SATPlanner
+
+    The steps of the parallel plan are executed one after the other, so the
+    result is a search Node like those of the aimacode.search searches.
+
+    :param problem: PlanningProblem
+    :param max_steps: int longest horizon tried
+    :return: Node of the goal state; None if no plan was found
+    '''
+    steps = SATPlanner(problem).search(max_steps)
+    if steps is None:
+        return None
+    node = Node(problem.initial)
+    for step in steps:
+        for action in step:
+            node = node.child_node(problem, action)
+    return node
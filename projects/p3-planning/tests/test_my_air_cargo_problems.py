@@ -4,11 +4,14 @@ parent = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
 from aimacode.planning import Action
 from aimacode.utils import expr
-from aimacode.search import Node
+from aimacode.search import (
+    Node, bidirectional_breadth_first_search, bidirectional_uniform_cost_search,
+)
 import unittest
-from lp_utils import decode_state
+from lp_utils import decode_state, encode_state, FluentState
 from my_air_cargo_problems import (
-    air_cargo_p1, air_cargo_p2, air_cargo_p3,
+    air_cargo_p1, air_cargo_p2, air_cargo_p3, AirCargoProblem,
+    air_cargo_generated,
 )
 
 class TestAirCargoProb1(unittest.TestCase):
@@ -17,7 +20,7 @@ class TestAirCargoProb1(unittest.TestCase):
         self.p1 = air_cargo_p1()
 
     def test_ACP1_num_fluents(self):
-        self.assertEqual(len(self.p1.initial), 12)
+        self.assertEqual(len(self.p1.state_map), 12)
 
     def test_ACP1_num_requirements(self):
         self.assertEqual(len(self.p1.goal),2)
@@ -29,7 +32,7 @@ class TestAirCargoProb2(unittest.TestCase):
         self.p2 = air_cargo_p2()
 
     def test_ACP2_num_fluents(self):
-        self.assertEqual(len(self.p2.initial), 27)
+        self.assertEqual(len(self.p2.state_map), 27)
 
     def test_ACP2_num_requirements(self):
         self.assertEqual(len(self.p2.goal),3)
@@ -41,12 +44,34 @@ class TestAirCargoProb3(unittest.TestCase):
         self.p3 = air_cargo_p3()
 
     def test_ACP3_num_fluents(self):
-        self.assertEqual(len(self.p3.initial), 32)
+        self.assertEqual(len(self.p3.state_map), 32)
 
     def test_ACP3_num_requirements(self):
         self.assertEqual(len(self.p3.goal),4)
 
 
+class TestAirCargoGenerated(unittest.TestCase):
+
+    def setUp(self):
+        self.p = air_cargo_generated(4, 2, 3, seed=1)
+
+    def test_ACG_num_fluents(self):
+        # At for every cargo and plane at every airport, In for every cargo in every plane
+        self.assertEqual(len(self.p.state_map), (4 + 2) * 3 + 4 * 2)
+        self.assertEqual(len(set(self.p.state_map)), len(self.p.state_map))
+        self.assertEqual(bin(self.p.initial).count('1'), 4 + 2)
+
+    def test_ACG_goal(self):
+        self.assertEqual(len(self.p.goal), 4)
+        self.assertFalse(self.p.goal_test(self.p.initial))
+
+    def test_ACG_seed(self):
+        other = air_cargo_generated(4, 2, 3, seed=1)
+        self.assertEqual(other.state_map, self.p.state_map)
+        self.assertEqual(other.initial, self.p.initial)
+        self.assertEqual(other.goal, self.p.goal)
+
+
 class TestAirCargoMethods(unittest.TestCase):
 
     def setUp(self):
@@ -76,6 +101,89 @@ class TestAirCargoMethods(unittest.TestCase):
         self.assertTrue(expr('In(C1, P1)') in fs.pos)
         self.assertTrue(expr('At(C1, SFO)') in fs.neg)
 
+    def test_AC_encode_decode(self):
+        self.assertIsInstance(self.p1.initial, int)
+        fs = decode_state(self.p1.initial, self.p1.state_map)
+        self.assertEqual(fs.pos, self.p1.state_map[:4])
+        self.assertEqual(fs.neg, self.p1.state_map[4:])
+        self.assertEqual(encode_state(fs, self.p1.state_map), self.p1.initial)
+        self.assertEqual(encode_state(FluentState([], self.p1.state_map), self.p1.state_map), 0)
+
+    def test_AC_actions_index(self):
+        # the indexed actions must match a direct test of the preconditions
+        state = self.p1.initial
+        for _ in range(4):
+            fs = decode_state(state, self.p1.state_map)
+            expected = [a for a in self.p1.actions_list
+                        if all(p in fs.pos for p in a.precond_pos) and
+                        not any(p in fs.pos for p in a.precond_neg)]
+            self.assertEqual(self.p1.actions(state), expected)
+            state = self.p1.result(state, expected[-1])
+
+    def test_AC_result_masks(self):
+        for action in self.p1.actions(self.p1.initial):
+            fs = decode_state(self.p1.result(self.p1.initial, action), self.p1.state_map)
+            initial = decode_state(self.p1.initial, self.p1.state_map)
+            expected = [f for f in self.p1.state_map
+                        if f in action.effect_add or
+                        (f in initial.pos and f not in action.effect_rem)]
+            self.assertEqual(fs.pos, expected)
+
+    def test_AC_goal_test(self):
+        self.assertFalse(self.p1.goal_test(self.p1.initial))
+        goal = FluentState(self.p1.goal, [])
+        self.assertTrue(self.p1.goal_test(encode_state(goal, self.p1.state_map)))
+
+    def test_AC_get_actions_pruned(self):
+        # P2 is not at any airport, so none of its actions are reachable
+        fluents = [expr('At(C1, SFO)'), expr('At(P1, SFO)'), expr('At(C1, JFK)'),
+                   expr('At(P1, JFK)'), expr('In(C1, P1)'), expr('In(C1, P2)'),
+                   expr('At(P2, SFO)'), expr('At(P2, JFK)')]
+        p = AirCargoProblem(['C1'], ['P1', 'P2'], ['SFO', 'JFK'],
+                            FluentState(fluents[:2], fluents[2:]), [expr('At(C1, JFK)')])
+        names = ["{}{}".format(a.name, a.args) for a in p.actions_list]
+        self.assertEqual(len(names), 6)
+        self.assertFalse([n for n in names if 'P2' in n])
+        self.assertIs(p.actions_list[0].precond_pos[0], p.state_map[0])
+
+    def test_AC_predecessors(self):
+        for action in self.p1.actions(self.p1.initial):
+            state = self.p1.result(self.p1.initial, action)
+            self.assertIn((action, self.p1.initial), self.p1.predecessors(state))
+            for previous_action, previous in self.p1.predecessors(state):
+                self.assertEqual(self.p1.result(previous, previous_action), state)
+                self.assertIn(previous_action, self.p1.actions(previous))
+
+    def test_AC_goal_states(self):
+        goal_states = self.p1.goal_states()
+        # the cargos are at their goal airports, and the planes anywhere
+        self.assertEqual(len(goal_states), 4)
+        self.assertTrue(all(self.p1.goal_test(s) for s in goal_states))
+
+    def test_AC_too_many_goal_states(self):
+        # the regression tables are only compiled for backward searches
+        p = air_cargo_generated(4, 8, 6, seed=0)
+        self.assertIsNone(p.invariant_masks)
+        # the planes may be at any of the airports: 6 ** 8 goal states
+        with self.assertRaises(ValueError):
+            p.goal_states()
+        self.assertIsNotNone(p.invariant_masks)
+
+    def test_AC_bidirectional_search(self):
+        for search in (bidirectional_breadth_first_search,
+                       bidirectional_uniform_cost_search):
+            node = search(self.p1)
+            self.assertEqual(len(node.solution()), 6)
+            self.assertTrue(self.p1.goal_test(node.state))
+
+    def test_h_pg_setlevel_cache(self):
+        n = Node(self.p1.initial)
+        h = self.p1.h_pg_setlevel(n)
+        self.assertEqual(self.p1.setlevel_cache, {self.p1.initial: h})
+        self.p1.graph_cache = (None, None)
+        self.assertEqual(self.p1.h_pg_setlevel(n), h)
+        self.assertEqual(self.p1.graph_cache, (None, None))
+
     def test_h_ignore_preconditions(self):
         n = Node(self.p1.initial)
         self.assertEqual(self.p1.h_ignore_preconditions(n),2)
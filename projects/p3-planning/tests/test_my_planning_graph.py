@@ -8,8 +8,10 @@ from aimacode.utils import expr
 from aimacode.planning import Action
 from example_have_cake import have_cake
 from my_planning_graph import (
-    PlanningGraph, PgNode_a, PgNode_s, mutexify
+    PlanningGraph, PgNode_a, PgNode_s, mutexify, CompiledPlanningGraph,
+    GraphPlan, graphplan, mutex_tables
 )
+from my_air_cargo_problems import air_cargo_p1
 
 
 class TestPlanningGraphLevels(unittest.TestCase):
@@ -114,6 +116,57 @@ class TestPlanningGraphMutex(unittest.TestCase):
             self.pg, self.ns1, self.ns2),
             "If one parent action can achieve both states, should NOT be inconsistent-support mutex, even if parent actions are themselves mutex")
 
+    def test_level_mutexes(self):
+        # the bitset mutexes of the levels must match the pairwise tests
+        pg = PlanningGraph(air_cargo_p1(), air_cargo_p1().initial)
+        for nodes in pg.a_levels:
+            nodes = list(nodes)
+            for i, n1 in enumerate(nodes):
+                for n2 in nodes[i + 1:]:
+                    self.assertEqual(n1.is_mutex(n2), pg.serialize_actions(n1, n2) or
+                                     pg.inconsistent_effects_mutex(n1, n2) or
+                                     pg.interference_mutex(n1, n2) or
+                                     pg.competing_needs_mutex(n1, n2))
+        for nodes in pg.s_levels[1:]:
+            nodes = list(nodes)
+            for i, n1 in enumerate(nodes):
+                for n2 in nodes[i + 1:]:
+                    self.assertEqual(n1.is_mutex(n2), pg.negation_mutex(n1, n2) or
+                                     pg.inconsistent_support_mutex(n1, n2))
+
+    def test_pruned_actions(self):
+        # actions whose preconditions are mutex are left out of the level
+        pg = PlanningGraph(air_cargo_p1(), air_cargo_p1().initial)
+        for nodes in pg.a_levels:
+            for node in nodes:
+                self.assertFalse(node.is_mutex(node))
+                self.assertFalse(any(s1.is_mutex(s2) for s1 in node.parents for s2 in node.parents))
+        # the plane flies to JFK while the cargo is loaded at SFO
+        unload = [{str(n.action.name) + str(n.action.args) for n in nodes} for nodes in pg.a_levels]
+        self.assertNotIn("Unload(C1, P1, JFK)", unload[1])
+        self.assertIn("Unload(C1, P1, JFK)", unload[2])
+
+
+class TestPlanningGraphNodes(unittest.TestCase):
+    def test_node_templates(self):
+        p = have_cake()
+        action = p.actions_list[0]
+        n1, n2 = PgNode_a(action), PgNode_a(action)
+        self.assertIs(n1.prenodes, n2.prenodes)
+        self.assertEqual(n1, n2)
+        self.assertFalse(hasattr(n1, '__dict__'))
+        self.assertEqual(PgNode_s(expr('Have(Cake)'), False).literal, expr('~Have(Cake)'))
+
+    def test_graph_nodes(self):
+        p = have_cake()
+        pg1, pg2 = PlanningGraph(p, p.initial), PlanningGraph(p, p.initial)
+        self.assertIs(pg1.all_actions[-1], pg2.all_actions[-1])
+        # every level has its own nodes, connected to the adjacent levels only
+        for level, nodes in enumerate(pg1.s_levels[1:]):
+            for node in nodes:
+                self.assertTrue(node.parents <= pg1.a_levels[level])
+                self.assertFalse(any(node is n for n in pg2.s_levels[level + 1]))
+
 
 class TestPlanningGraphHeuristics(unittest.TestCase):
     def setUp(self):
@@ -123,6 +176,123 @@ class TestPlanningGraphHeuristics(unittest.TestCase):
     def test_levelsum(self):
         self.assertEqual(self.pg.h_levelsum(), 1)
 
+    def test_levelsum_pruned(self):
+        # actions with mutex preconditions are left out of the levels, so the
+        # goals appear later than in the relaxed graph (4 at every state)
+        p = air_cargo_p1()
+        state = p.initial
+        values = []
+        for _ in range(4):
+            values.append(PlanningGraph(p, state).h_levelsum())
+            state = p.result(state, p.actions(state)[0])
+        self.assertEqual(values, [6, 5, 4, 5])
+
+
+class TestCompiledPlanningGraph(unittest.TestCase):
+    def test_levels(self):
+        p = have_cake()
+        levels = CompiledPlanningGraph(p).levels(p.initial)
+        # Have(Cake), ~Eaten(Cake) in S0; ~Have(Cake), Eaten(Cake) in S1
+        self.assertEqual(levels, [0, 1, 1, 0])
+
+    def test_levelsum(self):
+        p = air_cargo_p1()
+        compiled = CompiledPlanningGraph(p)
+        state = p.initial
+        # the relaxed levels are a lower bound on the levels with mutexes
+        self.assertEqual(compiled.h_levelsum(state, p.goal), 4)
+        for _ in range(3):
+            self.assertLessEqual(compiled.h_levelsum(state, p.goal),
+                                 PlanningGraph(p, state).h_levelsum())
+            state = p.result(state, p.actions(state)[0])
+
+
+class TestStateGraphHeuristics(unittest.TestCase):
+    def setUp(self):
+        self.p = air_cargo_p1()
+        self.graph = CompiledPlanningGraph(self.p).build(self.p.initial)
+
+    def test_have_cake(self):
+        p = have_cake()
+        graph = CompiledPlanningGraph(p).build(p.initial)
+        self.assertEqual(graph.h_maxlevel(p.goal), 1)
+        # Have(Cake) and Eaten(Cake) are mutex in S1
+        self.assertEqual(graph.h_setlevel(p.goal), 2)
+        self.assertEqual(graph.h_ff(p.goal), 1)
+
+    def test_maxlevel(self):
+        # the cargos are loaded while the planes fly, then unloaded
+        self.assertEqual(self.graph.h_maxlevel(self.p.goal), 2)
+
+    def test_ff(self):
+        # load, fly and unload for each of the two cargos
+        self.assertEqual(self.graph.h_ff(self.p.goal), 6)
+
+    def test_setlevel(self):
+        state = self.p.initial
+        for _ in range(3):
+            graph = CompiledPlanningGraph(self.p).build(state)
+            self.assertGreaterEqual(graph.h_setlevel(self.p.goal),
+                                    graph.h_maxlevel(self.p.goal))
+            state = self.p.result(state, self.p.actions(state)[0])
+
+    def test_mutex_levels(self):
+        # the levels are updated from the previous ones, and must match the
+        # levels computed from scratch
+        tables = mutex_tables(self.p, True)
+        self.graph.add_mutex_level()
+        while not self.graph.leveled_off:
+            self.graph.add_mutex_level()
+        self.assertGreater(len(self.graph.literal_masks), 2)
+        for lits, mutexes, expected in zip(self.graph.literal_masks, self.graph.literal_mutexes,
+                                           self.graph.literal_mutexes[1:]):
+            level_mask = 0
+            for i, pre in enumerate(tables.preconds):
+                if not pre & ~lits and tables.consistent(i, mutexes):
+                    level_mask |= 1 << i
+            parents = {}
+            for i, eff in enumerate(tables.effects):
+                if level_mask >> i & 1:
+                    for lit in range(2 * len(tables.fluent_ids)):
+                        if eff >> lit & 1:
+                            parents[lit] = parents.get(lit, 0) | 1 << i
+            a_mutexes = tables.action_mutexes(level_mask, mutexes)
+            self.assertEqual(tables.literal_mutexes(parents, a_mutexes), expected)
+
+    def test_goal_state(self):
+        self.assertEqual(self.graph.h_setlevel([]), 0)
+        self.assertEqual(self.graph.h_ff([]), 0)
+
+    def test_unreachable_goal(self):
+        goal = [expr('At(C1, Nowhere)')]
+        self.assertEqual(self.graph.h_maxlevel(goal), float('inf'))
+        self.assertEqual(self.graph.h_setlevel(goal), float('inf'))
+        self.assertEqual(self.graph.h_ff(goal), float('inf'))
+
+
+class TestGraphPlan(unittest.TestCase):
+    def test_have_cake(self):
+        p = have_cake()
+        steps = GraphPlan(p).search()
+        self.assertEqual([[a.name for a in step] for step in steps], [['Eat'], ['Bake']])
+
+    def test_parallel_plan(self):
+        p = air_cargo_p1()
+        steps = GraphPlan(p).search()
+        # load and fly, then unload, with both planes at once
+        self.assertEqual(len(steps), 3)
+        node = graphplan(p)
+        self.assertEqual(len(node.solution()), 6)
+        self.assertTrue(p.goal_test(node.state))
+
+    def test_unsolvable(self):
+        p = air_cargo_p1()
+        # C1 cannot be at both airports
+        p.goal = [expr('At(C1, JFK)'), expr('At(C1, SFO)')]
+        self.assertIsNone(GraphPlan(p).search())
+        p.goal = [expr('At(C1, Nowhere)')]
+        self.assertIsNone(graphplan(p))
+
 
 if __name__ == '__main__':
     unittest.main()
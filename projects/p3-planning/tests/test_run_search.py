@@ -0,0 +1,54 @@
+import os
+import sys
+parent = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
+import csv
+import json
+import tempfile
+import unittest
+from aimacode.search import breadth_first_tree_search, astar_search
+from my_air_cargo_problems import air_cargo_p1, air_cargo_p3
+from run_search import run_matrix, write_results, RESULT_FIELDS
+
+
+class TestRunMatrix(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = run_matrix(
+            [["Air Cargo Problem 1", air_cargo_p1], ["Air Cargo Problem 3", air_cargo_p3]],
+            [["breadth_first_tree_search", breadth_first_tree_search, ""],
+             ["astar_search", astar_search, "h_ignore_preconditions"]],
+            workers=2, timeout=1)
+
+    def test_results(self):
+        self.assertEqual([(r["problem"], r["search"]) for r in self.results],
+                         [("Air Cargo Problem 1", "breadth_first_tree_search"),
+                          ("Air Cargo Problem 1", "astar_search"),
+                          ("Air Cargo Problem 3", "breadth_first_tree_search"),
+                          ("Air Cargo Problem 3", "astar_search")])
+        p1_bfs = self.results[0]
+        self.assertEqual(p1_bfs["status"], "ok")
+        self.assertEqual(p1_bfs["plan_length"], 6)
+        self.assertEqual(p1_bfs["expansions"], 1458)
+        self.assertEqual(self.results[1]["heuristic"], "h_ignore_preconditions")
+
+    def test_timeout(self):
+        self.assertEqual(self.results[2]["status"], "timeout")
+        self.assertIsNone(self.results[2]["plan_length"])
+
+    def test_write_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.json")
+            write_results(self.results, path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), self.results)
+            path = os.path.join(tmp, "results.csv")
+            write_results(self.results, path)
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(list(rows[0]), RESULT_FIELDS)
+            self.assertEqual(rows[0]["plan_length"], "6")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+parent = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
+import unittest
+from aimacode.logic import CDCLSolver
+from aimacode.utils import expr
+from example_have_cake import have_cake
+from my_air_cargo_problems import air_cargo_p1, air_cargo_p3
+from sat_planning import SATPlanner, sat_plan
+
+
+class TestCDCLSolver(unittest.TestCase):
+    def test_pigeonhole(self):
+        # 4 pigeons do not fit in 3 holes
+        solver = CDCLSolver()
+        v = {(p, h): solver.new_var() for p in range(4) for h in range(3)}
+        for p in range(4):
+            solver.add_clause([v[p, h] for h in range(3)])
+        for h in range(3):
+            for p in range(4):
+                for q in range(p + 1, 4):
+                    solver.add_clause([-v[p, h], -v[q, h]])
+        self.assertFalse(solver.solve())
+
+    def test_assumptions(self):
+        solver = CDCLSolver()
+        a, b, c = (solver.new_var() for _ in range(3))
+        solver.add_clause([a, b])
+        solver.add_clause([-a, c])
+        self.assertFalse(solver.solve([-b, -c]))
+        self.assertTrue(solver.solve([-b]))
+        self.assertEqual(solver.model[a:c + 1], [True, False, True])
+        # the assumptions do not remain
+        self.assertTrue(solver.solve([-a]))
+
+
+class TestSATPlanner(unittest.TestCase):
+    def test_have_cake(self):
+        steps = SATPlanner(have_cake()).search()
+        self.assertEqual([[a.name for a in step] for step in steps], [['Eat'], ['Bake']])
+
+    def test_parallel_plan(self):
+        p = air_cargo_p1()
+        steps = SATPlanner(p).search()
+        self.assertEqual(len(steps), 3)
+        node = sat_plan(p)
+        self.assertEqual(len(node.solution()), 6)
+        self.assertTrue(p.goal_test(node.state))
+
+    def test_p3(self):
+        p = air_cargo_p3()
+        node = sat_plan(p)
+        self.assertTrue(p.goal_test(node.state))
+
+    def test_unsolvable(self):
+        p = air_cargo_p1()
+        # C1 cannot be at both airports
+        p.goal = [expr('At(C1, JFK)'), expr('At(C1, SFO)')]
+        self.assertIsNone(SATPlanner(p).search(max_steps=6))
+        p.goal = [expr('At(C1, Nowhere)')]
+        self.assertIsNone(sat_plan(p))
+
+
+if __name__ == '__main__':
+    unittest.main()